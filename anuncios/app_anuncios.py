@@ -1,20 +1,32 @@
 # anuncios/app_anuncios.py
 
-import os
 from datetime import date
 from io import BytesIO
 
-import gspread
 import jinja2
 import pandas as pd
 import streamlit as st
 from docxtpl import DocxTemplate
-from google.oauth2.service_account import Credentials
 
 from utils import fecha_larga, safe_filename_pretty  # función común en utils.py
 
 #  CODART (SUNAT) para autocompletar
 from integraciones.codart import CodartAPIError, consultar_ruc
+from integraciones import sheets_cache, sheets_sync, sqlite_store, versiones
+from integraciones.almacen import Almacen, abrir_almacen
+from integraciones.archivo_anual import archivar_filas, con_archivo, leer_archivados
+from integraciones.exportar import boton_descarga_excel
+from integraciones.google_cliente import cliente_gspread
+from integraciones.paginacion import FuenteHoja
+from integraciones.vista_paginada import vista_paginada
+from integraciones.tipado import Esquema, tipar
+from integraciones.gsheets import (
+    append_filas,
+    con_worksheet,
+    obtener_worksheet,
+    reescribir_versionado,
+    valores_a_df,
+)
 
 
 # ============================================================================
@@ -27,11 +39,6 @@ SPREADSHEET_ID = "1wytMZVt4dH33uKvCwgeSp48F3C79Cshf2wCY09NxVqw"
 # Nombre de la hoja dentro del spreadsheet
 SHEET_NAME = "Hoja 1"
 
-SCOPES = [
-    "https://www.googleapis.com/auth/spreadsheets",
-    "https://www.googleapis.com/auth/drive",
-]
-
 # Columnas exactamente como en el formato oficial
 COLUMNAS_OFICIALES = [
     "EXP",
@@ -62,67 +69,151 @@ COLUMNAS_OFICIALES = [
     "N° CARAS",
 ]
 
+# Clave de negocio de la BD: ubica las filas editadas en la vista paginada
+# y resuelve los conflictos de las reescrituras (ver versiones.fusionar)
+CLAVE_CERTIFICADO = "NÚMERO DE AUTORIZACION "
+
+# Versión tipada de la BD (ver integraciones.tipado). La FECHA DE EXPIRACIÓN
+# guarda el texto de la vigencia, así que no se convierte a fecha.
+ESQUEMA_OFICIALES = Esquema(
+    "CertificadoAnuncio",
+    COLUMNAS_OFICIALES,
+    categoricas=[
+        "TIPO DE DOCUMENTO DE IDENTIDAD DEL SOLICITANTE",
+        "TIPO DE ANUNCIPO PUBLICITARIO (Móvil, paneles, banderolas, etc.)",
+    ],
+    fechas=["FECHA DE EMISIÓN DE LA AUTORIZACION"],
+)
+
 
 # ============================================================================
 # HELPERS GOOGLE SHEETS
 # ============================================================================
 
-@st.cache_resource
+def _get_client() -> Almacen:
+    """
+    Backend de almacenamiento (ALMACENAMIENTO_SHEETS): el cliente gspread
+    o un backend local "memoria" / "archivo" (ver integraciones.almacen).
+    El cliente gspread es el mismo para todos los módulos
+    (ver integraciones.google_cliente).
+    """
+    return abrir_almacen(cliente_gspread)
+
+
 def get_worksheet():
     """
-    Crea el cliente de Google Sheets usando st.secrets y devuelve la hoja de trabajo.
-    Se cachea para no reautenticar en cada interacción.
+    Devuelve la hoja de trabajo desde el registro compartido del proceso.
+    Si no existe la hoja con ese nombre, usamos la primera.
+    El encabezado se valida una sola vez.
     """
-    creds_info = st.secrets["gcp_service_account"]
-    creds = Credentials.from_service_account_info(creds_info, scopes=SCOPES)
-    client = gspread.authorize(creds)
+    return obtener_worksheet(
+        _get_client(), SPREADSHEET_ID, SHEET_NAME, COLUMNAS_OFICIALES, crear=False
+    )
 
-    sh = client.open_by_key(SPREADSHEET_ID)
-    try:
-        ws = sh.worksheet(SHEET_NAME)
-    except gspread.exceptions.WorksheetNotFound:
-        # Si no existe la hoja con ese nombre, usamos la primera
-        ws = sh.sheet1
 
-    # Si la hoja está vacía, ponemos la fila de encabezados
-    values = ws.get_all_values()
-    if not values:
-        ws.update("A1", [COLUMNAS_OFICIALES])
+def _con_worksheet(fn, escritura=False):
+    """
+    Ejecuta fn(ws); si la hoja fue renombrada/eliminada, se re-resuelve
+    el handle y se reintenta una vez. Las escrituras se serializan.
+    """
+    return con_worksheet(
+        _get_client(),
+        SPREADSHEET_ID,
+        SHEET_NAME,
+        COLUMNAS_OFICIALES,
+        fn,
+        crear=False,
+        escritura=escritura,
+    )
+
 
-    return ws
+CLAVE_CACHE = (SPREADSHEET_ID, SHEET_NAME)
+
+# Columna clave de la BD (vistas paginadas)
+COLUMNA_SONDA = "EXP"
 
 
 def leer_bd_certificados() -> pd.DataFrame:
     """
     Lee toda la BD desde Google Sheets y la devuelve como DataFrame.
     Si no hay datos, devuelve un DF vacío con las columnas oficiales.
+    Se sirve desde la caché compartida mientras siga vigente
+    (o desde SQLite si ALMACENAMIENTO_REGISTROS="sqlite").
     """
-    ws = get_worksheet()
-    values = ws.get_all_values()
+    if sqlite_store.modo_sqlite():
+        return sqlite_store.leer_df(_tabla_sqlite(), COLUMNAS_OFICIALES)
+    return sheets_cache.leer_cacheado(CLAVE_CACHE, _sincronizar_bd_certificados)
 
-    if not values:
-        return pd.DataFrame(columns=COLUMNAS_OFICIALES)
 
-    header = values[0]
-    rows = values[1:]
+def leer_bd_certificados_tipado() -> pd.DataFrame:
+    """
+    Como leer_bd_certificados(), con categorías y fechas tipadas (solo
+    lectura). Se tipa una vez por copia cargada en la caché.
+    """
+    if sqlite_store.modo_sqlite():
+        return tipar(leer_bd_certificados(), ESQUEMA_OFICIALES)
+    return sheets_cache.leer_tipado(
+        CLAVE_CACHE,
+        _sincronizar_bd_certificados,
+        ESQUEMA_OFICIALES.nombre,
+        lambda df: tipar(df, ESQUEMA_OFICIALES),
+    )
 
-    df = pd.DataFrame(rows, columns=header)
 
-    # Aseguramos columnas oficiales
-    for col in COLUMNAS_OFICIALES:
-        if col not in df.columns:
-            df[col] = ""
+def fuente_bd_certificados() -> FuenteHoja:
+    """Fuente de la vista paginada / edición por página de la BD."""
+    return FuenteHoja(
+        SPREADSHEET_ID,
+        SHEET_NAME,
+        COLUMNAS_OFICIALES,
+        _get_client,
+        col_sonda=COLUMNA_SONDA,
+        col_clave=CLAVE_CERTIFICADO,
+        esquema=ESQUEMA_OFICIALES,
+        tabla_sqlite=_tabla_sqlite,
+        crear=False,
+    )
 
-    df = df[COLUMNAS_OFICIALES]
-    return df
+
+def _tabla_sqlite() -> str:
+    """Tabla SQLite de la BD (la primera vez importa lo que hay en Sheets)."""
+    sqlite_store.registrar_libro(SPREADSHEET_ID, _get_client)
+    return sqlite_store.asegurar_tabla(
+        SPREADSHEET_ID, SHEET_NAME, COLUMNAS_OFICIALES, _descargar_bd_certificados
+    )
 
 
-def escribir_bd_certificados(df: pd.DataFrame):
+def refrescar_bd_certificados() -> None:
+    """Fuerza que la próxima lectura de la BD vaya completa a Google Sheets."""
+    sheets_sync.olvidar(CLAVE_CACHE)
+    sheets_cache.invalidar(CLAVE_CACHE)
+
+
+def _sincronizar_bd_certificados() -> pd.DataFrame:
+    return sheets_sync.sincronizar(
+        _get_client(),
+        SPREADSHEET_ID,
+        SHEET_NAME,
+        COLUMNAS_OFICIALES,
+        crear=False,
+    )
+
+
+def _descargar_bd_certificados() -> pd.DataFrame:
+    values = _con_worksheet(lambda ws: ws.get_all_values())
+    return valores_a_df(values, COLUMNAS_OFICIALES)
+
+
+def escribir_bd_certificados(df: pd.DataFrame, base: pd.DataFrame):
     """
     Sobrescribe la BD en Google Sheets con el contenido del DataFrame.
-    """
-    ws = get_worksheet()
 
+    'base' es lo que se leyó antes de editar (obligatorio: la caché al
+    momento de escribir puede ya traer cambios de otros). Si otra sesión
+    escribió entretanto, se fusionan los cambios en vez de pisarlos (en un
+    conflicto sobre el mismo certificado queda la versión de 'df').
+    Devuelve el resumen {"fusionado", "conflictos", ...}.
+    """
     df = df.copy()
     # Aseguramos columnas y orden
     for col in COLUMNAS_OFICIALES:
@@ -131,10 +222,107 @@ def escribir_bd_certificados(df: pd.DataFrame):
     df = df[COLUMNAS_OFICIALES]
     df = df.fillna("")
 
-    values = [df.columns.tolist()] + df.astype(str).values.tolist()
+    if sqlite_store.modo_sqlite():
+        tabla = _tabla_sqlite()
+        with sqlite_store.transaccion():
+            actual = sqlite_store.leer_df(tabla, COLUMNAS_OFICIALES)
+            final, resumen = versiones.resolver_escritura(
+                base, df, actual, COLUMNAS_OFICIALES, CLAVE_CERTIFICADO
+            )
+            sqlite_store.reescribir(
+                SPREADSHEET_ID, SHEET_NAME, COLUMNAS_OFICIALES, tabla, final
+            )
+        sqlite_store.despertar_replicador()
+        return resumen
+
+    final, resumen = _con_worksheet(
+        lambda ws: reescribir_versionado(
+            ws, COLUMNAS_OFICIALES, base, df, CLAVE_CERTIFICADO
+        ),
+        escritura=True,
+    )
+    sheets_sync.olvidar(CLAVE_CACHE)
+    sheets_cache.reemplazar(CLAVE_CACHE, final)
+    return resumen
+
 
-    ws.clear()
-    ws.update("A1", values)
+def append_bd_certificados(filas):
+    """
+    Agrega una o varias filas (dicts {columna: valor}) al final de la BD,
+    en una sola llamada y sin reescribir la hoja.
+    """
+    if sqlite_store.modo_sqlite():
+        sqlite_store.append_filas(
+            SPREADSHEET_ID, SHEET_NAME, COLUMNAS_OFICIALES, _tabla_sqlite(), filas
+        )
+        sqlite_store.despertar_replicador()
+        return
+
+    escritas = _con_worksheet(
+        lambda ws: append_filas(ws, COLUMNAS_OFICIALES, filas), escritura=True
+    )
+    sheets_cache.agregar_filas(CLAVE_CACHE, COLUMNAS_OFICIALES, escritas)
+
+
+# ============================================================================
+# ARCHIVO ANUAL (certificados vencidos → "Hoja 1 <año>")
+# ============================================================================
+
+
+def _fin_vigencia_certificados(t: pd.DataFrame) -> pd.Series:
+    """
+    Fin de vigencia de cada certificado: emisión + n meses para
+    "TEMPORAL (n) MESES"; NaT para "INDETERMINADA" (nunca vence).
+    """
+    meses = pd.to_numeric(
+        t["FECHA DE EXPIRACIÓN DE LA AUTORIZACION"].str.extract(
+            r"TEMPORAL\s*\((\d+)\)", expand=False
+        ),
+        errors="coerce",
+    )
+    emision = t["FECHA DE EMISIÓN DE LA AUTORIZACION"]
+    fin = pd.Series(pd.NaT, index=t.index, dtype="datetime64[ns]")
+    for n in meses.dropna().unique():
+        filas = meses == n
+        fin[filas] = emision[filas] + pd.DateOffset(months=int(n))
+    return fin
+
+
+def archivar_bd_certificados(corte: date | None = None, aplicar: bool = True):
+    """
+    Mueve los certificados vencidos antes de 'corte' (por defecto, el 1 de
+    enero del año en curso) a la hoja "<SHEET_NAME> <año de emisión>".
+    Con aplicar=False solo cuenta. Devuelve ({año: filas}, conflictos), con
+    los certificados que otra sesión cambió mientras se archivaba.
+    """
+    corte_ts = pd.Timestamp(corte or date(date.today().year, 1, 1))
+    base = leer_bd_certificados()
+    if base.empty:
+        return {}, 0
+    t = tipar(base, ESQUEMA_OFICIALES)
+    vencidos = (_fin_vigencia_certificados(t) < corte_ts).fillna(False).astype(bool)
+    if not vencidos.any():
+        return {}, 0
+
+    anios = t.loc[vencidos, "FECHA DE EMISIÓN DE LA AUTORIZACION"].dt.year.astype(int)
+    if not aplicar:
+        return {int(a): int(n) for a, n in anios.value_counts().sort_index().items()}, 0
+    resumen = archivar_filas(
+        _get_client(), SPREADSHEET_ID, SHEET_NAME, COLUMNAS_OFICIALES, base[vencidos], anios
+    )
+    escrito = escribir_bd_certificados(base[~vencidos], base=base)
+    return resumen, int(escrito["conflictos"])
+
+
+def leer_bd_certificados_con_archivo(anios=None) -> pd.DataFrame:
+    """
+    BD activa + archivos anuales (consulta histórica, opcional), con la
+    columna "AÑO ARCHIVO" ("" para la hoja activa).
+    """
+    archivados = leer_archivados(
+        _get_client(), SPREADSHEET_ID, SHEET_NAME, COLUMNAS_OFICIALES, anios
+    )
+    return con_archivo(leer_bd_certificados(), archivados)
 
 
 # ============================================================================
@@ -243,14 +431,8 @@ def guardar_certificado_en_bd(
         "N° CARAS": num_caras,
     }
 
-    # Leemos la BD actual, concatenamos y reescribimos todo
-    try:
-        df = leer_bd_certificados()
-    except Exception:
-        df = pd.DataFrame(columns=COLUMNAS_OFICIALES)
-
-    df = pd.concat([df, pd.DataFrame([nueva_fila])], ignore_index=True)
-    escribir_bd_certificados(df)
+    # Solo enviamos la fila nueva (append), sin releer ni reescribir la BD
+    append_bd_certificados([nueva_fila])
 
 
 # ============================================================================
@@ -854,53 +1036,70 @@ def run_modulo_anuncios():
         unsafe_allow_html=True,
     )
 
-    try:
-        df_bd = leer_bd_certificados()
-    except Exception as e:
-        df_bd = None
-        st.error(f"No se pudo leer la BD en Google Sheets: {e}")
-
-    if df_bd is not None and not df_bd.empty:
-        with st.expander("Ver / editar base de datos"):
-            edited_df = st.data_editor(
-                df_bd,
-                num_rows="dynamic",
-                use_container_width=True,
-                key="editor_bd_certificados",
-            )
-            st.caption(
-                "Puedes editar celdas o agregar / eliminar filas. "
-                "Luego guarda los cambios en la hoja de cálculo."
-            )
+    if st.button("🔄 Actualizar datos desde Google Sheets", key="refrescar_bd_anuncios"):
+        refrescar_bd_certificados()
+
+    with st.expander("Ver / editar base de datos"):
+        # Solo se traen (y se envían al navegador) las filas de la página
+        vista_paginada(
+            fuente_bd_certificados(),
+            "bd_certificados",
+            columnas_filtro=["RUC DE LA EMPRESA", "RAZÓN SOCIAL DEL SOLICITANTE"],
+            editable=True,
+            filas_dinamicas=True,
+        )
+        st.caption(
+            "Puedes editar celdas o agregar / eliminar filas de la página visible. "
+            "Al guardar solo se envían a la hoja de cálculo esos cambios."
+        )
 
-            if st.button("💾 Guardar cambios en BD (Google Sheets)"):
-                try:
-                    escribir_bd_certificados(edited_df)
-                    st.success("Cambios guardados correctamente en Google Sheets.")
-                except Exception as e:
-                    st.error(f"No se pudo actualizar la BD: {e}")
-
-        # Usamos lo que se ve en pantalla (edited_df) para la descarga
-        buffer = BytesIO()
-        with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
-            edited_df.to_excel(writer, sheet_name="Certificados", index=False)
-
-        buffer.seek(0)
-
-        st.download_button(
-            "⬇️ Descargar BD como Excel",
-            data=buffer,
-            file_name="BD_CERTIFICADOS_ANUNCIO.xlsx",
-            mime=(
-                "application/vnd.openxmlformats-"
-                "officedocument.spreadsheetml.document"
-            ),
+    # El Excel se arma solo al pulsar el botón (y se reutiliza si la BD no cambió)
+    boton_descarga_excel(
+        "⬇️ Descargar BD como Excel",
+        leer_bd_certificados,
+        "BD_CERTIFICADOS_ANUNCIO.xlsx",
+        hoja="Certificados",
+        key="descargar_bd_anuncios",
+    )
+
+    with st.expander("🗄️ Archivo anual de certificados vencidos"):
+        st.caption(
+            "Los certificados TEMPORAL vencidos antes de la fecha de corte pasan "
+            f"a la hoja \"{SHEET_NAME} <año>\". Los INDETERMINADA no se archivan."
         )
-    else:
-        st.info(
-            "Aún no hay registros en la base de datos de Google Sheets. "
-            "Cuando guardes un certificado, se empezará a llenar."
+        corte = st.date_input(
+            "Vencidos antes de",
+            value=date(date.today().year, 1, 1),
+            format="DD/MM/YYYY",
+            key="corte_archivo_anuncios",
         )
+        col_a, col_b = st.columns(2)
+        if col_a.button("🔍 Ver cuántos se archivarían", key="prever_archivo_anuncios"):
+            try:
+                previo, _ = archivar_bd_certificados(corte, aplicar=False)
+                if previo:
+                    st.write({str(a): n for a, n in previo.items()})
+                else:
+                    st.info("No hay certificados vencidos antes de esa fecha.")
+            except Exception as e:
+                st.error(f"No se pudo revisar la BD: {e}")
+        if col_b.button("🗄️ Archivar vencidos", key="archivar_anuncios"):
+            try:
+                hecho, conflictos = archivar_bd_certificados(corte)
+                st.success(f"Certificados archivados: {sum(hecho.values())}")
+                if conflictos:
+                    st.warning(
+                        f"{conflictos} certificado(s) fueron cambiados por otra sesión "
+                        "mientras se archivaba; se aplicó el archivo sobre esos cambios."
+                    )
+            except Exception as e:
+                st.error(f"No se pudo archivar: {e}")
+
+        if st.checkbox("Mostrar también los archivados", key="ver_archivo_anuncios"):
+            try:
+                st.dataframe(leer_bd_certificados_con_archivo(), use_container_width=True)
+            except Exception as e:
+                st.error(f"No se pudo leer el archivo: {e}")
 
     st.markdown("</div>", unsafe_allow_html=True)
 
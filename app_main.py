@@ -1,4 +1,5 @@
 # app_main.py
+import pandas as pd
 import streamlit as st
 
 from comercio.app_documentos import run_documentos_comercio
@@ -6,6 +7,7 @@ from comercio.app_permisos import run_permisos_comercio
 from anuncios.app_anuncios import run_modulo_anuncios
 from licencias.app_compatibilidad import run_modulo_compatibilidad
 from integraciones.app_consultas import run_modulo_consultas
+from integraciones.limitador import estadisticas as uso_api_sheets
 
 
 def main():
@@ -31,6 +33,14 @@ def main():
         ),
     )
 
+    # Uso de cuota de Google Sheets (para dimensionar el despliegue)
+    with st.sidebar.expander("📈 Uso de la API de Google Sheets"):
+        uso = uso_api_sheets()
+        if uso:
+            st.dataframe(pd.DataFrame(uso).tail(15), hide_index=True)
+        else:
+            st.caption("Sin llamadas registradas en este proceso.")
+
     # Ruteo según módulo seleccionado
     if modulo == "📥 Documentos Simples (Comercio Ambulatorio)":
         # Módulo para registrar y ver Documentos Simples (D.S.)
@@ -1,3 +1,5 @@
+from datetime import date
+
 import pandas as pd
 import streamlit as st
 
@@ -6,9 +8,20 @@ from integraciones.codart import (
     consultar_dni,
     dni_a_nombre_completo,
 )
+from comercio.importar_documentos import importar_documentos
+from integraciones.exportar import boton_descarga_excel
+from integraciones.vista_paginada import vista_paginada
 from comercio.sheets_comercio import (
+    DOCS_SHEET_NAME,
+    ESTADOS_DOCUMENTO,
+    actualizar_estado_documentos,
     append_documento,
+    archivar_cerrados,
+    buscar_por_dni,
+    fuente_hoja,
     leer_documentos,
+    leer_hojas,
+    refrescar_cache,
 )
 # Reutilizamos las opciones de giros y el helper to_upper
 from comercio.app_permisos import GIROS_OPCIONES, to_upper
@@ -282,18 +295,167 @@ def run_documentos_comercio():
             except Exception as e:
                 st.error(f"No se pudo registrar el Documento Simple: {e}")
 
+    # ----------------- Importación masiva -----------------
+    with st.expander("📤 Importar D.S. desde Excel / CSV"):
+        st.caption(
+            "Una fila por D.S. con encabezados como en Documentos_CA "
+            "(FECHA DE INGRESO, N° DE DOCUMENTO SIMPLE, ASUNTO, DNI, ...). "
+            "Se valida todo antes de escribir y las filas válidas se "
+            "registran en un solo paso."
+        )
+        archivo = st.file_uploader(
+            "Archivo .xlsx o .csv", type=["xlsx", "csv"], key="archivo_import_ds"
+        )
+        if archivo is not None:
+            c_prev, c_imp = st.columns(2)
+            with c_prev:
+                previsualizar = st.button("🔍 Validar", key="validar_import_ds")
+            with c_imp:
+                importar = st.button("💾 Importar filas válidas", key="importar_ds")
+
+            if previsualizar or importar:
+                try:
+                    archivo.seek(0)
+                    res = importar_documentos(
+                        archivo, archivo.name, escribir=importar
+                    )
+                except Exception as e:
+                    res = None
+                    st.error(f"No se pudo importar el archivo: {e}")
+
+                if res is not None:
+                    rechazadas = res["rechazadas"]
+                    if importar:
+                        st.success(
+                            f"{res['importadas']} D.S. registrados de "
+                            f"{res['leidas']} filas leídas."
+                        )
+                    else:
+                        st.info(
+                            f"{len(res['validas'])} filas válidas y "
+                            f"{len(rechazadas)} rechazadas de {res['leidas']}."
+                        )
+                    if not rechazadas.empty:
+                        st.warning(f"{len(rechazadas)} fila(s) rechazadas:")
+                        st.dataframe(
+                            rechazadas[["FILA", "N° DE DOCUMENTO SIMPLE", "MOTIVO"]],
+                            use_container_width=True,
+                        )
+                        st.download_button(
+                            "⬇️ Descargar reporte de rechazos (CSV)",
+                            rechazadas.to_csv(index=False).encode("utf-8-sig"),
+                            file_name="rechazos_importacion_ds.csv",
+                            mime="text/csv",
+                        )
+
     # ----------------- Vista rápida de la BD -----------------
     st.markdown("---")
+    if st.button("🔄 Actualizar datos desde Google Sheets", key="refrescar_docs"):
+        refrescar_cache()
+
     with st.expander("📊 Ver últimos Documentos registrados"):
+        # Los últimos primero; solo se traen las filas de la página
+        vista_paginada(
+            fuente_hoja(DOCS_SHEET_NAME),
+            "vista_documentos",
+            columnas_filtro=["N° DE DOCUMENTO SIMPLE", "DNI", "ESTADO"],
+        )
+        boton_descarga_excel(
+            "⬇️ Descargar Documentos como Excel",
+            leer_documentos,
+            "DOCUMENTOS_CA.xlsx",
+            hoja=DOCS_SHEET_NAME,
+            key="descargar_documentos",
+        )
+
+    # ----------------- Cambio de estado en bloque -----------------
+    with st.expander("🔁 Cambiar ESTADO de varios D.S."):
         try:
-            df = leer_documentos()
-            if df.empty:
-                st.info("Aún no hay documentos registrados.")
-            else:
-                st.dataframe(df.tail(50), use_container_width=True)
+            # Solo la columna clave (de la caché compartida o una columna)
+            df_estado = leer_hojas({DOCS_SHEET_NAME: ["N° DE DOCUMENTO SIMPLE"]})[
+                DOCS_SHEET_NAME
+            ]
         except Exception as e:
+            df_estado = pd.DataFrame()
             st.error(f"No se pudo leer la base de datos: {e}")
 
+        if df_estado.empty:
+            st.info("Aún no hay documentos registrados.")
+        else:
+            nums_sel = st.multiselect(
+                "Documentos Simples",
+                df_estado["N° DE DOCUMENTO SIMPLE"].astype(str).tolist(),
+                key="ds_cambio_estado",
+            )
+            nuevo_estado = st.selectbox(
+                "Nuevo estado",
+                ESTADOS_DOCUMENTO,
+                key="nuevo_estado_ds",
+            )
+            if st.button("💾 Actualizar estado", disabled=not nums_sel):
+                try:
+                    n = actualizar_estado_documentos(nums_sel, nuevo_estado)
+                    st.success(f"Estado actualizado en {n} fila(s).")
+                except Exception as e:
+                    st.error(f"No se pudo actualizar el estado: {e}")
+
+    # ----------------- Búsqueda por DNI -----------------
+    with st.expander("🔎 Buscar todo lo registrado para un DNI"):
+        dni_buscar = st.text_input("DNI", key="dni_buscar_expediente").strip()
+        incluir_archivo = st.checkbox(
+            "Incluir años archivados", key="dni_buscar_archivo"
+        )
+        if dni_buscar:
+            try:
+                encontrados = buscar_por_dni(dni_buscar, incluir_archivo=incluir_archivo)
+            except Exception as e:
+                encontrados = {}
+                st.error(f"No se pudo buscar en la base de datos: {e}")
+
+            if encontrados and all(df.empty for df in encontrados.values()):
+                st.info("No hay registros para ese DNI.")
+            for hoja, df_hoja in encontrados.items():
+                if not df_hoja.empty:
+                    st.markdown(f"**{hoja}** ({len(df_hoja)})")
+                    st.dataframe(df_hoja, use_container_width=True)
+
+    # ----------------- Archivo anual -----------------
+    with st.expander("🗄️ Archivar registros cerrados"):
+        st.caption(
+            "Pasan a las hojas \"<hoja> <año>\": D.S. AUTORIZADOS o IMPROCEDENTES, "
+            "evaluaciones con autorización y certificados vencidos antes de la fecha "
+            "de corte. Las consultas normales solo ven los registros activos."
+        )
+        corte = st.date_input(
+            "Cerrados antes de",
+            value=date(date.today().year, 1, 1),
+            format="DD/MM/YYYY",
+            key="corte_archivo_comercio",
+        )
+        col_a, col_b = st.columns(2)
+        if col_a.button("🔍 Ver cuántos se archivarían", key="prever_archivo_comercio"):
+            try:
+                previo, _ = archivar_cerrados(corte, aplicar=False)
+                if previo:
+                    for hoja, por_anio in previo.items():
+                        st.write(f"**{hoja}**: {por_anio}")
+                else:
+                    st.info("No hay registros cerrados antes de esa fecha.")
+            except Exception as e:
+                st.error(f"No se pudo revisar la base de datos: {e}")
+        if col_b.button("🗄️ Archivar", key="archivar_comercio"):
+            try:
+                hecho, conflictos = archivar_cerrados(corte)
+                total = sum(n for por_anio in hecho.values() for n in por_anio.values())
+                st.success(f"Registros archivados: {total}")
+                if conflictos:
+                    st.warning(
+                        f"{conflictos} registro(s) fueron cambiados por otra sesión "
+                        "mientras se archivaba; se aplicó el archivo sobre esos cambios."
+                    )
+            except Exception as e:
+                st.error(f"No se pudo archivar: {e}")
+
 
 # Para usar este archivo solo (sin app_main.py)
 if __name__ == "__main__":
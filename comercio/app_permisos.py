@@ -2,8 +2,11 @@
 
 import io
 import os
+import sqlite3
 import traceback
+from datetime import date
 
+import gspread
 import pandas as pd
 import streamlit as st
 from docxtpl import DocxTemplate
@@ -13,16 +16,36 @@ from integraciones.codart import (
     consultar_dni,
     dni_a_nombre_completo,
 )
+from integraciones.exportar import boton_descarga_excel
+from integraciones.secuencias import CodigoDuplicadoError
+from integraciones.tipado import registro_en
+from integraciones.vista_paginada import vista_paginada
 
 from comercio.sheets_comercio import (
+    AUTO_SHEET_NAME,
+    ESQUEMA_DOCUMENTOS,
+    EVAL_SHEET_NAME,
     append_evaluacion,
     append_autorizacion,
+    codigo_en_uso,
     documentos_para_evaluacion,
     actualizar_estado_documento,
-    leer_evaluaciones,
+    fuente_hoja,
     leer_autorizaciones,
+    leer_evaluaciones,
+    liberar_codigos,
+    proponer_codigo,
+    refrescar_cache,
+    reservar_codigos,
+    unidad_de_trabajo,
 )
 
+ETIQUETAS_CODIGO = {
+    "evaluacion": "evaluación",
+    "resolucion": "resolución",
+    "certificado": "certificado",
+}
+
 # ========= Utils locales =========
 def asegurar_dirs():
     os.makedirs("salidas", exist_ok=True)
@@ -56,6 +79,53 @@ def fmt_fecha_corta(d) -> str:
         return ""
 
 
+def _anio_de(d) -> int:
+    try:
+        return int(pd.to_datetime(d).year)
+    except Exception:
+        return date.today().year
+
+
+# ========= Códigos (evaluación / resolución / certificado) =========
+# Fallas al consultar el registro de códigos: la base local (SQLite) o la
+# lectura de Sheets con que se siembra (OSError incluye los de red)
+ERRORES_REGISTRO_CODIGOS = (sqlite3.Error, gspread.exceptions.APIError, OSError)
+
+
+def _sugerir_codigo(key: str, tipo: str) -> None:
+    """
+    Si el campo está vacío, lo precarga con el siguiente código libre del
+    año. Debe llamarse ANTES de crear el input.
+    """
+    if st.session_state.get(key):
+        return
+    try:
+        st.session_state[key] = proponer_codigo(tipo, date.today().year)
+    except ERRORES_REGISTRO_CODIGOS as e:
+        st.caption(
+            f"No se pudo sugerir el N° de {ETIQUETAS_CODIGO[tipo]} ({e}); "
+            "escríbelo a mano."
+        )
+
+
+def _avisar_codigo_repetido(tipo: str, anio: int, codigo: str) -> None:
+    if not codigo:
+        return
+    try:
+        repetido = codigo_en_uso(tipo, anio, codigo)
+    except ERRORES_REGISTRO_CODIGOS as e:
+        st.warning(
+            f"⚠️ No se pudo verificar si el N° de {ETIQUETAS_CODIGO[tipo]} "
+            f"{codigo} ya está registrado ({e}). Se volverá a verificar al guardar."
+        )
+        return
+    if repetido:
+        st.warning(
+            f"⚠️ El N° de {ETIQUETAS_CODIGO[tipo]} {codigo} ya está "
+            f"registrado en {anio}. No se podrá guardar en BD."
+        )
+
+
 def fmt_fecha_larga(d) -> str:
     meses = [
         "enero",
@@ -368,6 +438,9 @@ def run_permisos_comercio():
     # ----- 1.1 Selección de Documento Simple pendiente (opcional) -----
     st.subheader("1.1 Seleccionar Documento Simple pendiente (opcional)")
 
+    if st.button("🔄 Actualizar datos desde Google Sheets", key="refrescar_permisos"):
+        refrescar_cache()
+
     try:
         df_docs = documentos_para_evaluacion()
     except Exception as e:
@@ -390,7 +463,7 @@ def run_permisos_comercio():
         )
 
         if st.button("📥 Cargar datos del D.S. seleccionado"):
-            fila = df_docs.iloc[int(idx_sel)]
+            fila = registro_en(df_docs, int(idx_sel), ESQUEMA_DOCUMENTOS)
 
             st.session_state["ds"] = str(
                 fila.get("N° DE DOCUMENTO SIMPLE", "")
@@ -484,6 +557,7 @@ def run_permisos_comercio():
         index=0 if st.session_state.get("sexo", "Femenino") == "Femenino" else 1,
     )
 
+    _sugerir_codigo("cod_evaluacion", "evaluacion")
     cod_evaluacion = text_input_upper(
         "Código de evaluación*",
         key="cod_evaluacion",
@@ -642,6 +716,7 @@ def run_permisos_comercio():
             }
             st.session_state["eval_ctx"] = ctx_eval
             anio_eval = pd.to_datetime(fecha_evaluacion).year
+            _avisar_codigo_repetido("evaluacion", anio_eval, cod_evaluacion.strip())
             render_doc(
                 ctx_eval,
                 f"EV. N° {cod_evaluacion}-{anio_eval}_{to_upper(nombre)}",
@@ -668,6 +743,7 @@ def run_permisos_comercio():
         )
         c0 = st.columns(2)
         with c0[0]:
+            _sugerir_codigo("cod_resolucion", "resolucion")
             cod_resolucion = text_input_upper(
                 "N° de resolución*",
                 key="cod_resolucion",
@@ -701,6 +777,7 @@ def run_permisos_comercio():
 
         c6 = st.columns(2)
         with c6[0]:
+            _sugerir_codigo("cod_certificacion", "certificado")
             cod_certificacion = text_input_upper(
                 "N° de Certificado*",
                 key="cod_certificacion",
@@ -831,6 +908,9 @@ def run_permisos_comercio():
                 st.error("Faltan campos de Resolución: " + ", ".join(falt))
             else:
                 anio_res = pd.to_datetime(fecha_resolucion).year
+                _avisar_codigo_repetido(
+                    "resolucion", anio_res, str(cod_resolucion).strip()
+                )
                 vigencia_texto = build_vigencia(res_vig_ini, res_vig_fin)
 
                 ctx_res = {
@@ -909,6 +989,9 @@ def run_permisos_comercio():
                 st.error("Faltan campos: " + ", ".join(falt))
             else:
                 anio_cert = pd.to_datetime(fecha_certificado).year
+                _avisar_codigo_repetido(
+                    "certificado", anio_cert, str(v_cod_cert).strip()
+                )
                 ctx_cert = {
                     "codigo_certificado": str(v_cod_cert).strip(),
                     "ds": str(eva.get("ds", "")).strip(),
@@ -975,73 +1058,106 @@ def run_permisos_comercio():
                     + ", ".join(falt_bd)
                 )
             else:
+                # Los tres códigos se reservan juntos: si alguno ya existe
+                # en su año, no se guarda nada.
+                codigos = {
+                    "evaluacion": (
+                        _anio_de(eva.get("fecha_evaluacion_raw")),
+                        str(eva.get("cod_evaluacion", "")).strip(),
+                    ),
+                    "resolucion": (
+                        _anio_de(fecha_resolucion_val),
+                        str(cod_resolucion_val).strip(),
+                    ),
+                    "certificado": (
+                        _anio_de(fecha_cert_val),
+                        str(cod_cert_val).strip(),
+                    ),
+                }
+                reservados = False
                 try:
+                    reservar_codigos(codigos)
+                    reservados = True
+
                     vigencia_txt = build_vigencia(
                         res_vig_ini_val, res_vig_fin_val
                     )
 
-                    # Evaluaciones_CA
-                    append_evaluacion(
-                        num_ds=eva.get("ds", ""),
-                        nombre_completo=eva.get("nombre", ""),
-                        cod_evaluacion=eva.get("cod_evaluacion", ""),
-                        fecha_eval=fmt_fecha_corta(
-                            eva.get("fecha_evaluacion_raw", "")
-                        ),
-                        cod_resolucion=str(cod_resolucion_val),
-                        fecha_resolucion=fmt_fecha_corta(
-                            fecha_resolucion_val
-                        ),
-                        num_autorizacion=str(cod_cert_val),
-                        fecha_autorizacion=fmt_fecha_corta(fecha_cert_val),
-                    )
-
-                    # Autorizaciones_CA
-                    append_autorizacion(
-                        fecha_ingreso=fmt_fecha_corta(
-                            eva.get("fecha_ingreso_raw", "")
-                        ),
-                        ds=eva.get("ds", ""),
-                        nombre=eva.get("nombre", ""),
-                        dni=eva.get("dni", ""),
-                        genero=eva.get("sexo", ""),
-                        domicilio_fiscal=eva.get("domicilio", ""),
-                        certificado_anterior=str(antiguo_cert or ""),
-                        fecha_emitida_cert_anterior=fmt_fecha_corta(
-                            fecha_cert_ant_emision
-                        ),
-                        fecha_caducidad_cert_anterior=fmt_fecha_corta(
-                            fecha_cert_ant_cad
-                        ),
-                        num_eval=eva.get("cod_evaluacion", ""),
-                        fecha_eval=fmt_fecha_corta(
-                            eva.get("fecha_evaluacion_raw", "")
-                        ),
-                        num_resolucion=str(cod_resolucion_val),
-                        fecha_resolucion=fmt_fecha_corta(
-                            fecha_resolucion_val
-                        ),
-                        num_certificado=str(cod_cert_val),
-                        fecha_emitida_cert=fmt_fecha_corta(fecha_cert_val),
-                        vigencia_autorizacion=vigencia_txt,
-                        lugar_venta=eva.get("ubicacion", ""),
-                        referencia=eva.get("referencia", ""),
-                        giro=eva.get("giro", ""),
-                        horario=eva.get("horario", ""),
-                        telefono=eva.get("telefono", ""),
-                        tiempo=str(eva.get("tiempo", "")),
-                        plazo=str(eva.get("plazo", "")),
-                    )
+                    # Una sola escritura para las tres hojas (al salir del with)
+                    with unidad_de_trabajo():
+                        # Evaluaciones_CA
+                        append_evaluacion(
+                            num_ds=eva.get("ds", ""),
+                            nombre_completo=eva.get("nombre", ""),
+                            cod_evaluacion=eva.get("cod_evaluacion", ""),
+                            fecha_eval=fmt_fecha_corta(
+                                eva.get("fecha_evaluacion_raw", "")
+                            ),
+                            cod_resolucion=str(cod_resolucion_val),
+                            fecha_resolucion=fmt_fecha_corta(
+                                fecha_resolucion_val
+                            ),
+                            num_autorizacion=str(cod_cert_val),
+                            fecha_autorizacion=fmt_fecha_corta(fecha_cert_val),
+                        )
 
-                    if eva.get("ds"):
-                        actualizar_estado_documento(
-                            eva.get("ds", ""), "AUTORIZADO"
+                        # Autorizaciones_CA
+                        append_autorizacion(
+                            fecha_ingreso=fmt_fecha_corta(
+                                eva.get("fecha_ingreso_raw", "")
+                            ),
+                            ds=eva.get("ds", ""),
+                            nombre=eva.get("nombre", ""),
+                            dni=eva.get("dni", ""),
+                            genero=eva.get("sexo", ""),
+                            domicilio_fiscal=eva.get("domicilio", ""),
+                            certificado_anterior=str(antiguo_cert or ""),
+                            fecha_emitida_cert_anterior=fmt_fecha_corta(
+                                fecha_cert_ant_emision
+                            ),
+                            fecha_caducidad_cert_anterior=fmt_fecha_corta(
+                                fecha_cert_ant_cad
+                            ),
+                            num_eval=eva.get("cod_evaluacion", ""),
+                            fecha_eval=fmt_fecha_corta(
+                                eva.get("fecha_evaluacion_raw", "")
+                            ),
+                            num_resolucion=str(cod_resolucion_val),
+                            fecha_resolucion=fmt_fecha_corta(
+                                fecha_resolucion_val
+                            ),
+                            num_certificado=str(cod_cert_val),
+                            fecha_emitida_cert=fmt_fecha_corta(fecha_cert_val),
+                            vigencia_autorizacion=vigencia_txt,
+                            lugar_venta=eva.get("ubicacion", ""),
+                            referencia=eva.get("referencia", ""),
+                            giro=eva.get("giro", ""),
+                            horario=eva.get("horario", ""),
+                            telefono=eva.get("telefono", ""),
+                            tiempo=str(eva.get("tiempo", "")),
+                            plazo=str(eva.get("plazo", "")),
                         )
 
+                        if eva.get("ds"):
+                            actualizar_estado_documento(
+                                eva.get("ds", ""), "AUTORIZADO"
+                            )
+
                     st.success(
                         "Evaluación, Resolución y Certificado guardados en Google Sheets."
                     )
+                except CodigoDuplicadoError as e:
+                    repetidos = ", ".join(
+                        f"{ETIQUETAS_CODIGO.get(reg.rsplit('.', 1)[-1], reg)} "
+                        f"{cod} ({anio})"
+                        for reg, anio, cod in e.duplicados
+                    )
+                    st.error(
+                        "No se guardó en BD: ya existe el N° de " + repetidos
+                    )
                 except Exception as e:
+                    if reservados:
+                        liberar_codigos(codigos)
                     tb = traceback.format_exc()
                     st.error(f"No se pudo guardar todo en BD: {e}")
                     st.code(tb, language="python")
@@ -1051,25 +1167,36 @@ def run_permisos_comercio():
     st.subheader("4.2 Ver registros en Google Sheets (solo lectura)")
 
     with st.expander("📊 Ver tablas de Evaluaciones y Autorizaciones"):
-        try:
-            tabs = st.tabs(["Evaluaciones_CA", "Autorizaciones_CA"])
-
-            with tabs[0]:
-                df_eva = leer_evaluaciones()
-                if df_eva.empty:
-                    st.info("No hay registros en Evaluaciones_CA.")
-                else:
-                    st.dataframe(df_eva, use_container_width=True)
-
-            with tabs[1]:
-                df_auto = leer_autorizaciones()
-                if df_auto.empty:
-                    st.info("No hay registros en Autorizaciones_CA.")
-                else:
-                    st.dataframe(df_auto, use_container_width=True)
-
-        except Exception as e:
-            st.error(f"No se pudo leer las tablas de Google Sheets: {e}")
+        # Paginadas: solo se traen las filas de la página que se muestra
+        tabs = st.tabs([EVAL_SHEET_NAME, AUTO_SHEET_NAME])
+
+        with tabs[0]:
+            vista_paginada(
+                fuente_hoja(EVAL_SHEET_NAME),
+                "vista_evaluaciones",
+                columnas_filtro=["NUMERO DE DOCUMENTO SIMPLE", "NOMBRES Y APELLIDOS"],
+            )
+            boton_descarga_excel(
+                "⬇️ Descargar Evaluaciones como Excel",
+                leer_evaluaciones,
+                "EVALUACIONES_CA.xlsx",
+                hoja=EVAL_SHEET_NAME,
+                key="descargar_evaluaciones",
+            )
+
+        with tabs[1]:
+            vista_paginada(
+                fuente_hoja(AUTO_SHEET_NAME),
+                "vista_autorizaciones",
+                columnas_filtro=["DNI", "NOMBRE Y APELLIDO", "N° DE CERTIFICADO"],
+            )
+            boton_descarga_excel(
+                "⬇️ Descargar Autorizaciones como Excel",
+                leer_autorizaciones,
+                "AUTORIZACIONES_CA.xlsx",
+                hoja=AUTO_SHEET_NAME,
+                key="descargar_autorizaciones",
+            )
 
     st.markdown("</div>", unsafe_allow_html=True)
 
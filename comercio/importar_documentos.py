@@ -0,0 +1,375 @@
+# comercio/importar_documentos.py
+"""
+Importación masiva de Documentos Simples desde Excel (.xlsx) o CSV.
+
+- El archivo se lee por bloques (openpyxl en modo read_only / csv.reader),
+  sin cargarlo entero como DataFrame. Las filas vacías (o solo con
+  separadores) se omiten y FILA es la fila real del archivo.
+- Las columnas del archivo se mapean a COLUMNAS_DOCUMENTOS por nombre
+  (sin tildes ni mayúsculas) o por alias (ver ALIAS_COLUMNAS).
+- Validaciones vectorizadas por bloque: campos obligatorios, DNI de 8
+  dígitos, fechas dd/mm/aaaa, ASUNTO, PROCEDENTE / IMPROCEDENTE, ESTADO y
+  N° de D.S. repetido (dentro del archivo o ya registrado, también en
+  los archivos anuales).
+- Las filas válidas se escriben en UNA sola llamada (append en bloque,
+  con correlativo N°). Las rechazadas vuelven en un reporte con la fila
+  del archivo y el motivo.
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import os
+import re
+import unicodedata
+from datetime import date, datetime
+from typing import BinaryIO, Dict, Iterator, List, Optional, Sequence, Set, Union
+
+import pandas as pd
+
+from comercio.sheets_comercio import (
+    ASUNTOS_EVALUACION,
+    COLUMNAS_DOCUMENTOS,
+    DOCS_SHEET_NAME,
+    ESTADOS_DOCUMENTO,
+    append_documentos,
+    leer_archivados,
+    leer_hojas,
+)
+from integraciones.gsheets import normalizar_clave
+
+TAM_BLOQUE = 2000
+
+COL_DS = "N° DE DOCUMENTO SIMPLE"
+
+COLUMNAS_FECHA = ["FECHA DE INGRESO", "FECHA DE LA CARTA", "FECHA DE NOTIFICACION"]
+
+# Mismos obligatorios que el registro manual (app_documentos.py)
+OBLIGATORIAS = [
+    "FECHA DE INGRESO",
+    COL_DS,
+    "ASUNTO",
+    "NOMBRE Y APELLIDO",
+    "DNI",
+    "DOMICILIO FISCAL",
+    "GIRO O MOTIVO DE LA SOLICITUD",
+    "UBICACIÓN A SOLICITAR",
+    "PROCEDENTE / IMPROCEDENTE",
+]
+
+# Nombres alternativos frecuentes en las planillas antiguas
+ALIAS_COLUMNAS: Dict[str, str] = {
+    "DS": COL_DS,
+    "D S": COL_DS,
+    "N DS": COL_DS,
+    "N D S": COL_DS,
+    "DOCUMENTO SIMPLE": COL_DS,
+    "N DOCUMENTO SIMPLE": COL_DS,
+    "NOMBRE": "NOMBRE Y APELLIDO",
+    "NOMBRES Y APELLIDOS": "NOMBRE Y APELLIDO",
+    "APELLIDOS Y NOMBRES": "NOMBRE Y APELLIDO",
+    "DOMICILIO": "DOMICILIO FISCAL",
+    "GIRO": "GIRO O MOTIVO DE LA SOLICITUD",
+    "MOTIVO": "GIRO O MOTIVO DE LA SOLICITUD",
+    "UBICACION": "UBICACIÓN A SOLICITAR",
+    "CELULAR": "N° DE CELULAR",
+    "TELEFONO": "N° DE CELULAR",
+    "N TELEFONO": "N° DE CELULAR",
+    "PROCEDENCIA": "PROCEDENTE / IMPROCEDENTE",
+    "PROCEDENTE": "PROCEDENTE / IMPROCEDENTE",
+    "FECHA": "FECHA DE INGRESO",
+    "CARTA": "N° DE CARTA",
+}
+
+
+def _clave_nombre(texto: object) -> str:
+    """'N° de Documento  Simple' -> 'N DE DOCUMENTO SIMPLE' (para comparar)."""
+    t = unicodedata.normalize("NFKD", str(texto or ""))
+    t = "".join(c for c in t if not unicodedata.combining(c)).upper()
+    return re.sub(r"[^0-9A-Z]+", " ", t).strip()
+
+
+_POR_NOMBRE = {_clave_nombre(c): c for c in COLUMNAS_DOCUMENTOS}
+_POR_NOMBRE.update({_clave_nombre(a): c for a, c in ALIAS_COLUMNAS.items()})
+
+
+def mapear_columnas(encabezado: Sequence[object]) -> Dict[int, str]:
+    """
+    {posición en el archivo: columna de Documentos_CA}. Las columnas que
+    no se reconocen se ignoran; si una columna aparece dos veces, vale la
+    primera.
+    """
+    mapa: Dict[int, str] = {}
+    for i, nombre in enumerate(encabezado):
+        col = _POR_NOMBRE.get(_clave_nombre(nombre))
+        if col and col not in mapa.values():
+            mapa[i] = col
+    return mapa
+
+
+# ---------------------------------------------------------------------------
+# LECTURA POR BLOQUES
+# ---------------------------------------------------------------------------
+
+
+def _celda(valor: object) -> str:
+    """Valor de Excel a texto (fechas en dd/mm/aaaa, 12345678.0 -> '12345678')."""
+    if valor is None:
+        return ""
+    if isinstance(valor, (datetime, date)):
+        return valor.strftime("%d/%m/%Y")
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return str(valor).strip()
+
+
+def _bloques_xlsx(archivo, tam_bloque: int) -> Iterator[pd.DataFrame]:
+    from openpyxl import load_workbook
+
+    wb = load_workbook(archivo, read_only=True, data_only=True)
+    try:
+        filas = wb.active.iter_rows(values_only=True)
+        mapa: Optional[Dict[int, str]] = None
+        bloque: List[List[str]] = []
+        numeros: List[int] = []
+        for num_fila, fila in enumerate(filas, start=1):
+            if mapa is None:
+                if any(v not in (None, "") for v in fila):
+                    mapa = mapear_columnas(fila)
+                continue
+            if all(v in (None, "") for v in fila):
+                continue
+            bloque.append([_celda(fila[i]) if i < len(fila) else "" for i in mapa])
+            numeros.append(num_fila)
+            if len(bloque) >= tam_bloque:
+                yield _bloque_df(bloque, numeros, mapa)
+                bloque, numeros = [], []
+        if bloque:
+            yield _bloque_df(bloque, numeros, mapa)
+    finally:
+        wb.close()
+
+
+def _bloques_csv(archivo, tam_bloque: int) -> Iterator[pd.DataFrame]:
+    binario = open(archivo, "rb") if isinstance(archivo, str) else archivo
+    try:
+        # Codificación y separador a partir de una muestra del inicio
+        muestra = binario.read(64 * 1024)
+        binario.seek(0)
+        try:
+            muestra.decode("utf-8-sig")
+            codificacion = "utf-8-sig"
+        except UnicodeDecodeError as e:
+            # Un carácter cortado al final de la muestra no cuenta
+            ok = e.start >= len(muestra) - 3
+            codificacion = "utf-8-sig" if ok else "latin-1"  # CSV de Excel en Windows
+        texto_muestra = muestra.decode(codificacion, errors="ignore")
+        try:
+            sep = csv.Sniffer().sniff(texto_muestra[:4096], delimiters=",;\t|").delimiter
+        except csv.Error:
+            sep = ","
+
+        texto = io.TextIOWrapper(binario, encoding=codificacion, newline="")
+        lector = csv.reader(texto, delimiter=sep)
+        mapa: Optional[Dict[int, str]] = None
+        bloque: List[List[str]] = []
+        numeros: List[int] = []
+        fin_anterior = 0
+        for fila in lector:
+            # Fila del archivo donde empieza el registro: una celda entre
+            # comillas puede ocupar varias líneas
+            num_fila, fin_anterior = fin_anterior + 1, lector.line_num
+            # Líneas en blanco o solo con separadores (;;;;) se omiten
+            if not any(v.strip() for v in fila):
+                continue
+            if mapa is None:
+                mapa = mapear_columnas(fila)
+                continue
+            bloque.append([fila[i].strip() if i < len(fila) else "" for i in mapa])
+            numeros.append(num_fila)
+            if len(bloque) >= tam_bloque:
+                yield _bloque_df(bloque, numeros, mapa)
+                bloque, numeros = [], []
+        if bloque:
+            yield _bloque_df(bloque, numeros, mapa)
+        texto.detach()  # sin cerrar el archivo subido (lo maneja quien llama)
+    finally:
+        if isinstance(archivo, str):
+            binario.close()
+
+
+def _bloque_df(valores: List[List[str]], numeros: List[int], mapa: Dict[int, str]) -> pd.DataFrame:
+    df = pd.DataFrame(valores, columns=list(mapa.values()), dtype=str)
+    df = df.reindex(columns=COLUMNAS_DOCUMENTOS, fill_value="").fillna("")
+    df.insert(0, "FILA", numeros)
+    return df
+
+
+def leer_bloques(
+    archivo: Union[str, BinaryIO], nombre: str = "", tam_bloque: int = TAM_BLOQUE
+) -> Iterator[pd.DataFrame]:
+    """
+    Recorre el archivo (.xlsx o .csv) en bloques de 'tam_bloque' filas,
+    ya mapeados a COLUMNAS_DOCUMENTOS + "FILA" (número de fila del archivo).
+    """
+    nombre = nombre or (archivo if isinstance(archivo, str) else getattr(archivo, "name", ""))
+    extension = os.path.splitext(str(nombre))[1].lower()
+    if extension in (".xlsx", ".xlsm"):
+        return _bloques_xlsx(archivo, tam_bloque)
+    if extension in (".csv", ".txt"):
+        return _bloques_csv(archivo, tam_bloque)
+    raise ValueError("Formato no soportado: use un archivo .xlsx o .csv")
+
+
+# ---------------------------------------------------------------------------
+# VALIDACIÓN (vectorizada por bloque)
+# ---------------------------------------------------------------------------
+
+
+def _normalizar_fechas(serie: pd.Series) -> tuple:
+    """(texto dd/mm/aaaa, máscara de fechas inválidas no vacías)."""
+    texto = serie.str.strip()
+    f = pd.to_datetime(texto, format="%d/%m/%Y", errors="coerce")
+    f = f.fillna(pd.to_datetime(texto, format="%Y-%m-%d", errors="coerce"))
+    invalidas = f.isna() & (texto != "")
+    return f.dt.strftime("%d/%m/%Y").fillna(""), invalidas
+
+
+def validar_bloque(
+    df: pd.DataFrame, registrados: Set[str], vistos: Set[str]
+) -> tuple:
+    """
+    Valida y normaliza un bloque. Devuelve (válidas, rechazadas); las
+    rechazadas llevan la columna MOTIVO. 'vistos' se actualiza con los
+    N° de D.S. aceptados (para detectar repetidos entre bloques).
+    """
+    df = df.copy()
+    for col in COLUMNAS_DOCUMENTOS:
+        df[col] = df[col].astype(str).str.strip()
+
+    texto_cols = [
+        "ASUNTO",
+        "NOMBRE Y APELLIDO",
+        "DOMICILIO FISCAL",
+        "GIRO O MOTIVO DE LA SOLICITUD",
+        "UBICACIÓN A SOLICITAR",
+        "PROCEDENTE / IMPROCEDENTE",
+        "N° DE CARTA",
+        "FOLIOS",
+        "ESTADO",
+    ]
+    for col in texto_cols:
+        df[col] = df[col].str.upper()
+    # "RENOVACIÓN" -> "RENOVACION" (como lo guarda el registro manual)
+    canonicos = {_clave_nombre(a): a for a in ASUNTOS_EVALUACION}
+    df["ASUNTO"] = df["ASUNTO"].map(
+        {v: canonicos.get(_clave_nombre(v), v) for v in df["ASUNTO"].unique()}
+    )
+    df["ESTADO"] = df["ESTADO"].mask(df["ESTADO"] == "", "PENDIENTE")
+    df["DNI"] = df["DNI"].str.replace(r"\.0$", "", regex=True)
+
+    problemas = []
+    for col in OBLIGATORIAS:
+        problemas.append((df[col] == "", f"falta {col}"))
+
+    for col in COLUMNAS_FECHA:
+        df[col], invalidas = _normalizar_fechas(df[col])
+        problemas.append((invalidas, f"{col} no es una fecha dd/mm/aaaa"))
+
+    problemas.append(
+        ((df["DNI"] != "") & ~df["DNI"].str.fullmatch(r"\d{8}"), "DNI debe tener 8 dígitos")
+    )
+    problemas.append(
+        (
+            (df["PROCEDENTE / IMPROCEDENTE"] != "")
+            & ~df["PROCEDENTE / IMPROCEDENTE"].isin({"PROCEDENTE", "IMPROCEDENTE"}),
+            "PROCEDENTE / IMPROCEDENTE debe ser PROCEDENTE o IMPROCEDENTE",
+        )
+    )
+    problemas.append(
+        (~df["ESTADO"].isin(ESTADOS_DOCUMENTO), "ESTADO no válido")
+    )
+
+    claves = df[COL_DS].map(normalizar_clave)
+    problemas.append(
+        ((claves != "") & claves.isin(registrados), "D.S. ya registrado")
+    )
+    problemas.append(
+        (
+            (claves != "") & (claves.isin(vistos) | claves.duplicated(keep="first")),
+            "D.S. repetido en el archivo",
+        )
+    )
+
+    motivo = pd.Series("", index=df.index)
+    for mascara, texto in problemas:
+        motivo = motivo.mask(mascara, motivo + texto + "; ")
+    motivo = motivo.str.rstrip("; ")
+
+    ok = motivo == ""
+    vistos.update(claves[ok].tolist())
+    rechazadas = df[~ok].copy()
+    rechazadas["MOTIVO"] = motivo[~ok]
+    return df[ok], rechazadas
+
+
+# ---------------------------------------------------------------------------
+# IMPORTACIÓN
+# ---------------------------------------------------------------------------
+
+
+def importar_documentos(
+    archivo: Union[str, BinaryIO],
+    nombre: str = "",
+    escribir: bool = True,
+    tam_bloque: int = TAM_BLOQUE,
+) -> Dict[str, object]:
+    """
+    Importa los D.S. del archivo. Con escribir=False solo valida (vista
+    previa). Devuelve:
+
+        {"leidas": int, "importadas": int, "validas": DataFrame,
+         "rechazadas": DataFrame (FILA + columnas + MOTIVO)}
+    """
+    # D.S. de la hoja activa y de los archivos "<hoja> <año>"
+    existentes = leer_hojas({DOCS_SHEET_NAME: [COL_DS]})[DOCS_SHEET_NAME]
+    archivados = leer_archivados(DOCS_SHEET_NAME)
+    registrados = {
+        normalizar_clave(v)
+        for v in existentes[COL_DS].tolist() + archivados[COL_DS].tolist()
+    }
+    registrados.discard("")
+    vistos: Set[str] = set()
+
+    leidas = 0
+    validas: List[pd.DataFrame] = []
+    rechazadas: List[pd.DataFrame] = []
+    for bloque in leer_bloques(archivo, nombre, tam_bloque):
+        leidas += len(bloque)
+        ok, mal = validar_bloque(bloque, registrados, vistos)
+        validas.append(ok)
+        rechazadas.append(mal)
+
+    df_validas = (
+        pd.concat(validas, ignore_index=True)
+        if validas
+        else pd.DataFrame(columns=["FILA"] + COLUMNAS_DOCUMENTOS)
+    )
+    df_rechazadas = (
+        pd.concat(rechazadas, ignore_index=True)
+        if rechazadas
+        else pd.DataFrame(columns=["FILA"] + COLUMNAS_DOCUMENTOS + ["MOTIVO"])
+    )
+
+    importadas = 0
+    if escribir and not df_validas.empty:
+        append_documentos(df_validas[COLUMNAS_DOCUMENTOS].to_dict("records"))
+        importadas = len(df_validas)
+
+    return {
+        "leidas": leidas,
+        "importadas": importadas,
+        "validas": df_validas,
+        "rechazadas": df_rechazadas,
+    }
@@ -7,16 +7,55 @@ Manejo de Google Sheets para Comercio Ambulatorio:
     • Evaluaciones_CA
     • Autorizaciones_CA
     • Documentos_CA  (registro de Documentos Simples)
+- Las lecturas se sirven desde una caché compartida (ver
+  integraciones/sheets_cache.py); las escrituras la parchan en memoria.
+- Al vencer la caché, si el libro no cambió (revisión en Drive) no se
+  vuelve a bajar nada (ver integraciones/sheets_sync.py).
+- Modo opcional ALMACENAMIENTO_REGISTROS="sqlite": SQLite local es el
+  sistema de registro y Google Sheets se actualiza en segundo plano
+  (ver integraciones/sqlite_store.py).
+- Los registros cerrados se pueden mover a hojas "<hoja> <año>"
+  (archivar_cerrados); las lecturas normales solo ven la hoja activa y
+  leer_con_archivo() / buscar_por_dni(..., incluir_archivo=True) cruzan
+  los archivos (ver integraciones/archivo_anual.py).
 """
 
 from __future__ import annotations
 
-from typing import List, Dict
+from datetime import date
+from typing import Callable, ContextManager, List, Dict, Optional, Sequence, Tuple, TypeVar
 
 import gspread
 import pandas as pd
-import streamlit as st
-from google.oauth2.service_account import Credentials
+
+from integraciones.gsheets import (
+    Numerador,
+    actualizar_por_clave,
+    append_filas,
+    con_worksheet,
+    leer_columnas,
+    obtener_libro,
+    obtener_worksheet,
+    reescribir_versionado,
+    valores_a_df,
+)
+from integraciones import (
+    secuencias,
+    sheets_cache,
+    sheets_sync,
+    sqlite_store,
+    versiones,
+)
+from integraciones.almacen import Almacen, abrir_almacen
+from integraciones.archivo_anual import COLUMNA_ANIO_ARCHIVO, archivar_filas, con_archivo
+from integraciones.archivo_anual import leer_archivados as _leer_archivados
+from integraciones.google_cliente import cliente_gspread
+from integraciones.paginacion import FuenteHoja
+from integraciones.tipado import Esquema, tipar
+from integraciones.unidad_trabajo import UnidadDeTrabajo, unidad_activa
+from integraciones.unidad_trabajo import unidad_de_trabajo as _unidad_de_trabajo
+
+T = TypeVar("T")
 
 # ---------------------------------------------------------------------------
 # CONFIG BÁSICA
@@ -29,11 +68,6 @@ EVAL_SHEET_NAME = "Evaluaciones_CA"
 AUTO_SHEET_NAME = "Autorizaciones_CA"
 DOCS_SHEET_NAME = "Documentos_CA"
 
-SCOPES = [
-    "https://www.googleapis.com/auth/spreadsheets",
-    "https://www.googleapis.com/auth/drive",
-]
-
 # ---------------------------------------------------------------------------
 # COLUMNAS
 # ---------------------------------------------------------------------------
@@ -95,43 +129,94 @@ COLUMNAS_DOCUMENTOS: List[str] = [
     "FOLIOS",
 ]
 
+ESTADOS_DOCUMENTO: List[str] = ["PENDIENTE", "EN EVALUACION", "AUTORIZADO", "IMPROCEDENTE"]
+
+# Asuntos de D.S. que pasan a Evaluación (el resto es texto libre: "OTROS")
+ASUNTOS_EVALUACION: List[str] = ["RENOVACION", "SOLICITUD DE COMERCIO AMBULATORIO"]
+
+# Versiones tipadas (ver integraciones.tipado): categorías y fechas dd/mm/aaaa
+ESQUEMA_EVALUACION = Esquema(
+    "Evaluacion",
+    COLUMNAS_EVALUACION,
+    fechas=["FECHA", "FECHA DE RESOLUCIÓN", "FECHA DE AUTORIZACION"],
+)
+
+ESQUEMA_AUTORIZACION = Esquema(
+    "Autorizacion",
+    COLUMNAS_AUTORIZACION,
+    categoricas=["GENERO", "GIRO"],
+    fechas=[
+        "FECHA DE INGRESO",
+        "FECHA EMITIDA CERTIFICADO ANTERIOR",
+        "FECHA DE CADUCIDAD CERTIFICADO ANTERIOR",
+        "FECHA DE EVALUACION",
+        "FECHA RESOLUCIÓN",
+        "FECHA EMITIDA CERTIFICADO",
+    ],
+)
+
+ESQUEMA_DOCUMENTOS = Esquema(
+    "Documento",
+    COLUMNAS_DOCUMENTOS,
+    categoricas=["ESTADO", "ASUNTO", "PROCEDENTE / IMPROCEDENTE"],
+    fechas=["FECHA DE INGRESO", "FECHA DE LA CARTA", "FECHA DE NOTIFICACION"],
+)
+
+# Columna clave de negocio de cada hoja (vistas paginadas: ver fuente_hoja)
+CLAVE_POR_HOJA: Dict[str, str] = {
+    EVAL_SHEET_NAME: "N° DE EVALUACIÓN",
+    AUTO_SHEET_NAME: "N° DE EVALUACION",
+    DOCS_SHEET_NAME: "N° DE DOCUMENTO SIMPLE",
+}
+
 # ---------------------------------------------------------------------------
-# CLIENTE GSPREAD
+# CLIENTE GSPREAD / BACKEND DE ALMACENAMIENTO
 # ---------------------------------------------------------------------------
 
 
-@st.cache_resource
-def _get_client() -> gspread.Client:
+def _get_client() -> Almacen:
     """
-    Crea el cliente de Google Sheets usando st.secrets["gcp_service_account"].
+    Backend de almacenamiento (ALMACENAMIENTO_SHEETS): el cliente gspread
+    o un backend local "memoria" / "archivo" (ver integraciones.almacen).
+    El cliente gspread es el mismo para todos los módulos
+    (ver integraciones.google_cliente).
     """
-    creds_info = st.secrets["gcp_service_account"]
-    creds = Credentials.from_service_account_info(creds_info, scopes=SCOPES)
-    client = gspread.authorize(creds)
-    return client
+    return abrir_almacen(cliente_gspread)
 
 
-def _get_spreadsheet():
-    client = _get_client()
-    return client.open_by_key(SPREADSHEET_ID_COMERCIO)
+def _get_spreadsheet() -> gspread.Spreadsheet:
+    return obtener_libro(_get_client(), SPREADSHEET_ID_COMERCIO)
 
 
 def _get_worksheet(sheet_name: str, columnas: List[str]) -> gspread.Worksheet:
     """
-    Devuelve la worksheet indicada. Si no existe, la crea.
-    Si está vacía, escribe la fila de encabezados.
+    Devuelve la worksheet indicada (registro compartido del proceso).
+    Si no existe, la crea. Si está vacía, escribe la fila de encabezados.
+    Ambas cosas se verifican una sola vez por proceso.
     """
-    sh = _get_spreadsheet()
-    try:
-        ws = sh.worksheet(sheet_name)
-    except gspread.exceptions.WorksheetNotFound:
-        ws = sh.add_worksheet(title=sheet_name, rows=1000, cols=len(columnas) + 2)
+    return obtener_worksheet(
+        _get_client(), SPREADSHEET_ID_COMERCIO, sheet_name, columnas
+    )
 
-    values = ws.get_all_values()
-    if not values:
-        ws.update("A1", [columnas])
 
-    return ws
+def _con_worksheet(
+    sheet_name: str,
+    columnas: List[str],
+    fn: Callable[[gspread.Worksheet], T],
+    escritura: bool = False,
+) -> T:
+    """
+    Ejecuta fn(ws); si la hoja fue renombrada/eliminada, se re-resuelve
+    el handle y se reintenta una vez. Las escrituras se serializan por hoja.
+    """
+    return con_worksheet(
+        _get_client(),
+        SPREADSHEET_ID_COMERCIO,
+        sheet_name,
+        columnas,
+        fn,
+        escritura=escritura,
+    )
 
 
 # ---------------------------------------------------------------------------
@@ -139,40 +224,321 @@ def _get_worksheet(sheet_name: str, columnas: List[str]) -> gspread.Worksheet:
 # ---------------------------------------------------------------------------
 
 
+def _clave_cache(sheet_name: str):
+    return (SPREADSHEET_ID_COMERCIO, sheet_name)
+
+
+def _tabla_sqlite(sheet_name: str, columnas: List[str]) -> str:
+    """
+    Tabla SQLite de la hoja (modo sqlite). La primera vez importa el
+    contenido actual de Google Sheets y deja corriendo el replicador.
+    """
+    sqlite_store.registrar_libro(SPREADSHEET_ID_COMERCIO, _get_client)
+    return sqlite_store.asegurar_tabla(
+        SPREADSHEET_ID_COMERCIO,
+        sheet_name,
+        columnas,
+        lambda: _descargar_df(sheet_name, columnas),
+    )
+
+
+COLUMNAS_POR_HOJA: Dict[str, List[str]] = {
+    EVAL_SHEET_NAME: COLUMNAS_EVALUACION,
+    AUTO_SHEET_NAME: COLUMNAS_AUTORIZACION,
+    DOCS_SHEET_NAME: COLUMNAS_DOCUMENTOS,
+}
+
+ESQUEMA_POR_HOJA: Dict[str, Esquema] = {
+    EVAL_SHEET_NAME: ESQUEMA_EVALUACION,
+    AUTO_SHEET_NAME: ESQUEMA_AUTORIZACION,
+    DOCS_SHEET_NAME: ESQUEMA_DOCUMENTOS,
+}
+
+
+def leer_hojas(
+    pedidos: Dict[str, Optional[Sequence[str]]]
+) -> Dict[str, pd.DataFrame]:
+    """
+    Lee varias hojas de una vez: {nombre_hoja: columnas o None (todas)}.
+    Devuelve {nombre_hoja: DataFrame} con todas las columnas como texto.
+
+    - Modo sqlite: un SELECT por tabla, solo con las columnas pedidas.
+    - Lo que siga vigente en la caché compartida sale de memoria.
+    - Las hojas completas que falten se sincronizan juntas (una sonda de
+      revisión y un solo values.batchGet) y quedan en la caché.
+    - Las lecturas parciales que falten se hacen en UNA llamada batchGet
+      que trae solo esas columnas (no se guardan en la caché).
+    """
+    if sqlite_store.modo_sqlite():
+        return {
+            hoja: sqlite_store.leer_df(
+                _tabla_sqlite(hoja, COLUMNAS_POR_HOJA[hoja]),
+                list(cols) if cols is not None else COLUMNAS_POR_HOJA[hoja],
+            )
+            for hoja, cols in pedidos.items()
+        }
+
+    salida: Dict[str, pd.DataFrame] = {}
+    proyectadas: Dict[str, Tuple[List[str], List[str]]] = {}
+    for hoja, cols in pedidos.items():
+        if cols is None:
+            continue
+        df = sheets_cache.proyectar_vigente(_clave_cache(hoja), cols)
+        if df is not None:
+            salida[hoja] = df
+        else:
+            proyectadas[hoja] = (COLUMNAS_POR_HOJA[hoja], list(cols))
+
+    completas = [hoja for hoja, cols in pedidos.items() if cols is None]
+    if completas:
+        por_clave = sheets_cache.leer_varios_cacheado(
+            [_clave_cache(hoja) for hoja in completas],
+            lambda claves: {
+                _clave_cache(hoja): df
+                for hoja, df in _sincronizar_varias([h for _, h in claves]).items()
+            },
+        )
+        for hoja in completas:
+            salida[hoja] = por_clave[_clave_cache(hoja)]
+
+    if proyectadas:
+        salida.update(
+            leer_columnas(_get_client(), SPREADSHEET_ID_COMERCIO, proyectadas)
+        )
+    return {hoja: salida[hoja] for hoja in pedidos}
+
+
 def _leer_df(sheet_name: str, columnas: List[str]) -> pd.DataFrame:
-    ws = _get_worksheet(sheet_name, columnas)
-    values = ws.get_all_values()
+    """
+    Lee la hoja como DataFrame (todas las columnas como texto).
+    Se sirve desde la caché compartida mientras siga vigente
+    (o desde SQLite en modo sqlite); al vencer, solo se vuelve a bajar
+    si la revisión del libro cambió.
+    """
+    return leer_hojas({sheet_name: None})[sheet_name]
+
+
+def _leer_tipado(sheet_name: str) -> pd.DataFrame:
+    """
+    Versión tipada de la hoja (categorías en mayúsculas, fechas como
+    datetime64). Se calcula una vez por copia cargada en la caché.
+    """
+    esquema = ESQUEMA_POR_HOJA[sheet_name]
+    if sqlite_store.modo_sqlite():
+        return tipar(_leer_df(sheet_name, esquema.columnas), esquema)
+
+    return sheets_cache.leer_tipado(
+        _clave_cache(sheet_name),
+        lambda: _sincronizar_df(sheet_name, esquema.columnas),
+        esquema.nombre,
+        lambda df: tipar(df, esquema),
+    )
 
-    if not values:
-        return pd.DataFrame(columns=columnas)
 
-    header = values[0]
-    filas = values[1:]
+def fuente_hoja(sheet_name: str) -> FuenteHoja:
+    """
+    Fuente para vistas paginadas de la hoja (ver integraciones.paginacion):
+    solo se leen las filas de la página que se muestra.
+    """
+    columnas = COLUMNAS_POR_HOJA[sheet_name]
+    return FuenteHoja(
+        SPREADSHEET_ID_COMERCIO,
+        sheet_name,
+        columnas,
+        _get_client,
+        col_sonda=CLAVE_POR_HOJA[sheet_name],
+        col_clave=CLAVE_POR_HOJA[sheet_name],
+        esquema=ESQUEMA_POR_HOJA[sheet_name],
+        tabla_sqlite=lambda: _tabla_sqlite(sheet_name, columnas),
+    )
 
-    df = pd.DataFrame(filas, columns=header)
 
-    # Asegura que existan todas las columnas esperadas
-    for col in columnas:
-        if col not in df.columns:
-            df[col] = ""
+def _buscar(
+    sheet_name: str, columnas: List[str], col: str, valores: List[str]
+) -> pd.DataFrame:
+    """
+    Filas de la hoja cuya 'col' coincide con alguno de 'valores', usando
+    el índice hash de la caché (o el índice de SQLite en modo sqlite).
+    """
+    if sqlite_store.modo_sqlite():
+        tabla = _tabla_sqlite(sheet_name, columnas)
+        return sqlite_store.buscar(tabla, columnas, col, valores)
+
+    return sheets_cache.buscar(
+        _clave_cache(sheet_name),
+        lambda: _sincronizar_df(sheet_name, columnas),
+        col,
+        valores,
+    )
+
+
+def _sincronizar_varias(sheet_names: List[str]) -> Dict[str, pd.DataFrame]:
+    return sheets_sync.sincronizar_varias(
+        _get_client(),
+        SPREADSHEET_ID_COMERCIO,
+        [(hoja, COLUMNAS_POR_HOJA[hoja]) for hoja in sheet_names],
+    )
 
-    df = df[columnas]
-    return df
 
+def _sincronizar_df(sheet_name: str, columnas: List[str]) -> pd.DataFrame:
+    return _sincronizar_varias([sheet_name])[sheet_name]
 
-def _escribir_df(sheet_name: str, columnas: List[str], df: pd.DataFrame) -> None:
-    ws = _get_worksheet(sheet_name, columnas)
 
+def _descargar_df(sheet_name: str, columnas: List[str]) -> pd.DataFrame:
+    # Una sola llamada a la API: el handle y el encabezado ya están validados
+    values = _con_worksheet(sheet_name, columnas, lambda ws: ws.get_all_values())
+    return valores_a_df(values, columnas)
+
+
+def _escribir_df(
+    sheet_name: str,
+    columnas: List[str],
+    df: pd.DataFrame,
+    base: pd.DataFrame,
+) -> Dict[str, object]:
+    """
+    Reescribe la hoja completa con 'df'.
+
+    'base' es el DataFrame leído sobre el que se armó 'df' (obligatorio:
+    la caché al momento de escribir puede ya traer cambios de otros y se
+    pisarían). Si la hoja cambió desde entonces (otra sesión u otro
+    usuario escribió), se fusiona en vez de pisar; en los conflictos por
+    clave (CLAVE_POR_HOJA) queda la versión de 'df'.
+    Devuelve el resumen de versiones.resolver_escritura().
+    """
     df = df.copy()
     for col in columnas:
         if col not in df.columns:
             df[col] = ""
     df = df[columnas].fillna("")
 
-    values = [df.columns.tolist()] + df.astype(str).values.tolist()
+    if sqlite_store.modo_sqlite():
+        tabla = _tabla_sqlite(sheet_name, columnas)
+        with sqlite_store.transaccion():
+            actual = sqlite_store.leer_df(tabla, columnas)
+            final, resumen = versiones.resolver_escritura(
+                base, df, actual, columnas, CLAVE_POR_HOJA.get(sheet_name)
+            )
+            sqlite_store.reescribir(
+                SPREADSHEET_ID_COMERCIO, sheet_name, columnas, tabla, final
+            )
+        sqlite_store.despertar_replicador()
+        return resumen
+
+    final, resumen = _con_worksheet(
+        sheet_name,
+        columnas,
+        lambda ws: reescribir_versionado(
+            ws, columnas, base, df, CLAVE_POR_HOJA.get(sheet_name)
+        ),
+        escritura=True,
+    )
+    sheets_sync.olvidar(_clave_cache(sheet_name))
+    sheets_cache.reemplazar(_clave_cache(sheet_name), final)
+    return resumen
+
+
+def _append_filas(
+    sheet_name: str,
+    columnas: List[str],
+    filas: List[Dict[str, str]],
+    auto_numero_col: str | None = None,
+) -> None:
+    """
+    Agrega varias filas en una sola llamada a la API (sin reescribir la hoja):
+    - cada elemento de 'filas' es un dict {columna: valor}
+    - si auto_numero_col no es None, se rellena con correlativo (1,2,3,...)
+    - dentro de unidad_de_trabajo() solo se registra (se escribe al confirmar)
+    """
+    numerador = (
+        _numerador(sheet_name, columnas, auto_numero_col) if auto_numero_col else None
+    )
+
+    if sqlite_store.modo_sqlite():
+        tabla = _tabla_sqlite(sheet_name, columnas)
+        sqlite_store.append_filas(
+            SPREADSHEET_ID_COMERCIO,
+            sheet_name,
+            columnas,
+            tabla,
+            filas,
+            auto_numero_col,
+            numerador=numerador,
+        )
+        sqlite_store.despertar_replicador()
+        return
+
+    uow = unidad_activa(SPREADSHEET_ID_COMERCIO)
+    if uow is not None:
+        uow.append(
+            sheet_name,
+            columnas,
+            filas,
+            auto_numero_col=auto_numero_col,
+            numerador=numerador,
+        )
+        return
 
-    ws.clear()
-    ws.update("A1", values)
+    escritas = _con_worksheet(
+        sheet_name,
+        columnas,
+        lambda ws: append_filas(
+            ws, columnas, filas, auto_numero_col=auto_numero_col, numerador=numerador
+        ),
+        escritura=True,
+    )
+    sheets_cache.agregar_filas(_clave_cache(sheet_name), columnas, escritas)
+
+
+def _version_hojas(*sheet_names: str) -> tuple:
+    """
+    Versión de los datos de las hojas: la revisión del libro con que se
+    sincronizó la copia vigente de la caché (si venció, se recarga como en
+    cualquier lectura). Cambia cuando una lectura trae cambios de otros:
+    ahí se vuelven a sembrar las secuencias. En modo sqlite la base es la
+    fuente y el asignador vive en ella: no hace falta volver a sembrar.
+    """
+    if sqlite_store.modo_sqlite():
+        return ()
+    for hoja in sheet_names:
+        sheets_cache.asegurar_vigente(
+            _clave_cache(hoja), lambda hoja=hoja: _sincronizar_df(hoja, COLUMNAS_POR_HOJA[hoja])
+        )
+    return tuple(sheets_sync.revision_conocida(_clave_cache(h)) for h in sheet_names)
+
+
+# hoja -> registros archivados (se leen una vez por proceso: los archivos
+# solo cambian con archivar_cerrados(), que limpia esta caché)
+_ARCHIVADOS_SEMILLA: Dict[str, pd.DataFrame] = {}
+
+
+def _archivados_semilla(sheet_name: str) -> pd.DataFrame:
+    df = _ARCHIVADOS_SEMILLA.get(sheet_name)
+    if df is None:
+        df = _ARCHIVADOS_SEMILLA[sheet_name] = leer_archivados(sheet_name)
+    return df
+
+
+def _numerador(sheet_name: str, columnas: List[str], col: str) -> Numerador:
+    """
+    Correlativo de la hoja desde el asignador de secuencias (sin contar
+    filas en cada alta). Se siembra con el mayor N° existente, contando
+    también las hojas de archivo "<hoja> <año>" (los N° archivados no se
+    vuelven a asignar), y de nuevo cuando la caché trae otra revisión.
+    """
+
+    def _semilla() -> int:
+        df = pd.concat(
+            [_leer_df(sheet_name, columnas)[[col]], _archivados_semilla(sheet_name)[[col]]],
+            ignore_index=True,
+        )
+        numeros = pd.to_numeric(df[col], errors="coerce")
+        mayor = int(numeros.max()) if numeros.notna().any() else 0
+        return max(mayor, len(df))
+
+    return lambda cantidad: secuencias.asignar_correlativo(
+        f"{sheet_name}.{col}", cantidad, _semilla, _version_hojas(sheet_name)
+    )
 
 
 def _append_fila(
@@ -186,18 +552,100 @@ def _append_fila(
     - 'fila' es un dict {columna: valor}
     - si auto_numero_col no es None, se rellena con correlativo (1,2,3,...)
     """
-    df = _leer_df(sheet_name, columnas)
+    _append_filas(sheet_name, columnas, [fila], auto_numero_col=auto_numero_col)
+
+
+def _actualizar_por_clave(
+    sheet_name: str,
+    columnas: List[str],
+    col_clave: str,
+    cambios_por_clave: Dict[str, Dict[str, str]],
+) -> int:
+    """
+    Actualiza solo las celdas indicadas de las filas cuya 'col_clave'
+    coincide con cada clave: {clave: {columna: valor}}.
+    Devuelve cuántas filas se actualizaron.
+
+    Dentro de unidad_de_trabajo() solo se registra el cambio (se escribe al
+    confirmar) y se devuelven las filas que hoy coinciden: las de la copia
+    de la caché más las que la misma unidad va a agregar. El conteo leído
+    de la hoja al confirmar lo devuelve UnidadDeTrabajo.confirmar().
+    """
+    if sqlite_store.modo_sqlite():
+        tabla = _tabla_sqlite(sheet_name, columnas)
+        n = sqlite_store.actualizar_por_clave(
+            SPREADSHEET_ID_COMERCIO, sheet_name, columnas, tabla, col_clave, cambios_por_clave
+        )
+        sqlite_store.despertar_replicador()
+        return n
+
+    uow = unidad_activa(SPREADSHEET_ID_COMERCIO)
+    if uow is not None:
+        uow.actualizar_por_clave(sheet_name, columnas, col_clave, cambios_por_clave)
+        claves = list(cambios_por_clave)
+        return len(_buscar(sheet_name, columnas, col_clave, claves)) + uow.filas_pendientes(
+            sheet_name, col_clave, claves
+        )
+
+    n = _con_worksheet(
+        sheet_name,
+        columnas,
+        lambda ws: actualizar_por_clave(ws, columnas, col_clave, cambios_por_clave),
+        escritura=True,
+    )
+    sheets_cache.actualizar_filas(
+        _clave_cache(sheet_name), col_clave, cambios_por_clave
+    )
+    return n
 
-    nueva = {col: "" for col in columnas}
-    for col, val in fila.items():
-        if col in nueva:
-            nueva[col] = val
 
-    if auto_numero_col and auto_numero_col in nueva:
-        nueva[auto_numero_col] = len(df) + 1
+def unidad_de_trabajo() -> ContextManager[UnidadDeTrabajo]:
+    """
+    Agrupa varias escrituras de Comercio (append_* / actualizar_*) en un
+    solo envío a Google Sheets:
+
+        with unidad_de_trabajo():
+            append_evaluacion(...)
+            append_autorizacion(...)
+            actualizar_estado_documento(...)
 
-    df = pd.concat([df, pd.DataFrame([nueva])], ignore_index=True)
-    _escribir_df(sheet_name, columnas, df)
+    En modo sqlite es una transacción local (Sheets se actualiza después).
+    """
+    if sqlite_store.modo_sqlite():
+        return sqlite_store.transaccion()
+    return _unidad_de_trabajo(_get_client(), SPREADSHEET_ID_COMERCIO)
+
+
+def importar_desde_sheets() -> Dict[str, int]:
+    """
+    Bootstrap del modo sqlite: vuelve a importar las tres hojas desde
+    Google Sheets. Devuelve {hoja: filas importadas}.
+    """
+    hojas = {
+        EVAL_SHEET_NAME: COLUMNAS_EVALUACION,
+        AUTO_SHEET_NAME: COLUMNAS_AUTORIZACION,
+        DOCS_SHEET_NAME: COLUMNAS_DOCUMENTOS,
+    }
+    resultado = {}
+    for sheet_name, columnas in hojas.items():
+        _tabla_sqlite(sheet_name, columnas)
+        resultado[sheet_name] = sqlite_store.importar_desde_sheets(
+            SPREADSHEET_ID_COMERCIO,
+            sheet_name,
+            columnas,
+            lambda: _descargar_df(sheet_name, columnas),
+        )
+    return resultado
+
+
+def refrescar_cache() -> None:
+    """
+    Descarta la caché de las tres hojas de Comercio para que la próxima
+    lectura vuelva a Google Sheets completa (botón "Actualizar" de la UI).
+    """
+    for sheet_name in (EVAL_SHEET_NAME, AUTO_SHEET_NAME, DOCS_SHEET_NAME):
+        sheets_sync.olvidar(_clave_cache(sheet_name))
+        sheets_cache.invalidar(_clave_cache(sheet_name))
 
 
 # ---------------------------------------------------------------------------
@@ -209,8 +657,15 @@ def leer_evaluaciones() -> pd.DataFrame:
     return _leer_df(EVAL_SHEET_NAME, COLUMNAS_EVALUACION)
 
 
-def escribir_evaluaciones(df: pd.DataFrame) -> None:
-    _escribir_df(EVAL_SHEET_NAME, COLUMNAS_EVALUACION, df)
+def leer_evaluaciones_tipado() -> pd.DataFrame:
+    """Como leer_evaluaciones(), con categorías y fechas tipadas (solo lectura)."""
+    return _leer_tipado(EVAL_SHEET_NAME)
+
+
+def escribir_evaluaciones(
+    df: pd.DataFrame, base: pd.DataFrame
+) -> Dict[str, object]:
+    return _escribir_df(EVAL_SHEET_NAME, COLUMNAS_EVALUACION, df, base)
 
 
 def append_evaluacion(
@@ -258,20 +713,19 @@ def actualizar_evaluacion_con_resolucion(
     """
     Actualiza la fila de Evaluaciones_CA correspondiente al N° de Evaluación.
     """
-    df = leer_evaluaciones()
-    if df.empty:
-        return
-
-    mask = df["N° DE EVALUACIÓN"].astype(str) == str(cod_evaluacion)
-    if not mask.any():
-        return
-
-    df.loc[mask, "N° DE RESOLUCIÓN"] = cod_resolucion
-    df.loc[mask, "FECHA DE RESOLUCIÓN"] = fecha_resolucion
-    df.loc[mask, "N° DE AUTORIZACIÓN"] = num_autorizacion
-    df.loc[mask, "FECHA DE AUTORIZACION"] = fecha_autorizacion
-
-    escribir_evaluaciones(df)
+    _actualizar_por_clave(
+        EVAL_SHEET_NAME,
+        COLUMNAS_EVALUACION,
+        "N° DE EVALUACIÓN",
+        {
+            cod_evaluacion: {
+                "N° DE RESOLUCIÓN": cod_resolucion,
+                "FECHA DE RESOLUCIÓN": fecha_resolucion,
+                "N° DE AUTORIZACIÓN": num_autorizacion,
+                "FECHA DE AUTORIZACION": fecha_autorizacion,
+            }
+        },
+    )
 
 
 def evaluaciones_sin_resolucion() -> pd.DataFrame:
@@ -295,8 +749,15 @@ def leer_autorizaciones() -> pd.DataFrame:
     return _leer_df(AUTO_SHEET_NAME, COLUMNAS_AUTORIZACION)
 
 
-def escribir_autorizaciones(df: pd.DataFrame) -> None:
-    _escribir_df(AUTO_SHEET_NAME, COLUMNAS_AUTORIZACION, df)
+def leer_autorizaciones_tipado() -> pd.DataFrame:
+    """Como leer_autorizaciones(), con categorías y fechas tipadas (solo lectura)."""
+    return _leer_tipado(AUTO_SHEET_NAME)
+
+
+def escribir_autorizaciones(
+    df: pd.DataFrame, base: pd.DataFrame
+) -> Dict[str, object]:
+    return _escribir_df(AUTO_SHEET_NAME, COLUMNAS_AUTORIZACION, df, base)
 
 
 def append_autorizacion(
@@ -381,28 +842,25 @@ def actualizar_autorizacion_resolucion_y_cert(
     Completa/actualiza en Autorizaciones_CA los datos de resolución y certificado
     para una evaluación ya registrada.
     """
-    df = leer_autorizaciones()
-    if df.empty:
-        return
-
-    mask = df["N° DE EVALUACION"].astype(str) == str(num_eval)
-    if not mask.any():
-        return
-
-    df.loc[mask, "CERTIFICADO ANTERIOR"] = certificado_anterior
-    df.loc[mask, "FECHA EMITIDA CERTIFICADO ANTERIOR"] = (
-        fecha_emitida_cert_anterior
-    )
-    df.loc[mask, "FECHA DE CADUCIDAD CERTIFICADO ANTERIOR"] = (
-        fecha_caducidad_cert_anterior
+    _actualizar_por_clave(
+        AUTO_SHEET_NAME,
+        COLUMNAS_AUTORIZACION,
+        "N° DE EVALUACION",
+        {
+            num_eval: {
+                "CERTIFICADO ANTERIOR": certificado_anterior,
+                "FECHA EMITIDA CERTIFICADO ANTERIOR": fecha_emitida_cert_anterior,
+                "FECHA DE CADUCIDAD CERTIFICADO ANTERIOR": (
+                    fecha_caducidad_cert_anterior
+                ),
+                "N° DE RESOLUCIÓN": num_resolucion,
+                "FECHA RESOLUCIÓN": fecha_resolucion,
+                "N° DE CERTIFICADO": num_certificado,
+                "FECHA EMITIDA CERTIFICADO": fecha_emitida_cert,
+                "VIGENCIA DE AUTORIZACIÓN": vigencia_autorizacion,
+            }
+        },
     )
-    df.loc[mask, "N° DE RESOLUCIÓN"] = num_resolucion
-    df.loc[mask, "FECHA RESOLUCIÓN"] = fecha_resolucion
-    df.loc[mask, "N° DE CERTIFICADO"] = num_certificado
-    df.loc[mask, "FECHA EMITIDA CERTIFICADO"] = fecha_emitida_cert
-    df.loc[mask, "VIGENCIA DE AUTORIZACIÓN"] = vigencia_autorizacion
-
-    escribir_autorizaciones(df)
 
 
 def autorizaciones_pendientes_resolucion() -> pd.DataFrame:
@@ -426,8 +884,15 @@ def leer_documentos() -> pd.DataFrame:
     return _leer_df(DOCS_SHEET_NAME, COLUMNAS_DOCUMENTOS)
 
 
-def escribir_documentos(df: pd.DataFrame) -> None:
-    _escribir_df(DOCS_SHEET_NAME, COLUMNAS_DOCUMENTOS, df)
+def leer_documentos_tipado() -> pd.DataFrame:
+    """Como leer_documentos(), con categorías y fechas tipadas (solo lectura)."""
+    return _leer_tipado(DOCS_SHEET_NAME)
+
+
+def escribir_documentos(
+    df: pd.DataFrame, base: pd.DataFrame
+) -> Dict[str, object]:
+    return _escribir_df(DOCS_SHEET_NAME, COLUMNAS_DOCUMENTOS, df, base)
 
 
 def append_documento(
@@ -477,49 +942,404 @@ def append_documento(
     )
 
 
+def append_documentos(filas: List[Dict[str, str]]) -> None:
+    """
+    Registra varios Documentos Simples en una sola llamada a la API
+    (importación masiva). Cada fila es un dict {columna: valor}; el N°
+    correlativo se asigna aquí.
+    """
+    _append_filas(DOCS_SHEET_NAME, COLUMNAS_DOCUMENTOS, filas, auto_numero_col="N°")
+
+
 def actualizar_estado_documento(num_documento_simple: str, nuevo_estado: str) -> None:
     """
     Cambia el ESTADO de un documento simple (por N° de Documento Simple).
     """
-    df = leer_documentos()
-    if df.empty:
-        return
+    actualizar_estado_documentos([num_documento_simple], nuevo_estado)
 
-    mask = (
-        df["N° DE DOCUMENTO SIMPLE"].astype(str).str.strip()
-        == str(num_documento_simple).strip()
+
+def actualizar_estado_documentos(
+    nums_documento_simple: List[str], nuevo_estado: str
+) -> int:
+    """
+    Cambia el ESTADO de varios documentos simples en una sola escritura.
+    Devuelve cuántas filas se actualizaron.
+    """
+    estado = str(nuevo_estado).upper()
+    return _actualizar_por_clave(
+        DOCS_SHEET_NAME,
+        COLUMNAS_DOCUMENTOS,
+        "N° DE DOCUMENTO SIMPLE",
+        {num: {"ESTADO": estado} for num in nums_documento_simple},
     )
-    if not mask.any():
-        return
 
-    df.loc[mask, "ESTADO"] = str(nuevo_estado).upper()
-    escribir_documentos(df)
+
+# Columnas que usa la selección de D.S. en Permisos (filtro + formulario)
+COLUMNAS_DS_EVALUACION: List[str] = [
+    "ESTADO",
+    "FECHA DE INGRESO",
+    "N° DE DOCUMENTO SIMPLE",
+    "ASUNTO",
+    "NOMBRE Y APELLIDO",
+    "DNI",
+    "DOMICILIO FISCAL",
+    "GIRO O MOTIVO DE LA SOLICITUD",
+    "UBICACIÓN A SOLICITAR",
+    "N° DE CELULAR",
+    "PROCEDENTE / IMPROCEDENTE",
+]
 
 
 def documentos_para_evaluacion() -> pd.DataFrame:
     """
-    Devuelve los Documentos Simples que se pueden usar para Evaluación:
+    Devuelve los Documentos Simples que se pueden usar para Evaluación
+    (solo las columnas de COLUMNAS_DS_EVALUACION):
 
     - ASUNTO: RENOVACION o SOLICITUD DE COMERCIO AMBULATORIO
     - PROCEDENTE / IMPROCEDENTE: PROCEDENTE
     - ESTADO: PENDIENTE o EN EVALUACION
     """
-    df = leer_documentos()
+    df = leer_hojas({DOCS_SHEET_NAME: COLUMNAS_DS_EVALUACION})[DOCS_SHEET_NAME]
     if df.empty:
         return df
 
-    asuntos_validos = {"RENOVACION", "SOLICITUD DE COMERCIO AMBULATORIO"}
-
-    df["ASUNTO_UP"] = df["ASUNTO"].str.upper().str.strip()
-    df["PROC_UP"] = df["PROCEDENTE / IMPROCEDENTE"].str.upper().str.strip()
-    df["ESTADO_UP"] = df["ESTADO"].str.upper().str.strip()
+    asuntos_validos = set(ASUNTOS_EVALUACION)
 
+    # Filtro sobre categorías: cada valor distinto se normaliza una vez
+    t = tipar(df[["ASUNTO", "PROCEDENTE / IMPROCEDENTE", "ESTADO"]], ESQUEMA_DOCUMENTOS)
     mask = (
-        df["ASUNTO_UP"].isin(asuntos_validos)
-        & (df["PROC_UP"] == "PROCEDENTE")
-        & df["ESTADO_UP"].isin({"PENDIENTE", "EN EVALUACION"})
+        t["ASUNTO"].isin(asuntos_validos)
+        & (t["PROCEDENTE / IMPROCEDENTE"] == "PROCEDENTE")
+        & t["ESTADO"].isin({"PENDIENTE", "EN EVALUACION"})
     )
+    return df[mask.to_numpy()].copy()
+
 
-    out = df[mask].copy()
-    out.drop(columns=["ASUNTO_UP", "PROC_UP", "ESTADO_UP"], inplace=True)
-    return out
+# ---------------------------------------------------------------------------
+# API – BÚSQUEDAS POR CLAVE (índices hash, sin recorrer las hojas)
+# ---------------------------------------------------------------------------
+
+
+def _valores_col(df: pd.DataFrame, col: str) -> List[str]:
+    return [v for v in df[col].astype(str).str.strip().tolist() if v]
+
+
+def buscar_documento_simple(num_documento_simple: str) -> pd.DataFrame:
+    """Filas de Documentos_CA con ese N° de Documento Simple."""
+    return _buscar(
+        DOCS_SHEET_NAME,
+        COLUMNAS_DOCUMENTOS,
+        "N° DE DOCUMENTO SIMPLE",
+        [num_documento_simple],
+    )
+
+
+def buscar_evaluacion(cod_evaluacion: str) -> pd.DataFrame:
+    """Filas de Evaluaciones_CA con ese N° de Evaluación."""
+    return _buscar(
+        EVAL_SHEET_NAME, COLUMNAS_EVALUACION, "N° DE EVALUACIÓN", [cod_evaluacion]
+    )
+
+
+def buscar_por_resolucion(num_resolucion: str) -> Dict[str, pd.DataFrame]:
+    """Evaluaciones y autorizaciones con ese N° de Resolución."""
+    return {
+        EVAL_SHEET_NAME: _buscar(
+            EVAL_SHEET_NAME, COLUMNAS_EVALUACION, "N° DE RESOLUCIÓN", [num_resolucion]
+        ),
+        AUTO_SHEET_NAME: _buscar(
+            AUTO_SHEET_NAME, COLUMNAS_AUTORIZACION, "N° DE RESOLUCIÓN", [num_resolucion]
+        ),
+    }
+
+
+def buscar_por_certificado(num_certificado: str) -> pd.DataFrame:
+    """Filas de Autorizaciones_CA con ese N° de Certificado."""
+    return _buscar(
+        AUTO_SHEET_NAME, COLUMNAS_AUTORIZACION, "N° DE CERTIFICADO", [num_certificado]
+    )
+
+
+def buscar_por_dni(dni: str, incluir_archivo: bool = False) -> Dict[str, pd.DataFrame]:
+    """
+    Todo lo relacionado a un DNI en las tres hojas de Comercio:
+
+    - Documentos_CA y Autorizaciones_CA: por la columna DNI.
+    - Evaluaciones_CA (no tiene DNI): por los D.S. de esos documentos /
+      autorizaciones y por los N° de Evaluación de las autorizaciones.
+
+    Con incluir_archivo=True también busca en los archivos anuales (las
+    filas archivadas van primero, con la columna "AÑO ARCHIVO").
+    Devuelve {nombre_hoja: DataFrame}.
+    """
+    if incluir_archivo:
+        return _buscar_por_dni_con_archivo(dni)
+
+    docs = _buscar(DOCS_SHEET_NAME, COLUMNAS_DOCUMENTOS, "DNI", [dni])
+    autos = _buscar(AUTO_SHEET_NAME, COLUMNAS_AUTORIZACION, "DNI", [dni])
+
+    nums_ds = _valores_col(docs, "N° DE DOCUMENTO SIMPLE") + _valores_col(autos, "D.S")
+    cods_eval = _valores_col(autos, "N° DE EVALUACION")
+
+    return {
+        DOCS_SHEET_NAME: docs,
+        EVAL_SHEET_NAME: _evaluaciones_de(nums_ds, cods_eval),
+        AUTO_SHEET_NAME: autos,
+    }
+
+
+def _evaluaciones_de(nums_ds: List[str], cods_eval: List[str]) -> pd.DataFrame:
+    """Evaluaciones de esos D.S. o con esos N° de Evaluación (hoja activa)."""
+    evals = pd.concat(
+        [
+            _buscar(
+                EVAL_SHEET_NAME, COLUMNAS_EVALUACION, "NUMERO DE DOCUMENTO SIMPLE", nums_ds
+            ),
+            _buscar(EVAL_SHEET_NAME, COLUMNAS_EVALUACION, "N° DE EVALUACIÓN", cods_eval),
+        ]
+    )
+    # Una misma evaluación puede calzar por D.S. y por N° de Evaluación
+    return evals[~evals.index.duplicated()].sort_index()
+
+
+def _coinciden(df: pd.DataFrame, col: str, valores: List[str]) -> pd.Series:
+    claves = {str(v).strip() for v in valores} - {""}
+    return df[col].astype(str).str.strip().isin(claves)
+
+
+def _buscar_por_dni_con_archivo(dni: str) -> Dict[str, pd.DataFrame]:
+    """buscar_por_dni() sobre la hoja activa y los archivos anuales."""
+    activos = buscar_por_dni(dni)
+    docs_a = leer_archivados(DOCS_SHEET_NAME)
+    autos_a = leer_archivados(AUTO_SHEET_NAME)
+    docs_a = docs_a[_coinciden(docs_a, "DNI", [dni])]
+    autos_a = autos_a[_coinciden(autos_a, "DNI", [dni])]
+
+    nums_ds = [
+        v
+        for df in (activos[DOCS_SHEET_NAME], docs_a)
+        for v in _valores_col(df, "N° DE DOCUMENTO SIMPLE")
+    ] + [v for df in (activos[AUTO_SHEET_NAME], autos_a) for v in _valores_col(df, "D.S")]
+    cods_eval = [
+        v for df in (activos[AUTO_SHEET_NAME], autos_a) for v in _valores_col(df, "N° DE EVALUACION")
+    ]
+    evals_a = leer_archivados(EVAL_SHEET_NAME)
+    evals_a = evals_a[
+        _coinciden(evals_a, "NUMERO DE DOCUMENTO SIMPLE", nums_ds)
+        | _coinciden(evals_a, "N° DE EVALUACIÓN", cods_eval)
+    ]
+    # Evaluaciones activas de D.S. / autorizaciones que ya están archivados
+    activos[EVAL_SHEET_NAME] = _evaluaciones_de(nums_ds, cods_eval)
+
+    return {
+        hoja: con_archivo(activos[hoja], archivados)
+        for hoja, archivados in (
+            (DOCS_SHEET_NAME, docs_a),
+            (EVAL_SHEET_NAME, evals_a),
+            (AUTO_SHEET_NAME, autos_a),
+        )
+    }
+
+
+# ---------------------------------------------------------------------------
+# API – ARCHIVO ANUAL (registros cerrados → "<hoja> <año>")
+# ---------------------------------------------------------------------------
+
+MESES = {
+    "enero": 1, "febrero": 2, "marzo": 3, "abril": 4, "mayo": 5, "junio": 6,
+    "julio": 7, "agosto": 8, "setiembre": 9, "septiembre": 9, "octubre": 10,
+    "noviembre": 11, "diciembre": 12,
+}
+
+
+def _fin_vigencia(textos: pd.Series) -> pd.Series:
+    """'1 de enero de 2025 hasta el 31 de diciembre de 2025' → 2025-12-31."""
+    partes = textos.astype(str).str.lower().str.extract(
+        r"hasta el (\d{1,2}) de ([a-z]+) del? (\d{4})"
+    )
+    return pd.to_datetime(
+        pd.DataFrame(
+            {
+                "year": pd.to_numeric(partes[2], errors="coerce"),
+                "month": partes[1].map(MESES),
+                "day": pd.to_numeric(partes[0], errors="coerce"),
+            }
+        ),
+        errors="coerce",
+    )
+
+
+def _cerrados_documentos(t: pd.DataFrame, corte: pd.Timestamp):
+    fecha = t["FECHA DE INGRESO"]
+    return t["ESTADO"].isin({"AUTORIZADO", "IMPROCEDENTE"}) & (fecha < corte), fecha
+
+
+def _cerrados_evaluaciones(t: pd.DataFrame, corte: pd.Timestamp):
+    # Evaluación con autorización emitida: el trámite terminó
+    fecha = t["FECHA"]
+    return (t["N° DE AUTORIZACIÓN"] != "") & (fecha < corte), fecha
+
+
+def _cerrados_autorizaciones(t: pd.DataFrame, corte: pd.Timestamp):
+    # Certificado vencido: fin de la VIGENCIA DE AUTORIZACIÓN antes del corte
+    fin = _fin_vigencia(t["VIGENCIA DE AUTORIZACIÓN"])
+    fecha = t["FECHA EMITIDA CERTIFICADO"].fillna(fin)
+    return (fin < corte) & fecha.notna(), fecha
+
+
+# hoja -> regla(df_tipado, corte) -> (máscara de cerrados, fecha que define el año)
+REGLAS_ARCHIVO = {
+    DOCS_SHEET_NAME: _cerrados_documentos,
+    EVAL_SHEET_NAME: _cerrados_evaluaciones,
+    AUTO_SHEET_NAME: _cerrados_autorizaciones,
+}
+
+
+def archivar_cerrados(
+    corte: date | None = None,
+    hojas: Sequence[str] | None = None,
+    aplicar: bool = True,
+) -> Tuple[Dict[str, Dict[int, int]], int]:
+    """
+    Mueve los registros cerrados antes de 'corte' (por defecto, el 1 de
+    enero del año en curso) a las hojas "<hoja> <año>":
+
+    - Documentos_CA: ESTADO AUTORIZADO o IMPROCEDENTE, por FECHA DE INGRESO.
+    - Evaluaciones_CA: con N° DE AUTORIZACIÓN, por FECHA.
+    - Autorizaciones_CA: certificado vencido (fin de la vigencia).
+
+    Primero se agregan al archivo (idempotente) y luego se reescribe la
+    hoja activa sin ellas (con control de versión). Con aplicar=False solo
+    cuenta. Devuelve ({hoja: {año: filas}}, conflictos), donde 'conflictos'
+    son los registros que otra sesión cambió mientras se archivaba (ver
+    versiones.fusionar).
+    """
+    corte_ts = pd.Timestamp(corte or date(date.today().year, 1, 1))
+    resumen: Dict[str, Dict[int, int]] = {}
+    conflictos = 0
+    for hoja in hojas or list(REGLAS_ARCHIVO):
+        columnas = COLUMNAS_POR_HOJA[hoja]
+        base = _leer_df(hoja, columnas)
+        if base.empty:
+            continue
+        cerrados, fechas = REGLAS_ARCHIVO[hoja](tipar(base, ESQUEMA_POR_HOJA[hoja]), corte_ts)
+        cerrados = cerrados.fillna(False).astype(bool)
+        if not cerrados.any():
+            continue
+
+        anios = fechas[cerrados].dt.year.astype(int)
+        if not aplicar:
+            resumen[hoja] = {int(a): int(n) for a, n in anios.value_counts().sort_index().items()}
+            continue
+        resumen[hoja] = archivar_filas(
+            _get_client(), SPREADSHEET_ID_COMERCIO, hoja, columnas, base[cerrados], anios
+        )
+        escrito = _escribir_df(hoja, columnas, base[~cerrados], base=base)
+        conflictos += int(escrito["conflictos"])
+    return resumen, conflictos
+
+
+def leer_archivados(sheet_name: str, anios: Sequence[int] | None = None) -> pd.DataFrame:
+    """Registros archivados de la hoja (todos los años o solo 'anios')."""
+    return _leer_archivados(
+        _get_client(), SPREADSHEET_ID_COMERCIO, sheet_name, COLUMNAS_POR_HOJA[sheet_name], anios
+    )
+
+
+def leer_con_archivo(sheet_name: str, anios: Sequence[int] | None = None) -> pd.DataFrame:
+    """
+    Hoja activa + archivos anuales (consulta histórica, opcional). Columna
+    extra "AÑO ARCHIVO": el año del archivo, o "" para la hoja activa.
+    """
+    activo = _leer_df(sheet_name, COLUMNAS_POR_HOJA[sheet_name])
+    return con_archivo(activo, leer_archivados(sheet_name, anios))
+
+
+# ---------------------------------------------------------------------------
+# API – CÓDIGOS (evaluación / resolución / certificado, por año)
+# ---------------------------------------------------------------------------
+
+# tipo -> [(hoja, columnas, columna código, columna fecha dd/mm/yyyy), ...]
+FUENTES_CODIGO: Dict[str, List[Tuple[str, List[str], str, str]]] = {
+    "evaluacion": [
+        (EVAL_SHEET_NAME, COLUMNAS_EVALUACION, "N° DE EVALUACIÓN", "FECHA"),
+        (AUTO_SHEET_NAME, COLUMNAS_AUTORIZACION, "N° DE EVALUACION", "FECHA DE EVALUACION"),
+    ],
+    "resolucion": [
+        (EVAL_SHEET_NAME, COLUMNAS_EVALUACION, "N° DE RESOLUCIÓN", "FECHA DE RESOLUCIÓN"),
+        (AUTO_SHEET_NAME, COLUMNAS_AUTORIZACION, "N° DE RESOLUCIÓN", "FECHA RESOLUCIÓN"),
+    ],
+    "certificado": [
+        (EVAL_SHEET_NAME, COLUMNAS_EVALUACION, "N° DE AUTORIZACIÓN", "FECHA DE AUTORIZACION"),
+        (AUTO_SHEET_NAME, COLUMNAS_AUTORIZACION, "N° DE CERTIFICADO", "FECHA EMITIDA CERTIFICADO"),
+    ],
+}
+
+
+def _registro_codigo(tipo: str) -> str:
+    """
+    Nombre del registro de códigos de 'tipo', sembrado desde la hoja activa
+    y los archivos anuales (de nuevo cuando la caché trae otra revisión).
+    """
+    if tipo not in FUENTES_CODIGO:
+        raise ValueError(f"Tipo de código desconocido: {tipo}")
+    registro = f"comercio.{tipo}"
+    fuentes = FUENTES_CODIGO[tipo]
+
+    def _semilla():
+        for sheet_name, columnas, col_codigo, col_fecha in fuentes:
+            esquema = ESQUEMA_POR_HOJA[sheet_name]
+            archivado = _archivados_semilla(sheet_name)
+            # Un código archivado sigue usado
+            df = pd.concat(
+                [
+                    tipar(archivado[[col_codigo, col_fecha]], esquema).assign(
+                        **{COLUMNA_ANIO_ARCHIVO: archivado[COLUMNA_ANIO_ARCHIVO]}
+                    ),
+                    _leer_tipado(sheet_name)[[col_codigo, col_fecha]].assign(
+                        **{COLUMNA_ANIO_ARCHIVO: ""}
+                    ),
+                ],
+                ignore_index=True,
+            )
+            # Sin fecha: el año del archivo o, en la hoja activa, el año en
+            # curso (el que se numera ahora)
+            anios = (
+                df[col_fecha]
+                .dt.year.fillna(pd.to_numeric(df[COLUMNA_ANIO_ARCHIVO], errors="coerce"))
+                .fillna(date.today().year)
+            )
+            for codigo, anio in zip(df[col_codigo].tolist(), anios.tolist()):
+                yield int(anio), codigo
+
+    secuencias.sembrar_codigos(
+        registro, _semilla, _version_hojas(*(hoja for hoja, *_ in fuentes))
+    )
+    return registro
+
+
+def proponer_codigo(tipo: str, anio: int) -> str:
+    """Siguiente código libre ('evaluacion', 'resolucion' o 'certificado')."""
+    return secuencias.proponer(_registro_codigo(tipo), anio)
+
+
+def codigo_en_uso(tipo: str, anio: int, codigo: str) -> bool:
+    """True si ese código ya está registrado para el año."""
+    return secuencias.en_uso(_registro_codigo(tipo), anio, codigo)
+
+
+def reservar_codigos(codigos: Dict[str, Tuple[int, str]]) -> None:
+    """
+    Reserva a la vez {tipo: (anio, codigo)}. Si alguno ya existe no se
+    reserva ninguno y se lanza CodigoDuplicadoError.
+    """
+    secuencias.reservar(
+        [(_registro_codigo(t), anio, cod) for t, (anio, cod) in codigos.items()]
+    )
+
+
+def liberar_codigos(codigos: Dict[str, Tuple[int, str]]) -> None:
+    """Libera códigos reservados con reservar_codigos() (guardado fallido)."""
+    secuencias.liberar(
+        [(_registro_codigo(t), anio, cod) for t, (anio, cod) in codigos.items()]
+    )
@@ -0,0 +1,542 @@
+# integraciones/almacen.py
+"""
+Backends de almacenamiento para las hojas de cálculo.
+
+Todo el código de datos (gsheets, sheets_sync, unidad_trabajo,
+sqlite_store, comercio, anuncios) usa un subconjunto pequeño de la API de
+gspread. Ese subconjunto es el protocolo de este módulo:
+
+- Almacen.open_by_key(id)                → Libro
+- Libro: abrir hoja (worksheet / get_worksheet_by_id / sheet1 /
+  add_worksheet), leer rangos (values_batch_get), batch_update
+  (appendCells / updateCells) y revisión (get_lastUpdateTime).
+- Hoja: leer (row_values, col_values, get_all_values), agregar filas
+  (append_rows), actualizar (update, batch_update) y limpiar (clear,
+  batch_clear).
+
+Implementaciones (ALMACENAMIENTO_SHEETS en secrets/env):
+
+- "gspread" (por defecto): el cliente real; no hay capa intermedia.
+- "memoria": libros en memoria del proceso (benchmarks, pruebas de carga).
+- "archivo": como "memoria" pero cada hoja se guarda en un JSON dentro de
+  ALMACENAMIENTO_SHEETS_DIR (por defecto "datos_sheets"); otros procesos
+  ven los cambios (las escrituras simultáneas de dos procesos sobre la
+  misma hoja no se coordinan: gana la última).
+
+Así se puede medir el camino de datos de la app con registros de 100k
+filas y sin red (ver cargar_hoja()).
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional, Protocol, Sequence
+
+import gspread
+import requests
+from gspread.utils import a1_range_to_grid_range
+
+from integraciones.config import leer_config
+
+BACKEND_POR_DEFECTO = "gspread"
+DIR_POR_DEFECTO = "datos_sheets"
+
+
+# ---------------------------------------------------------------------------
+# PROTOCOLO
+# ---------------------------------------------------------------------------
+
+
+class Hoja(Protocol):
+    id: int
+    title: str
+
+    def row_values(self, row: int) -> List[str]: ...
+
+    def col_values(self, col: int) -> List[str]: ...
+
+    def get_all_values(self) -> List[List[str]]: ...
+
+    def append_rows(self, values: Sequence[Sequence[object]], **kwargs: Any) -> Any: ...
+
+    def update(self, *args: Any, **kwargs: Any) -> Any: ...
+
+    def batch_update(self, data: Sequence[Dict[str, Any]], **kwargs: Any) -> Any: ...
+
+    def batch_clear(self, ranges: Sequence[str]) -> Any: ...
+
+    def clear(self) -> Any: ...
+
+
+class Libro(Protocol):
+    sheet1: Hoja
+
+    def worksheets(self) -> List[Hoja]: ...
+
+    def worksheet(self, title: str) -> Hoja: ...
+
+    def get_worksheet_by_id(self, id: int) -> Hoja: ...
+
+    def add_worksheet(self, title: str, rows: int, cols: int) -> Hoja: ...
+
+    def values_batch_get(
+        self, ranges: Sequence[str], params: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]: ...
+
+    def batch_update(self, body: Dict[str, Any]) -> Any: ...
+
+    def get_lastUpdateTime(self) -> str: ...
+
+
+class Almacen(Protocol):
+    def open_by_key(self, key: str) -> Libro: ...
+
+
+# ---------------------------------------------------------------------------
+# UTILIDADES
+# ---------------------------------------------------------------------------
+
+
+def _error_api(codigo: int, mensaje: str) -> gspread.exceptions.APIError:
+    """APIError con el mismo formato que devuelve la API de Sheets."""
+    resp = requests.Response()
+    resp.status_code = codigo
+    resp._content = json.dumps(
+        {"error": {"code": codigo, "message": mensaje, "status": "INVALID_ARGUMENT"}}
+    ).encode()
+    return gspread.exceptions.APIError(resp)
+
+
+def _texto(valor: object) -> str:
+    return "" if valor is None else str(valor)
+
+
+def _sin_vacios_al_final(fila: List[str]) -> List[str]:
+    fin = len(fila)
+    while fin and fila[fin - 1] == "":
+        fin -= 1
+    return fila[:fin]
+
+
+def _separar_rango(rango: str) -> tuple:
+    """"'Hoja 1'!A2:C" -> ("Hoja 1", "A2:C"); "'Hoja 1'" -> ("Hoja 1", None)."""
+    if rango.startswith("'"):
+        i = 1
+        while i < len(rango):
+            if rango[i] == "'":
+                if rango[i + 1 : i + 2] == "'":
+                    i += 2
+                    continue
+                break
+            i += 1
+        titulo = rango[1:i].replace("''", "'")
+        resto = rango[i + 1 :]
+    else:
+        titulo, _, resto = rango.partition("!")
+        resto = "!" + resto if resto else ""
+    a1 = resto[1:] if resto.startswith("!") else None
+    return titulo, (a1 or None)
+
+
+# ---------------------------------------------------------------------------
+# BACKEND EN MEMORIA
+# ---------------------------------------------------------------------------
+
+
+class HojaMemoria:
+    """Hoja en memoria: matriz de texto con la semántica de gspread."""
+
+    def __init__(self, libro: "LibroMemoria", id: int, title: str, filas=None):
+        self._libro = libro
+        self.id = id
+        self.title = title
+        self.filas: List[List[str]] = [list(map(_texto, f)) for f in (filas or [])]
+
+    @property
+    def spreadsheet(self) -> "LibroMemoria":
+        return self._libro
+
+    # --- lectura ---
+    def _alto(self) -> int:
+        n = len(self.filas)
+        while n and not any(self.filas[n - 1]):
+            n -= 1
+        return n
+
+    def _celda(self, r: int, c: int) -> str:
+        fila = self.filas[r] if r < len(self.filas) else ()
+        return fila[c] if c < len(fila) else ""
+
+    def _grilla(self, a1: Optional[str]) -> List[List[str]]:
+        """Celdas del rango (índices base 0, extremos abiertos = hasta el final)."""
+        alto = self._alto()
+        g = a1_range_to_grid_range(a1) if a1 else {}
+        r1, r2 = g.get("startRowIndex", 0), min(g.get("endRowIndex", alto), alto)
+        c1 = g.get("startColumnIndex", 0)
+        c2 = g.get("endColumnIndex")
+        if c2 is None:
+            c2 = max((len(_sin_vacios_al_final(f)) for f in self.filas[:alto]), default=0)
+        ancho = max(c2 - c1, 0)
+        grilla = []
+        for fila in self.filas[r1:r2]:
+            tramo = fila[c1:c2]
+            if len(tramo) < ancho:
+                tramo = tramo + [""] * (ancho - len(tramo))
+            grilla.append(tramo)
+        return grilla
+
+    def row_values(self, row: int) -> List[str]:
+        with self._libro._lock:
+            self._libro._antes_de_leer()
+            return _sin_vacios_al_final(list(self.filas[row - 1])) if row <= len(self.filas) else []
+
+    def col_values(self, col: int) -> List[str]:
+        with self._libro._lock:
+            self._libro._antes_de_leer()
+            return _sin_vacios_al_final(
+                [self._celda(r, col - 1) for r in range(self._alto())]
+            )
+
+    def get_all_values(self) -> List[List[str]]:
+        with self._libro._lock:
+            self._libro._antes_de_leer()
+            return self._grilla(None)
+
+    # --- escritura ---
+    def _poner(self, r: int, c: int, valor: object) -> None:
+        while len(self.filas) <= r:
+            self.filas.append([])
+        fila = self.filas[r]
+        if len(fila) <= c:
+            fila.extend([""] * (c + 1 - len(fila)))
+        fila[c] = _texto(valor)
+
+    def _escribir(self, a1: str, valores: Sequence[Sequence[object]]) -> None:
+        g = a1_range_to_grid_range(a1)
+        r0, c0 = g.get("startRowIndex", 0), g.get("startColumnIndex", 0)
+        for i, fila in enumerate(valores):
+            for j, valor in enumerate(fila):
+                self._poner(r0 + i, c0 + j, valor)
+
+    def append_rows(self, values: Sequence[Sequence[object]], **kwargs: Any) -> None:
+        with self._libro._lock:
+            self._libro._antes_de_leer()
+            del self.filas[self._alto():]
+            self.filas.extend([list(map(_texto, f)) for f in values])
+            self._libro._al_cambiar(self)
+
+    def update(self, *args: Any, **kwargs: Any) -> None:
+        # Acepta update("A1", valores) y update(valores, "A1") como gspread
+        a, b = (list(args) + [None, None])[:2]
+        rango, valores = (a, b) if isinstance(a, str) else (b, a)
+        rango = kwargs.get("range_name", rango) or "A1"
+        valores = kwargs.get("values", valores) or []
+        with self._libro._lock:
+            self._libro._antes_de_leer()
+            self._escribir(rango, valores)
+            self._libro._al_cambiar(self)
+
+    def batch_update(self, data: Sequence[Dict[str, Any]], **kwargs: Any) -> None:
+        with self._libro._lock:
+            self._libro._antes_de_leer()
+            for d in data:
+                self._escribir(d["range"], d["values"])
+            self._libro._al_cambiar(self)
+
+    def batch_clear(self, ranges: Sequence[str]) -> None:
+        with self._libro._lock:
+            self._libro._antes_de_leer()
+            for a1 in ranges:
+                g = a1_range_to_grid_range(a1)
+                r2 = min(g.get("endRowIndex", len(self.filas)), len(self.filas))
+                for r in range(g.get("startRowIndex", 0), r2):
+                    fila = self.filas[r]
+                    c2 = min(g.get("endColumnIndex", len(fila)), len(fila))
+                    for c in range(g.get("startColumnIndex", 0), c2):
+                        fila[c] = ""
+            del self.filas[self._alto():]
+            self._libro._al_cambiar(self)
+
+    def clear(self) -> None:
+        with self._libro._lock:
+            self.filas = []
+            self._libro._al_cambiar(self)
+
+
+class LibroMemoria:
+    """Libro (spreadsheet) en memoria."""
+
+    def __init__(self, key: str):
+        self.id = key
+        self._lock = threading.RLock()
+        self._hojas: List[HojaMemoria] = []
+        self._revision = 0
+
+    # Ganchos para el backend en archivo
+    def _antes_de_leer(self) -> None:
+        pass
+
+    def _al_cambiar(self, hoja: Optional[HojaMemoria]) -> None:
+        self._revision += 1
+
+    # --- hojas ---
+    def worksheets(self) -> List[HojaMemoria]:
+        with self._lock:
+            self._antes_de_leer()
+            return list(self._hojas)
+
+    def worksheet(self, title: str) -> HojaMemoria:
+        for hoja in self.worksheets():
+            if hoja.title == title:
+                return hoja
+        raise gspread.exceptions.WorksheetNotFound(title)
+
+    def get_worksheet_by_id(self, id: int) -> HojaMemoria:
+        for hoja in self.worksheets():
+            if hoja.id == id:
+                return hoja
+        raise gspread.exceptions.WorksheetNotFound(id)
+
+    @property
+    def sheet1(self) -> HojaMemoria:
+        hojas = self.worksheets()
+        if not hojas:
+            return self.add_worksheet("Hoja 1", 1000, 26)
+        return hojas[0]
+
+    def add_worksheet(self, title: str, rows: int = 1000, cols: int = 26) -> HojaMemoria:
+        with self._lock:
+            self._antes_de_leer()
+            if any(h.title == title for h in self._hojas):
+                raise _error_api(400, f'A sheet with the name "{title}" already exists.')
+            hoja = HojaMemoria(self, max((h.id for h in self._hojas), default=-1) + 1, title)
+            self._hojas.append(hoja)
+            self._al_cambiar(hoja)
+            return hoja
+
+    def _hoja_de_rango(self, titulo: str) -> HojaMemoria:
+        for hoja in self._hojas:
+            if hoja.title == titulo:
+                return hoja
+        raise _error_api(400, f"Unable to parse range: {titulo}")
+
+    def _hoja_por_id(self, id: int) -> HojaMemoria:
+        for hoja in self._hojas:
+            if hoja.id == id:
+                return hoja
+        raise _error_api(400, f"No grid with id: {id}")
+
+    # --- lecturas en lote ---
+    def values_batch_get(
+        self, ranges: Sequence[str], params: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        por_columnas = (params or {}).get("majorDimension") == "COLUMNS"
+        salida = []
+        with self._lock:
+            self._antes_de_leer()
+            for rango in ranges:
+                titulo, a1 = _separar_rango(rango)
+                grilla = self._hoja_de_rango(titulo)._grilla(a1)
+                if por_columnas:
+                    grilla = [list(c) for c in zip(*grilla)]
+                grilla = [_sin_vacios_al_final(f) for f in grilla]
+                while grilla and not grilla[-1]:
+                    grilla.pop()
+                vr: Dict[str, Any] = {"range": rango}
+                if grilla:
+                    vr["values"] = grilla
+                salida.append(vr)
+        return {"spreadsheetId": self.id, "valueRanges": salida}
+
+    # --- batchUpdate (appendCells / updateCells / deleteDimension) ---
+    def batch_update(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        def _valor(celda: Dict[str, Any]) -> str:
+            v = celda.get("userEnteredValue") or {}
+            return _texto(next(iter(v.values()), ""))
+
+        with self._lock:
+            self._antes_de_leer()
+            tocadas = set()
+            for req in body.get("requests", []):
+                if "appendCells" in req:
+                    a = req["appendCells"]
+                    hoja = self._hoja_por_id(a["sheetId"])
+                    del hoja.filas[hoja._alto():]
+                    hoja.filas.extend(
+                        [_valor(c) for c in fila.get("values", [])] for fila in a["rows"]
+                    )
+                elif "updateCells" in req:
+                    u = req["updateCells"]
+                    rango = u["range"]
+                    hoja = self._hoja_por_id(rango["sheetId"])
+                    r0, c0 = rango.get("startRowIndex", 0), rango.get("startColumnIndex", 0)
+                    for i, fila in enumerate(u["rows"]):
+                        for j, celda in enumerate(fila.get("values", [])):
+                            hoja._poner(r0 + i, c0 + j, _valor(celda))
+                elif "deleteDimension" in req:
+                    rango = req["deleteDimension"]["range"]
+                    hoja = self._hoja_por_id(rango["sheetId"])
+                    if rango.get("dimension") != "ROWS":
+                        raise _error_api(400, "Solo se soportan filas (ROWS)")
+                    del hoja.filas[rango["startIndex"] : rango["endIndex"]]
+                else:
+                    continue
+                tocadas.add(hoja.id)
+            for hoja in self._hojas:
+                if hoja.id in tocadas:
+                    self._al_cambiar(hoja)
+        return {"spreadsheetId": self.id, "replies": []}
+
+    def get_lastUpdateTime(self) -> str:
+        with self._lock:
+            self._antes_de_leer()
+            return str(self._revision)
+
+
+class AlmacenMemoria:
+    """Almacén en memoria: un LibroMemoria por spreadsheet_id."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._libros: Dict[str, LibroMemoria] = {}
+
+    def _nuevo_libro(self, key: str) -> LibroMemoria:
+        return LibroMemoria(key)
+
+    def open_by_key(self, key: str) -> LibroMemoria:
+        with self._lock:
+            libro = self._libros.get(key)
+            if libro is None:
+                libro = self._libros[key] = self._nuevo_libro(key)
+            return libro
+
+
+# ---------------------------------------------------------------------------
+# BACKEND EN ARCHIVOS (un JSON por hoja)
+# ---------------------------------------------------------------------------
+
+
+class LibroArchivo(LibroMemoria):
+    """
+    Libro guardado en <directorio>/<spreadsheet_id>/<id_hoja>.json.
+    Antes de cada operación se recargan las hojas que otro proceso cambió
+    (por mtime); cada cambio reescribe solo el JSON de esa hoja.
+    """
+
+    def __init__(self, key: str, directorio: str):
+        super().__init__(key)
+        self._dir = os.path.join(directorio, key)
+        os.makedirs(self._dir, exist_ok=True)
+        self._mtimes: Dict[str, int] = {}
+
+    def _ruta(self, hoja_id: int) -> str:
+        return os.path.join(self._dir, f"{hoja_id}.json")
+
+    def _antes_de_leer(self) -> None:
+        actuales = {}
+        for nombre in os.listdir(self._dir):
+            if nombre.endswith(".json"):
+                actuales[nombre] = os.stat(os.path.join(self._dir, nombre)).st_mtime_ns
+        if actuales == self._mtimes:
+            return
+        por_id = {h.id: h for h in self._hojas}
+        hojas = []
+        for nombre, mtime in sorted(actuales.items(), key=lambda x: int(x[0][:-5])):
+            hoja_id = int(nombre[:-5])
+            hoja = por_id.get(hoja_id)
+            if hoja is None or self._mtimes.get(nombre) != mtime:
+                with open(os.path.join(self._dir, nombre), encoding="utf-8") as f:
+                    datos = json.load(f)
+                if hoja is None:
+                    hoja = HojaMemoria(self, hoja_id, datos["title"], datos["filas"])
+                else:
+                    # Se actualiza en su lugar: gsheets guarda los handles
+                    hoja.title, hoja.filas = datos["title"], datos["filas"]
+            hojas.append(hoja)
+        self._hojas = hojas
+        self._mtimes = actuales
+
+    def _al_cambiar(self, hoja: Optional[HojaMemoria]) -> None:
+        super()._al_cambiar(hoja)
+        if hoja is None:
+            return
+        ruta = self._ruta(hoja.id)
+        tmp = f"{ruta}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"title": hoja.title, "filas": hoja.filas}, f, ensure_ascii=False)
+        os.replace(tmp, ruta)  # atómico: otro proceso nunca ve un JSON a medias
+        self._mtimes[os.path.basename(ruta)] = os.stat(ruta).st_mtime_ns
+
+    def get_lastUpdateTime(self) -> str:
+        with self._lock:
+            self._antes_de_leer()
+            return str(max(self._mtimes.values(), default=0))
+
+
+class AlmacenArchivo(AlmacenMemoria):
+    """Almacén en archivos locales (ver LibroArchivo)."""
+
+    def __init__(self, directorio: str):
+        super().__init__()
+        self.directorio = directorio
+
+    def _nuevo_libro(self, key: str) -> LibroArchivo:
+        return LibroArchivo(key, self.directorio)
+
+
+# ---------------------------------------------------------------------------
+# SELECCIÓN DEL BACKEND
+# ---------------------------------------------------------------------------
+
+_LOCK = threading.Lock()
+_ALMACENES: Dict[str, Almacen] = {}
+
+
+def nombre_backend() -> str:
+    return str(leer_config("ALMACENAMIENTO_SHEETS", BACKEND_POR_DEFECTO)).strip().lower()
+
+
+def abrir_almacen(crear_gspread: Callable[[], Almacen]) -> Almacen:
+    """
+    Almacén configurado para el proceso. Con "gspread" se usa
+    crear_gspread() (cliente autenticado); los demás no necesitan
+    credenciales y se comparten entre todos los módulos.
+    """
+    backend = nombre_backend()
+    if backend == "gspread":
+        return crear_gspread()
+    with _LOCK:
+        almacen = _ALMACENES.get(backend)
+        if almacen is None:
+            if backend == "memoria":
+                almacen = AlmacenMemoria()
+            elif backend == "archivo":
+                almacen = AlmacenArchivo(
+                    str(leer_config("ALMACENAMIENTO_SHEETS_DIR", DIR_POR_DEFECTO))
+                )
+            else:
+                raise ValueError(f"ALMACENAMIENTO_SHEETS desconocido: {backend}")
+            _ALMACENES[backend] = almacen
+        return almacen
+
+
+def cargar_hoja(
+    almacen: Almacen,
+    spreadsheet_id: str,
+    titulo: str,
+    columnas: Sequence[str],
+    filas: Sequence[Sequence[object]],
+) -> None:
+    """
+    Crea (o reemplaza) una hoja con encabezado + filas, ej. para sembrar un
+    registro de 100k filas en el backend "memoria" antes de un benchmark.
+    """
+    libro = almacen.open_by_key(spreadsheet_id)
+    try:
+        hoja = libro.worksheet(titulo)
+    except gspread.exceptions.WorksheetNotFound:
+        hoja = libro.add_worksheet(title=titulo, rows=len(filas) + 1, cols=len(columnas))
+    hoja.clear()
+    hoja.update("A1", [list(columnas)] + [list(f) for f in filas])
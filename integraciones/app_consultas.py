@@ -1,23 +1,176 @@
 # integraciones/app_consultas.py
 import json
+import re
+import time
+
+import pandas as pd
 import streamlit as st
 
 from integraciones.codart import (
     CodartAPIError,
     consultar_dni,
+    consultar_lote,
     consultar_ruc,
     dni_a_nombre_completo,
 )
+from integraciones.exportar import boton_descarga_excel
 
 def _val(v):
     v = (v or "").strip() if isinstance(v, str) else v
     return "-" if (v in [None, "", "Locked"]) else v
 
+
+# ---------------------------------------------------------------------------
+# CONSULTA EN LOTE
+# ---------------------------------------------------------------------------
+
+COL_DOCUMENTO = "DOCUMENTO"
+COL_ERROR = "ERROR"
+
+
+def _campos_resultado(tipo, res):
+    """Columnas que se agregan a la tabla por cada documento encontrado."""
+    if tipo == "dni":
+        return {"NOMBRE COMPLETO": dni_a_nombre_completo(res)}
+    return {
+        "RAZÓN SOCIAL": res.get("razon_social") or "",
+        "DIRECCIÓN": res.get("direccion") or "",
+        "ESTADO": res.get("estado") or "",
+        "CONDICIÓN": res.get("condicion") or "",
+    }
+
+
+def _leer_archivo_lote(archivo):
+    """CSV (separador , o ;) o Excel, todo como texto (conserva ceros a la izquierda)."""
+    if archivo.name.lower().endswith((".xlsx", ".xls")):
+        return pd.read_excel(archivo, dtype=str)
+    encabezado = archivo.getvalue().split(b"\n", 1)[0]
+    return pd.read_csv(archivo, dtype=str, sep=";" if b";" in encabezado else ",")
+
+
+def _enriquecer(df, col, tipo, resultados):
+    """Tabla de entrada + columnas del resultado + ERROR, fila por fila."""
+    vacios = {k: "" for k in _campos_resultado(tipo, {})}
+    filas = []
+    for valor in df[col]:
+        doc = "" if pd.isna(valor) else str(valor).strip()
+        r = resultados.get(doc)
+        if not doc:
+            filas.append({**vacios, COL_ERROR: "Documento vacío."})
+        elif r is None or r.error:
+            filas.append({**vacios, COL_ERROR: r.error if r else "Sin consultar."})
+        else:
+            filas.append({**_campos_resultado(tipo, r.resultado), COL_ERROR: ""})
+    extra = pd.DataFrame(filas, index=df.index)
+    return pd.concat([df.drop(columns=[c for c in extra.columns if c in df.columns]), extra], axis=1)
+
+
+def _tab_lote():
+    st.subheader("Consulta en lote")
+    st.caption(
+        "Pega una lista o sube un CSV / Excel. Los documentos repetidos se "
+        "consultan una sola vez y los que ya están en caché no gastan consultas."
+    )
+
+    tipo_txt = st.radio("Tipo de documento", ["DNI", "RUC"], horizontal=True, key="lote_tipo")
+    tipo = tipo_txt.lower()
+
+    archivo = st.file_uploader("Archivo CSV o Excel", type=["csv", "xlsx", "xls"], key="lote_archivo")
+    df_entrada, col = None, COL_DOCUMENTO
+    if archivo is not None:
+        try:
+            df_entrada = _leer_archivo_lote(archivo)
+        except Exception as e:
+            st.error(f"No se pudo leer el archivo: {e}")
+            return
+        if df_entrada.empty:
+            st.warning("El archivo no tiene filas.")
+            return
+        columnas = list(df_entrada.columns)
+        sugerida = next((i for i, c in enumerate(columnas) if tipo in str(c).lower()), 0)
+        col = st.selectbox(f"Columna con el {tipo_txt}", columnas, index=sugerida, key="lote_columna")
+    else:
+        texto = st.text_area(
+            f"{tipo_txt}s (uno por línea, o separados por coma / espacio)",
+            height=150,
+            key="lote_texto",
+        )
+        docs = [d for d in re.split(r"[\s,;]+", texto or "") if d]
+        if docs:
+            df_entrada = pd.DataFrame({COL_DOCUMENTO: docs})
+
+    if st.button("🔎 Consultar lote", key="btn_lote", disabled=df_entrada is None):
+        total = df_entrada[col].dropna().astype(str).str.strip().replace("", pd.NA).dropna().nunique()
+        progreso = st.progress(0.0, text=f"0 de {total} documentos")
+        tabla = st.empty()
+        resultados, vistos, ultimo = {}, [], 0.0
+        for r in consultar_lote(tipo, df_entrada[col].dropna()):
+            resultados[r.documento] = r
+            vistos.append(
+                {
+                    COL_DOCUMENTO: r.documento,
+                    "ORIGEN": "caché" if r.desde_cache else "CODART",
+                    **(_campos_resultado(tipo, r.resultado) if r.resultado is not None else {}),
+                    COL_ERROR: r.error or "",
+                }
+            )
+            ahora = time.monotonic()
+            if ahora - ultimo > 0.5 or len(resultados) == total:
+                ultimo = ahora
+                progreso.progress(
+                    min(1.0, len(resultados) / max(total, 1)),
+                    text=f"{len(resultados)} de {total} documentos",
+                )
+                tabla.dataframe(pd.DataFrame(vistos), hide_index=True, use_container_width=True)
+        progreso.empty()
+        tabla.empty()
+
+        st.session_state["lote_resultado"] = _enriquecer(df_entrada, col, tipo, resultados)
+        st.session_state["lote_resumen"] = {
+            "unicos": len(resultados),
+            "cache": sum(1 for r in resultados.values() if r.desde_cache),
+            "errores": sum(1 for r in resultados.values() if r.error),
+        }
+
+    df_salida = st.session_state.get("lote_resultado")
+    if df_salida is None:
+        return
+
+    resumen = st.session_state.get("lote_resumen", {})
+    m1, m2, m3, m4 = st.columns(4)
+    m1.metric("Filas", len(df_salida))
+    m2.metric("Documentos únicos", resumen.get("unicos", 0))
+    m3.metric("Desde caché", resumen.get("cache", 0))
+    m4.metric("Con error", resumen.get("errores", 0))
+
+    solo_errores = st.checkbox("Mostrar solo filas con error", key="lote_solo_errores")
+    vista = df_salida[df_salida[COL_ERROR] != ""] if solo_errores else df_salida
+    st.dataframe(vista, hide_index=True, use_container_width=True)
+
+    c1, c2 = st.columns(2)
+    with c1:
+        boton_descarga_excel(
+            "⬇️ Descargar resultado (Excel)",
+            lambda df=df_salida: df,
+            "CONSULTA_LOTE.xlsx",
+            hoja="Consulta",
+            key="descargar_lote_excel",
+        )
+    with c2:
+        st.download_button(
+            "⬇️ Descargar resultado (CSV)",
+            data=lambda df=df_salida: df.to_csv(index=False).encode("utf-8-sig"),
+            file_name="CONSULTA_LOTE.csv",
+            mime="text/csv",
+            key="descargar_lote_csv",
+            on_click="ignore",
+        )
+
 def run_modulo_consultas():
     st.title("📄 Consultas (DNI / RUC)")
     st.caption("Consulta RENIEC (DNI) y SUNAT (RUC) usando CODART.")
 
-    tab_dni, tab_ruc = st.tabs(["DNI (RENIEC)", "RUC (SUNAT)"])
+    tab_dni, tab_ruc, tab_lote = st.tabs(["DNI (RENIEC)", "RUC (SUNAT)", "Lote (DNI / RUC)"])
 
     with tab_dni:
         st.subheader("Consulta por DNI")
@@ -107,3 +260,6 @@ def run_modulo_consultas():
             except Exception as e:
                 st.error("Error inesperado")
                 st.exception(e)
+
+    with tab_lote:
+        _tab_lote()
@@ -0,0 +1,140 @@
+# integraciones/archivo_anual.py
+"""
+Archivo anual de registros cerrados.
+
+Las hojas activas (Documentos_CA, Evaluaciones_CA, Autorizaciones_CA,
+la BD de anuncios) solo deberían tener lo que todavía se trabaja. Los
+registros cerrados (D.S. resueltos, certificados vencidos, ...) se mueven
+a una hoja de archivo por año dentro del mismo libro:
+
+    "<hoja> <año>"   ej. "Documentos_CA 2024"
+
+- archivar_filas(): agrega las filas a su hoja de archivo (creándola con
+  el encabezado si no existe). Es idempotente: las filas que ya están en
+  el archivo no se vuelven a agregar, así que si la reescritura de la hoja
+  activa falla después, se puede repetir sin duplicar.
+- leer_archivados(): lectura opcional de los archivos (todos o algunos
+  años) con UNA llamada values.batchGet.
+
+Qué es "cerrado" lo decide cada módulo (ver archivar_cerrados() en
+comercio y archivar_bd_certificados() en anuncios); las lecturas normales
+(leer_*) solo ven la hoja activa.
+"""
+
+from __future__ import annotations
+
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import gspread
+import pandas as pd
+from gspread.utils import absolute_range_name
+
+from integraciones.gsheets import (
+    columnas_a_filas,
+    con_worksheet,
+    leer_por_columnas,
+    obtener_libro,
+    valores_a_df,
+)
+
+COLUMNA_ANIO_ARCHIVO = "AÑO ARCHIVO"
+
+
+def nombre_archivo(sheet_name: str, anio: int) -> str:
+    return f"{sheet_name} {int(anio)}"
+
+
+def anios_archivados(client: gspread.Client, spreadsheet_id: str, sheet_name: str) -> List[int]:
+    """Años que tienen hoja de archivo para 'sheet_name' (orden ascendente)."""
+    patron = re.compile(rf"^{re.escape(sheet_name)} (\d{{4}})$")
+    sh = obtener_libro(client, spreadsheet_id)
+    anios = []
+    for ws in sh.worksheets():
+        m = patron.match(ws.title)
+        if m:
+            anios.append(int(m.group(1)))
+    return sorted(anios)
+
+
+def archivar_filas(
+    client: gspread.Client,
+    spreadsheet_id: str,
+    sheet_name: str,
+    columnas: Sequence[str],
+    filas: pd.DataFrame,
+    anios: pd.Series,
+) -> Dict[int, int]:
+    """
+    Agrega 'filas' a las hojas de archivo de su año ('anios', alineado con
+    'filas'). Devuelve {año: filas agregadas}.
+    """
+    resumen: Dict[int, int] = {}
+    if filas.empty:
+        return resumen
+    datos = filas.reindex(columns=list(columnas)).fillna("").astype(str)
+
+    for anio, grupo in datos.groupby(anios.astype(int), sort=True):
+        valores = grupo.values.tolist()
+
+        def _agregar(ws: gspread.Worksheet, valores=valores) -> int:
+            actuales = valores_a_df(ws.get_all_values(), columnas)
+            ya = Counter(actuales.itertuples(index=False, name=None))
+            nuevas = []
+            for fila in valores:
+                t = tuple(fila)
+                if ya[t] > 0:
+                    ya[t] -= 1
+                    continue
+                nuevas.append(fila)
+            if nuevas:
+                ws.append_rows(nuevas, value_input_option="RAW", table_range="A1")
+            return len(nuevas)
+
+        resumen[int(anio)] = con_worksheet(
+            client,
+            spreadsheet_id,
+            nombre_archivo(sheet_name, anio),
+            columnas,
+            _agregar,
+            crear=True,
+            escritura=True,
+        )
+    return resumen
+
+
+def leer_archivados(
+    client: gspread.Client,
+    spreadsheet_id: str,
+    sheet_name: str,
+    columnas: Sequence[str],
+    anios: Optional[Iterable[int]] = None,
+) -> pd.DataFrame:
+    """
+    Registros archivados de 'sheet_name' (todos los años o solo 'anios'),
+    con la columna COLUMNA_ANIO_ARCHIVO al final.
+    """
+    disponibles = anios_archivados(client, spreadsheet_id, sheet_name)
+    pedidos = set(int(a) for a in anios) if anios is not None else None
+    seleccion = [a for a in disponibles if pedidos is None or a in pedidos]
+
+    sh = obtener_libro(client, spreadsheet_id)
+    rangos = [absolute_range_name(nombre_archivo(sheet_name, a)) for a in seleccion]
+    frames = []
+    for anio, bloque in zip(seleccion, leer_por_columnas(sh, rangos)):
+        df = valores_a_df(columnas_a_filas(bloque, len(bloque)), columnas)
+        df[COLUMNA_ANIO_ARCHIVO] = str(anio)
+        frames.append(df)
+    if not frames:
+        return pd.DataFrame(columns=list(columnas) + [COLUMNA_ANIO_ARCHIVO])
+    return pd.concat(frames, ignore_index=True)
+
+
+def con_archivo(
+    activo: pd.DataFrame, archivados: pd.DataFrame
+) -> pd.DataFrame:
+    """Hoja activa + archivos en un solo DataFrame (activo con año "")."""
+    activo = activo.copy()
+    activo[COLUMNA_ANIO_ARCHIVO] = ""
+    return pd.concat([archivados, activo], ignore_index=True)
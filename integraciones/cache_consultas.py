@@ -0,0 +1,282 @@
+# integraciones/cache_consultas.py
+"""
+Caché en disco (SQLite) de las consultas DNI / RUC a CODART.
+
+Sobrevive a reinicios y redeploys y la comparten todos los procesos que
+apunten al mismo archivo, así cada documento se paga una sola vez.
+
+- Ruta: CODART_CACHE_PATH (por defecto data/consultas.db).
+- Vigencia por tipo: CODART_CACHE_TTL_DNI (por defecto 30 días) y
+  CODART_CACHE_TTL_RUC (por defecto 1 día: estado y condición cambian).
+- Respuestas negativas (CODART dice que el documento no existe o es
+  inválido): se guardan con CODART_CACHE_TTL_NEGATIVO (por defecto 10
+  minutos), así repetir un DNI mal tipeado no vuelve a gastar una consulta.
+- Una respuesta vencida se sigue devolviendo (marcada como no vigente)
+  hasta CODART_CACHE_VENCIDO_MAX segundos después (por defecto 7 días),
+  para servirla mientras se refresca en segundo plano (ver codart.py).
+- Tamaño máximo: CODART_CACHE_MAX_MB (por defecto 50). Al pasarlo se
+  borran las entradas usadas hace más tiempo (LRU) hasta bajar al 90 %.
+- Concurrencia: WAL + busy timeout; las lecturas no bloquean y las
+  escrituras van en transacciones BEGIN IMMEDIATE.
+- Si el archivo no se puede abrir (disco de solo lectura, etc.) la caché
+  se desactiva y las consultas van directo a CODART.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, NamedTuple, Optional
+
+from integraciones.config import leer_config, leer_config_float
+
+RUTA_POR_DEFECTO = os.path.join("data", "consultas.db")
+TTL_POR_DEFECTO = {"dni": 30 * 24 * 3600.0, "ruc": 24 * 3600.0}
+TTL_NEGATIVO_POR_DEFECTO = 600.0
+VENCIDO_MAX_POR_DEFECTO = 7 * 24 * 3600.0
+
+# "usado" se actualiza como mucho una vez por minuto por entrada: un LRU
+# aproximado que deja las lecturas sin escrituras en el caso normal
+RESOLUCION_USO = 60.0
+
+_LOCAL = threading.local()
+_LOCK = threading.Lock()
+_ESTADISTICAS: Dict[str, int] = {
+    "aciertos": 0,
+    "aciertos_vencidos": 0,
+    "aciertos_negativos": 0,
+    "fallos": 0,
+    "guardadas": 0,
+    "desalojadas": 0,
+}
+
+
+class Entrada(NamedTuple):
+    """Lo guardado para un documento: respuesta o mensaje de error."""
+
+    valor: Optional[Dict[str, Any]]
+    error: Optional[str]
+    vigente: bool
+
+
+def ruta_db() -> str:
+    return str(leer_config("CODART_CACHE_PATH", RUTA_POR_DEFECTO))
+
+
+def ttl(tipo: str) -> float:
+    """Segundos que una respuesta de 'tipo' ("dni" / "ruc") sigue vigente."""
+    return leer_config_float(f"CODART_CACHE_TTL_{tipo.upper()}", TTL_POR_DEFECTO.get(tipo, 24 * 3600.0))
+
+
+def ttl_negativo() -> float:
+    return leer_config_float("CODART_CACHE_TTL_NEGATIVO", TTL_NEGATIVO_POR_DEFECTO)
+
+
+def _max_bytes() -> int:
+    return int(leer_config_float("CODART_CACHE_MAX_MB", 50) * 1024 * 1024)
+
+
+def _sumar(clave: str, n: int = 1) -> None:
+    with _LOCK:
+        _ESTADISTICAS[clave] += n
+
+
+# ---------------------------------------------------------------------------
+# CONEXIÓN
+# ---------------------------------------------------------------------------
+
+
+def _conexion() -> Optional[sqlite3.Connection]:
+    """Una conexión por hilo; None si la caché no está disponible."""
+    if getattr(_LOCAL, "desactivada", False):
+        return None
+    con = getattr(_LOCAL, "con", None)
+    if con is not None:
+        return con
+    try:
+        ruta = ruta_db()
+        carpeta = os.path.dirname(ruta)
+        if carpeta:
+            os.makedirs(carpeta, exist_ok=True)
+        con = sqlite3.connect(ruta, timeout=10, isolation_level=None)
+        con.execute("PRAGMA journal_mode=WAL")
+        con.execute("PRAGMA synchronous=NORMAL")
+        con.execute(
+            "CREATE TABLE IF NOT EXISTS consultas ("
+            " tipo TEXT NOT NULL, documento TEXT NOT NULL,"
+            " valor TEXT NOT NULL, guardado REAL NOT NULL,"
+            " usado REAL NOT NULL, tamano INTEGER NOT NULL,"
+            " error TEXT,"
+            " PRIMARY KEY (tipo, documento)) WITHOUT ROWID"
+        )
+        try:
+            # Archivos creados antes de guardar respuestas negativas
+            con.execute("ALTER TABLE consultas ADD COLUMN error TEXT")
+        except sqlite3.OperationalError:
+            pass
+        con.execute("CREATE INDEX IF NOT EXISTS consultas_usado ON consultas (usado)")
+        # Total de bytes mantenido por triggers: el control de tamaño no
+        # recorre la tabla en cada escritura
+        con.execute(
+            "CREATE TABLE IF NOT EXISTS _total (id INTEGER PRIMARY KEY CHECK (id = 1),"
+            " bytes INTEGER NOT NULL)"
+        )
+        con.execute("INSERT OR IGNORE INTO _total (id, bytes) VALUES (1, 0)")
+        con.execute(
+            "CREATE TRIGGER IF NOT EXISTS consultas_ins AFTER INSERT ON consultas"
+            " BEGIN UPDATE _total SET bytes = bytes + NEW.tamano WHERE id = 1; END"
+        )
+        con.execute(
+            "CREATE TRIGGER IF NOT EXISTS consultas_del AFTER DELETE ON consultas"
+            " BEGIN UPDATE _total SET bytes = bytes - OLD.tamano WHERE id = 1; END"
+        )
+        con.execute(
+            "CREATE TRIGGER IF NOT EXISTS consultas_upd AFTER UPDATE OF tamano ON consultas"
+            " BEGIN UPDATE _total SET bytes = bytes + NEW.tamano - OLD.tamano"
+            " WHERE id = 1; END"
+        )
+    except (sqlite3.Error, OSError):
+        _LOCAL.desactivada = True
+        return None
+    _LOCAL.con = con
+    return con
+
+
+# ---------------------------------------------------------------------------
+# LECTURA / ESCRITURA
+# ---------------------------------------------------------------------------
+
+
+def leer(tipo: str, documento: str) -> Optional[Entrada]:
+    """
+    Entrada guardada para el documento. Las positivas se devuelven hasta
+    CODART_CACHE_VENCIDO_MAX después de vencer (con vigente=False); las
+    negativas solo mientras están vigentes. None si no hay nada útil.
+    """
+    con = _conexion()
+    if con is None:
+        return None
+    ahora = time.time()
+    try:
+        fila = con.execute(
+            "SELECT valor, guardado, usado, error FROM consultas"
+            " WHERE tipo = ? AND documento = ?",
+            (tipo, documento),
+        ).fetchone()
+        if fila is None:
+            _sumar("fallos")
+            return None
+        valor, guardado, usado, error = fila
+        edad = ahora - guardado
+        if error is not None:
+            if edad > ttl_negativo():
+                _sumar("fallos")
+                return None
+            _sumar("aciertos_negativos")
+            return Entrada(None, error, True)
+
+        vigente = edad <= ttl(tipo)
+        if not vigente and edad > ttl(tipo) + leer_config_float(
+            "CODART_CACHE_VENCIDO_MAX", VENCIDO_MAX_POR_DEFECTO
+        ):
+            _sumar("fallos")
+            return None
+        if ahora - usado > RESOLUCION_USO:
+            con.execute(
+                "UPDATE consultas SET usado = ? WHERE tipo = ? AND documento = ?",
+                (ahora, tipo, documento),
+            )
+    except sqlite3.Error:
+        return None
+    _sumar("aciertos" if vigente else "aciertos_vencidos")
+    return Entrada(json.loads(valor), None, vigente)
+
+
+def _escribir(tipo: str, documento: str, texto: str, error: Optional[str]) -> None:
+    con = _conexion()
+    if con is None:
+        return
+    tamano = len(texto.encode("utf-8")) + len(error or "") + len(tipo) + len(documento)
+    ahora = time.time()
+    try:
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            con.execute(
+                "INSERT INTO consultas"
+                " (tipo, documento, valor, guardado, usado, tamano, error)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (tipo, documento) DO UPDATE SET"
+                " valor = excluded.valor, guardado = excluded.guardado,"
+                " usado = excluded.usado, tamano = excluded.tamano,"
+                " error = excluded.error",
+                (tipo, documento, texto, ahora, ahora, tamano, error),
+            )
+            desalojadas = _desalojar(con)
+        except BaseException:
+            con.execute("ROLLBACK")
+            raise
+        con.execute("COMMIT")
+    except sqlite3.Error:
+        return
+    _sumar("guardadas")
+    if desalojadas:
+        _sumar("desalojadas", desalojadas)
+
+
+def guardar(tipo: str, documento: str, valor: Dict[str, Any]) -> None:
+    """Guarda (o reemplaza) la respuesta y aplica el límite de tamaño."""
+    _escribir(tipo, documento, json.dumps(valor, ensure_ascii=False), None)
+
+
+def guardar_error(tipo: str, documento: str, mensaje: str) -> None:
+    """Guarda una respuesta negativa (vigente por CODART_CACHE_TTL_NEGATIVO)."""
+    _escribir(tipo, documento, "null", mensaje)
+
+
+def _desalojar(con: sqlite3.Connection) -> int:
+    """Si se pasó del máximo, borra las menos usadas hasta quedar al 90 %."""
+    maximo = _max_bytes()
+    total = con.execute("SELECT bytes FROM _total WHERE id = 1").fetchone()[0]
+    if total <= maximo:
+        return 0
+    objetivo = int(maximo * 0.9)
+    a_borrar = []
+    cursor = con.execute("SELECT tipo, documento, tamano FROM consultas ORDER BY usado")
+    for tipo, documento, tamano in cursor:
+        if total <= objetivo:
+            break
+        a_borrar.append((tipo, documento))
+        total -= tamano
+    cursor.close()
+    con.executemany("DELETE FROM consultas WHERE tipo = ? AND documento = ?", a_borrar)
+    return len(a_borrar)
+
+
+def olvidar(tipo: str, documento: str) -> None:
+    """Quita una entrada (ej. si se sabe que el dato cambió)."""
+    con = _conexion()
+    if con is None:
+        return
+    try:
+        con.execute("DELETE FROM consultas WHERE tipo = ? AND documento = ?", (tipo, documento))
+    except sqlite3.Error:
+        pass
+
+
+def estadisticas() -> Dict[str, object]:
+    """Aciertos / fallos de este proceso, entradas y bytes en disco."""
+    with _LOCK:
+        datos: Dict[str, object] = dict(_ESTADISTICAS)
+    con = _conexion()
+    datos["activa"] = con is not None
+    if con is not None:
+        try:
+            datos["entradas"] = con.execute("SELECT COUNT(*) FROM consultas").fetchone()[0]
+            datos["bytes"] = con.execute("SELECT bytes FROM _total WHERE id = 1").fetchone()[0]
+        except sqlite3.Error:
+            pass
+    datos["max_bytes"] = _max_bytes()
+    return datos
@@ -1,12 +1,33 @@
 # integraciones/codart.py
+"""
+Cliente de la API CODART (RENIEC DNI / SUNAT RUC).
+
+Todas las consultas comparten una sesión HTTP del proceso: conexiones
+keep-alive en un pool acotado (CODART_POOL_CONEXIONES), con el token y
+los headers resueltos una sola vez. estadisticas() expone reutilización
+de conexiones y latencias para dimensionar el pool.
+
+Cada familia de consulta recuerda qué variante de endpoint (documento en
+la ruta o en la query, GET o POST) funcionó la última vez y la prueba
+primero (ver _consultar).
+"""
 
 from __future__ import annotations
 
-import os
-from typing import Any, Dict, Optional
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
 
 import requests
-import streamlit as st
+from requests.adapters import HTTPAdapter
+from urllib3 import HTTPConnectionPool, HTTPSConnectionPool
+
+from integraciones import cache_consultas
+from integraciones.config import leer_config, leer_config_float
+from integraciones.limitador import LimitadorCuota
 
 BASE_URL = "https://api.codart.cgrt.net/api/v1/consultas"
 
@@ -15,20 +36,16 @@ class CodartAPIError(Exception):
     """Errores al consumir CODART (token, límites, caídas, WAF, etc.)."""
 
 
+class CodartSinResultado(CodartAPIError):
+    """CODART respondió que el documento no existe o no es válido."""
+
+
 def _get_token() -> str:
     """
     Streamlit Cloud: usa st.secrets["CODART_TOKEN"].
     Fallback: variable de entorno CODART_TOKEN.
     """
-    token = None
-    try:
-        token = st.secrets.get("CODART_TOKEN")
-    except Exception:
-        token = None
-
-    if not token:
-        token = os.getenv("CODART_TOKEN")
-
+    token = leer_config("CODART_TOKEN")
     if not token:
         raise CodartAPIError(
             "Falta CODART_TOKEN. Configúralo en Streamlit Cloud: Settings → Secrets."
@@ -36,80 +53,323 @@ def _get_token() -> str:
     return str(token).strip()
 
 
-@st.cache_resource
-def _get_session(token: str) -> requests.Session:
+# ---------------------------------------------------------------------------
+# SESIÓN HTTP COMPARTIDA (keep-alive + pool)
+# ---------------------------------------------------------------------------
+
+TIMEOUT = 25  # segundos
+MUESTRAS_LATENCIA = 500
+
+_LOCK = threading.Lock()
+_SESION: Optional[requests.Session] = None
+_LATENCIAS: Deque[float] = deque(maxlen=MUESTRAS_LATENCIA)
+_CONTADORES: Dict[str, int] = {"peticiones": 0, "conexiones_abiertas": 0, "errores_red": 0}
+
+
+def _pool_contado(clase: type) -> type:
+    """Pool de urllib3 que cuenta cada conexión TCP/TLS nueva que abre."""
+
+    class PoolContado(clase):
+        def _new_conn(self):
+            with _LOCK:
+                _CONTADORES["conexiones_abiertas"] += 1
+            return super()._new_conn()
+
+    return PoolContado
+
+
+class _AdaptadorContado(HTTPAdapter):
+    def init_poolmanager(self, *args: Any, **kwargs: Any) -> None:
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _pool_contado(HTTPConnectionPool),
+            "https": _pool_contado(HTTPSConnectionPool),
+        }
+
+
+def _crear_sesion(token: str) -> requests.Session:
     """
-    Session cacheada (mejor performance) + headers anti-406/WAF.
-    Queda cacheada por token: si cambias el secret, se crea otra sesión.
+    Session con headers anti-406/WAF fijados una sola vez y un pool de
+    CODART_POOL_CONEXIONES conexiones keep-alive (por defecto 10); si
+    todas están ocupadas se espera una en vez de abrir más.
     """
+    tam = max(1, int(leer_config_float("CODART_POOL_CONEXIONES", 10)))
+    adaptador = _AdaptadorContado(pool_connections=1, pool_maxsize=tam, pool_block=True)
     s = requests.Session()
+    s.mount("https://", adaptador)
+    s.mount("http://", adaptador)
     s.headers.update(
         {
             "Authorization": f"Bearer {token}",
-            "Accept": "application/json",
-            # clave para evitar bloqueos típicos en Cloud/WAF:
-            "User-Agent": "Mozilla/5.0 (Streamlit; CODART client)",
+            # ModSecurity suele bloquear requests “sin cara de navegador”
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120 Safari/537.36",
+            "Accept": "*/*",  # evita 406 por negociación de contenido
+            "Accept-Language": "es-PE,es;q=0.9,en;q=0.8",
+            "Content-Type": "application/json",  # tu API lo exige (415)
         }
     )
     return s
 
-def _get_json(url: str, params: Optional[dict] = None) -> Dict[str, Any]:
-    token = _get_token()
 
-    session = requests.Session()
+def _get_session() -> requests.Session:
+    """Sesión única del proceso (token y headers se resuelven en el primer uso)."""
+    global _SESION
+    with _LOCK:
+        if _SESION is None:
+            _SESION = _crear_sesion(_get_token())
+        return _SESION
+
+
+def reiniciar_sesion() -> None:
+    """Descarta la sesión (ej. tras rotar CODART_TOKEN); la próxima llamada crea otra."""
+    global _SESION
+    with _LOCK:
+        if _SESION is not None:
+            _SESION.close()
+        _SESION = None
 
-    headers = {
-        "Authorization": f"Bearer {token}",
-        # ModSecurity suele bloquear requests “sin cara de navegador”
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120 Safari/537.36",
-        "Accept": "*/*",  # evita 406 por negociación de contenido
-        "Accept-Language": "es-PE,es;q=0.9,en;q=0.8",
-        "Content-Type": "application/json",  # tu API lo exige (415)
+
+def _pedir(metodo: str, url: str, **kwargs: Any) -> requests.Response:
+    """Una petición por la sesión compartida, midiendo su latencia."""
+    session = _get_session()
+    inicio = time.perf_counter()
+    try:
+        return session.request(metodo, url, timeout=TIMEOUT, **kwargs)
+    except requests.RequestException as e:
+        with _LOCK:
+            _CONTADORES["errores_red"] += 1
+        raise CodartAPIError(f"No se pudo conectar con CODART: {e}") from e
+    finally:
+        with _LOCK:
+            _CONTADORES["peticiones"] += 1
+            _LATENCIAS.append(time.perf_counter() - inicio)
+
+
+def _percentil(valores: List[float], p: float) -> float:
+    if not valores:
+        return 0.0
+    orden = sorted(valores)
+    return orden[min(len(orden) - 1, int(p * len(orden)))]
+
+
+def estadisticas() -> Dict[str, object]:
+    """
+    Uso del pool: peticiones, conexiones abiertas vs. reutilizadas y
+    latencia (ms) de las últimas MUESTRAS_LATENCIA peticiones.
+    """
+    with _LOCK:
+        latencias = list(_LATENCIAS)
+        contadores = dict(_CONTADORES)
+
+    return {
+        **contadores,
+        "conexiones_reutilizadas": max(
+            0, contadores["peticiones"] - contadores["conexiones_abiertas"]
+        ),
+        "pool_conexiones": int(leer_config_float("CODART_POOL_CONEXIONES", 10)),
+        "latencia_media_ms": round(1000 * sum(latencias) / len(latencias), 1) if latencias else 0.0,
+        "latencia_p50_ms": round(1000 * _percentil(latencias, 0.50), 1),
+        "latencia_p95_ms": round(1000 * _percentil(latencias, 0.95), 1),
+        "variantes": variantes_aprendidas(),
     }
 
-    def parse(resp: requests.Response) -> Dict[str, Any]:
-        try:
-            data = resp.json()
-        except Exception:
+
+# success=false solo cuenta como "documento no encontrado / inválido" (y se
+# cachea como negativo) si el mensaje lo dice y no habla del token o del plan
+_TEXTOS_SIN_RESULTADO = ("no encontrado", "no se encontr", "not found", "no existe", "inválid", "invalid")
+_TEXTOS_CUENTA = ("token", "credit", "crédit", "saldo", "plan", "limit", "límit", "cuota", "quota", "autoriz", "authoriz")
+
+
+def _es_sin_resultado(mensaje: str) -> bool:
+    m = mensaje.lower()
+    return any(t in m for t in _TEXTOS_SIN_RESULTADO) and not any(t in m for t in _TEXTOS_CUENTA)
+
+
+def _parse(resp: requests.Response) -> Dict[str, Any]:
+    try:
+        data = resp.json()
+    except Exception:
+        raise CodartAPIError(f"HTTP {resp.status_code}: {(resp.text or '')[:300]}")
+
+    if not isinstance(data, dict):
+        raise CodartAPIError("Respuesta inesperada (no es dict).")
+
+    if data.get("success") is not True:
+        msg = str(data.get("message") or data.get("error") or "success=false")
+        if _es_sin_resultado(msg):
+            raise CodartSinResultado(f"CODART respondió error: {msg}")
+        raise CodartAPIError(f"CODART respondió error: {msg}")
+
+    return data
+
+
+# ---------------------------------------------------------------------------
+# VARIANTES DE ENDPOINT APRENDIDAS
+# ---------------------------------------------------------------------------
+# Cada consulta (familia "dni" / "ruc") admite cuatro variantes: documento
+# en la ruta (/reniec/dni/{dni}) o en la query (/reniec/dni/dni?dni=...),
+# por GET o por POST con JSON (el WAF a veces bloquea una y no la otra).
+# Se recuerda la última que funcionó y se prueba primero: en régimen, una
+# consulta es un solo round trip. Cada CODART_RUTA_VIGENCIA segundos (por
+# defecto 1800) una consulta vuelve a sondear las variantes en su orden
+# normal, por si la preferida dejó de ser la mejor.
+
+VARIANTES = ("ruta_get", "ruta_post", "query_get", "query_post")
+
+# Respuestas que indican "esta variante no sirve, prueba otra"
+CODIGOS_OTRA_VARIANTE = {403, 404, 405, 406, 415}
+
+_RUTAS: Dict[str, Tuple[str, float]] = {}  # familia -> (variante, última vez que funcionó)
+_SONDEOS: Dict[str, float] = {}  # familia -> último sondeo en orden normal
+
+
+def _orden_variantes(familia: str) -> List[str]:
+    vigencia = leer_config_float("CODART_RUTA_VIGENCIA", 1800.0)
+    ahora = time.monotonic()
+    with _LOCK:
+        ruta = _RUTAS.get(familia)
+        if ruta is None:
+            return list(VARIANTES)
+        if ahora - _SONDEOS.get(familia, ahora) > vigencia:
+            _SONDEOS[familia] = ahora
+            return list(VARIANTES)
+    return [ruta[0]] + [v for v in VARIANTES if v != ruta[0]]
+
+
+def _recordar_variante(familia: str, variante: str) -> None:
+    ahora = time.monotonic()
+    with _LOCK:
+        _RUTAS[familia] = (variante, ahora)
+        _SONDEOS.setdefault(familia, ahora)
+
+
+def _olvidar_variante(familia: str) -> None:
+    with _LOCK:
+        _RUTAS.pop(familia, None)
+        _SONDEOS.pop(familia, None)
+
+
+def _consultar(familia: str, url_ruta: str, url_query: str, params: dict) -> Dict[str, Any]:
+    """
+    Hace la consulta probando las variantes en el orden aprendido. Solo
+    pasa a la siguiente ante 403/404/405/406/415; otros errores se
+    reportan tal cual.
+    """
+    intentos: List[str] = []
+    primer_cuerpo = ""
+    sin_ruta = set()  # formas ("ruta" / "query") que dieron 404
+    for variante in _orden_variantes(familia):
+        forma, metodo = variante.split("_")
+        if forma in sin_ruta:
+            continue
+
+        if forma == "ruta":
+            url, datos = url_ruta, {}
+        else:
+            url, datos = url_query, params
+        if metodo == "get":
+            resp = _pedir("GET", url, params=datos or None)
+        else:
+            resp = _pedir("POST", url, json=datos)
+
+        if resp.status_code in CODIGOS_OTRA_VARIANTE:
+            if resp.status_code == 404:
+                sin_ruta.add(forma)
+            if not intentos:
+                primer_cuerpo = (resp.text or "")[:200]
+            intentos.append(f"{variante}={resp.status_code}")
+            continue
+
+        if resp.status_code >= 400:
             raise CodartAPIError(f"HTTP {resp.status_code}: {(resp.text or '')[:300]}")
 
-        if not isinstance(data, dict):
-            raise CodartAPIError("Respuesta inesperada (no es dict).")
+        _recordar_variante(familia, variante)
+        return _parse(resp)
 
-        if data.get("success") is not True:
-            msg = data.get("message") or data.get("error") or "success=false"
-            raise CodartAPIError(f"CODART respondió error: {msg}")
+    _olvidar_variante(familia)
+    raise CodartAPIError(
+        f"Bloqueado por servidor/WAF ({', '.join(intentos)}). Respuesta: {primer_cuerpo}"
+    )
 
-        return data
 
-    # Intento 1: GET
-    resp = session.get(url, headers=headers, params=params, timeout=25)
+def variantes_aprendidas() -> Dict[str, str]:
+    """Variante preferida por familia."""
+    with _LOCK:
+        return {f: v for f, (v, _) in _RUTAS.items()}
 
-    # Si WAF bloquea (406) o Content-Type (415), probamos variantes
-    if resp.status_code in (406, 415, 403):
-        # Intento 2: POST con JSON (muchas APIs terminan aceptando esto mejor)
-        resp2 = session.post(url, headers=headers, json=(params or {}), timeout=25)
-        if resp2.status_code < 400:
-            return parse(resp2)
 
-        # Intento 3: GET sin params (si params causan regla WAF), y params en URL “manual”
-        # (opcional, útil si el WAF odia ciertos patrones)
-        resp3 = session.get(url, headers=headers, timeout=25)
-        if resp3.status_code < 400:
-            return parse(resp3)
+# ---------------------------------------------------------------------------
+# CACHÉ (positiva, negativa y stale-while-revalidate)
+# ---------------------------------------------------------------------------
+# - Respuesta vigente en disco: se devuelve sin tocar la red.
+# - Respuesta negativa vigente (no encontrado): se relanza el mismo error.
+# - Respuesta vencida: se devuelve al instante y se refresca en un hilo de
+#   fondo (uno por documento a la vez), así el autocompletado de un
+#   documento conocido nunca espera a la red.
+# Los errores transitorios (red, 5xx, WAF) no se guardan.
 
-        # Si nada funcionó, muestra ambos para debug
-        raise CodartAPIError(
-            f"Bloqueado por servidor/WAF. GET={resp.status_code} POST={resp2.status_code}. "
-            f"GET body: {(resp.text or '')[:200]}"
-        )
+_REFRESCANDO: set = set()
+_REINTENTAR_DESDE: Dict[Tuple[str, str], float] = {}
+_REFRESCOS = ThreadPoolExecutor(max_workers=2, thread_name_prefix="refresco-codart")
 
-    if resp.status_code >= 400:
-        raise CodartAPIError(f"HTTP {resp.status_code}: {(resp.text or '')[:300]}")
 
-    return parse(resp)
+def _guardar_resultado(tipo: str, documento: str, consultar: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+    try:
+        res = consultar()
+    except CodartSinResultado as e:
+        cache_consultas.guardar_error(tipo, documento, str(e))
+        raise
+    cache_consultas.guardar(tipo, documento, res)
+    return res
 
 
+def _refrescar(tipo: str, documento: str, consultar: Callable[[], Dict[str, Any]]) -> None:
+    clave = (tipo, documento)
+    try:
+        res = consultar()
+    except Exception:
+        # Nunca se reemplaza una respuesta buena por un error: se sigue
+        # sirviendo lo guardado y se reintenta pasado CODART_CACHE_TTL_NEGATIVO
+        with _LOCK:
+            _REINTENTAR_DESDE[clave] = time.monotonic() + cache_consultas.ttl_negativo()
+    else:
+        cache_consultas.guardar(tipo, documento, res)
+        with _LOCK:
+            _REINTENTAR_DESDE.pop(clave, None)
+    finally:
+        with _LOCK:
+            _REFRESCANDO.discard(clave)
+
+
+def _refrescar_en_fondo(tipo: str, documento: str, consultar: Callable[[], Dict[str, Any]]) -> None:
+    clave = (tipo, documento)
+    with _LOCK:
+        if clave in _REFRESCANDO or time.monotonic() < _REINTENTAR_DESDE.get(clave, 0.0):
+            return
+        _REFRESCANDO.add(clave)
+    _REFRESCOS.submit(_refrescar, tipo, documento, consultar)
+
+
+def _desde_cache(
+    tipo: str, documento: str, consultar: Callable[[], Dict[str, Any]]
+) -> Optional[Dict[str, Any]]:
+    """Respuesta guardada (relanza la negativa); None si hay que ir a CODART."""
+    entrada = cache_consultas.leer(tipo, documento)
+    if entrada is None:
+        return None
+    if entrada.error is not None:
+        raise CodartSinResultado(entrada.error)
+    if not entrada.vigente:
+        _refrescar_en_fondo(tipo, documento, consultar)
+    return entrada.valor
+
+
+def _cacheado(tipo: str, documento: str, consultar: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+    """Respuesta desde la caché en disco o, si no está, desde CODART."""
+    res = _desde_cache(tipo, documento, consultar)
+    if res is not None:
+        return res
+    return _guardar_resultado(tipo, documento, consultar)
 
 
 def validar_dni(dni: str) -> str:
@@ -126,50 +386,136 @@ def validar_ruc(ruc: str) -> str:
     return ruc
 
 
-@st.cache_data(ttl=60 * 60 * 24)  # 24h
+def _api_dni(dni_ok: str) -> Dict[str, Any]:
+    data = _consultar(
+        "dni",
+        f"{BASE_URL}/reniec/dni/{dni_ok}",
+        f"{BASE_URL}/reniec/dni/dni",
+        {"dni": dni_ok},
+    )
+    return data.get("result", {}) or {}
+
+
+def _api_ruc(ruc_ok: str) -> Dict[str, Any]:
+    data = _consultar(
+        "ruc",
+        f"{BASE_URL}/sunat/ruc/{ruc_ok}",
+        f"{BASE_URL}/sunat/ruc/ruc",
+        {"ruc": ruc_ok},
+    )
+    return data.get("result", {}) or {}
+
+
 def consultar_dni(dni: str) -> Dict[str, Any]:
     """
     RENIEC DNI.
     Soporta /reniec/dni/{dni} y /reniec/dni/dni?dni=...
+    Respuesta cacheada en disco (ver integraciones/cache_consultas.py);
+    si no existe lanza CodartSinResultado (también cacheado, por poco tiempo).
     """
     dni_ok = validar_dni(dni)
-
-    url_a = f"{BASE_URL}/reniec/dni/{dni_ok}"
-    url_b = f"{BASE_URL}/reniec/dni/dni"
-    params_b = {"dni": dni_ok}
-
-    try:
-        data = _get_json(url_a)
-        return data.get("result", {}) or {}
-    except CodartAPIError as e:
-        msg = str(e)
-        if "HTTP 404" in msg or "HTTP 406" in msg:
-            data = _get_json(url_b, params=params_b)
-            return data.get("result", {}) or {}
-        raise
+    return _cacheado("dni", dni_ok, partial(_api_dni, dni_ok))
 
 
-@st.cache_data(ttl=60 * 60 * 24)  # 24h
 def consultar_ruc(ruc: str) -> Dict[str, Any]:
     """
     SUNAT RUC.
     Soporta /sunat/ruc/{ruc} y /sunat/ruc/ruc?ruc=...
+    Respuesta cacheada en disco (ver integraciones/cache_consultas.py);
+    si no existe lanza CodartSinResultado (también cacheado, por poco tiempo).
     """
     ruc_ok = validar_ruc(ruc)
+    return _cacheado("ruc", ruc_ok, partial(_api_ruc, ruc_ok))
+
+
+# ---------------------------------------------------------------------------
+# CONSULTA EN LOTE
+# ---------------------------------------------------------------------------
+
+_TIPOS: Dict[str, Tuple[Callable[[str], str], Callable[[str], Dict[str, Any]]]] = {
+    "dni": (validar_dni, _api_dni),
+    "ruc": (validar_ruc, _api_ruc),
+}
+
+_LIMITADOR_LOTE: Optional[LimitadorCuota] = None
+
 
-    url_a = f"{BASE_URL}/sunat/ruc/{ruc_ok}"
-    url_b = f"{BASE_URL}/sunat/ruc/ruc"
-    params_b = {"ruc": ruc_ok}
+class ResultadoLote(NamedTuple):
+    documento: str
+    resultado: Optional[Dict[str, Any]]
+    error: Optional[str]
+    desde_cache: bool
 
+
+def _limitador_lote() -> LimitadorCuota:
+    """Token bucket del proceso: CODART_LOTE_POR_SEGUNDO consultas (por defecto 5)."""
+    global _LIMITADOR_LOTE
+    with _LOCK:
+        if _LIMITADOR_LOTE is None:
+            por_segundo = max(0.1, leer_config_float("CODART_LOTE_POR_SEGUNDO", 5))
+            _LIMITADOR_LOTE = LimitadorCuota(por_segundo * 60, max(1.0, por_segundo))
+        return _LIMITADOR_LOTE
+
+
+def _limitada(consultar: Callable[[], Dict[str, Any]]) -> Callable[[], Dict[str, Any]]:
+    """'consultar' pasando antes por el limitador del lote."""
+    def _consultar_limitada() -> Dict[str, Any]:
+        _limitador_lote().adquirir()
+        return consultar()
+    return _consultar_limitada
+
+
+def consultar_lote(tipo: str, documentos: Iterable[Any]) -> Iterator[ResultadoLote]:
+    """
+    Consulta muchos DNI ("dni") o RUC ("ruc") y entrega cada resultado
+    apenas está listo (primero los que ya estaban en caché).
+
+    - Se quitan duplicados y los documentos inválidos salen con su error
+      sin consultar nada.
+    - Lo que no está en caché se consulta en CODART_LOTE_HILOS hilos (por
+      defecto 4) sin pasar de CODART_LOTE_POR_SEGUNDO consultas por
+      segundo en todo el proceso. Los refrescos de fondo de las respuestas
+      vencidas también pasan por ese límite.
+    - Si se deja de iterar, las consultas que faltaban se cancelan.
+    """
+    validar, api = _TIPOS[tipo]
+    unicos = list(dict.fromkeys(str(d).strip() for d in documentos if str(d or "").strip()))
+
+    pendientes: List[str] = []
+    for doc in unicos:
+        try:
+            doc_ok = validar(doc)
+        except ValueError as e:
+            yield ResultadoLote(doc, None, str(e), False)
+            continue
+        try:
+            res = _desde_cache(tipo, doc_ok, _limitada(partial(api, doc_ok)))
+        except CodartSinResultado as e:
+            yield ResultadoLote(doc, None, str(e), True)
+            continue
+        if res is None:
+            pendientes.append(doc_ok)
+        else:
+            yield ResultadoLote(doc, res, None, True)
+
+    if not pendientes:
+        return
+
+    def tarea(doc_ok: str) -> Dict[str, Any]:
+        return _guardar_resultado(tipo, doc_ok, _limitada(partial(api, doc_ok)))
+
+    hilos = max(1, int(leer_config_float("CODART_LOTE_HILOS", 4)))
+    ejecutor = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="lote-codart")
     try:
-        data = _get_json(url_a)
-        return data.get("result", {}) or {}
-    except CodartAPIError as e:
-        msg = str(e)
-        if "HTTP 404" in msg or "HTTP 406" in msg:
-            data = _get_json(url_b, params=params_b)
-            return data.get("result", {}) or {}
-        raise
+        futuros = {ejecutor.submit(tarea, doc): doc for doc in pendientes}
+        for futuro in as_completed(futuros):
+            doc = futuros[futuro]
+            try:
+                yield ResultadoLote(doc, futuro.result(), None, False)
+            except Exception as e:
+                yield ResultadoLote(doc, None, str(e), False)
+    finally:
+        ejecutor.shutdown(wait=False, cancel_futures=True)
 
 
 def dni_a_nombre_completo(res: Dict[str, Any]) -> str:
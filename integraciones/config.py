@@ -0,0 +1,39 @@
+# integraciones/config.py
+"""
+Lectura de parámetros de configuración.
+
+Streamlit Cloud: usa st.secrets[NOMBRE].
+Fallback: variable de entorno NOMBRE.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Any
+
+import streamlit as st
+
+
+def leer_config(nombre: str, por_defecto: Any = None) -> Any:
+    """
+    Devuelve st.secrets[nombre] o, si no está, os.environ[nombre].
+    Si tampoco existe, devuelve 'por_defecto'.
+    """
+    valor = None
+    try:
+        valor = st.secrets.get(nombre)
+    except Exception:
+        valor = None
+
+    if valor is None:
+        valor = os.getenv(nombre)
+
+    return por_defecto if valor is None else valor
+
+
+def leer_config_float(nombre: str, por_defecto: float) -> float:
+    """Igual que leer_config, pero convierte a float (con fallback)."""
+    try:
+        return float(leer_config(nombre, por_defecto))
+    except (TypeError, ValueError):
+        return float(por_defecto)
@@ -0,0 +1,101 @@
+# integraciones/exportar.py
+"""
+Exportación a Excel (.xlsx) de los registros (BD de anuncios, hojas de
+Comercio), bajo demanda:
+
+- El archivo se arma solo cuando el usuario pulsa el botón de descarga
+  (st.download_button con data=callable), no en cada rerun.
+- Se escribe con un workbook write-only de openpyxl: las filas se
+  vuelcan en streaming, sin construir el modelo de celdas en memoria.
+- Caché por contenido (hoja + columnas + hash de los datos, ver
+  versiones.version_df): si nadie cambió la BD, una nueva descarga se
+  sirve al instante. Se guardan los EXPORTAR_CACHE_MAX últimos (por
+  defecto 8), compartidos por todas las sesiones del proceso.
+"""
+
+from __future__ import annotations
+
+import re
+import threading
+from collections import OrderedDict
+from io import BytesIO
+from typing import Callable, Dict, Tuple
+
+import pandas as pd
+import streamlit as st
+from openpyxl import Workbook
+
+from integraciones.config import leer_config_float
+from integraciones.versiones import version_df
+
+MIME_XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+_LOCK = threading.Lock()
+_ARCHIVOS: "OrderedDict[Tuple[str, Tuple[str, ...], str], bytes]" = OrderedDict()
+_ESTADISTICAS: Dict[str, int] = {"aciertos": 0, "generados": 0}
+
+
+def _titulo_hoja(nombre: str) -> str:
+    """Nombre válido de hoja de Excel (sin []:*?/\\ y hasta 31 caracteres)."""
+    limpio = re.sub(r"[\[\]:*?/\\]", " ", nombre).strip()
+    return (limpio or "Datos")[:31]
+
+
+def _escribir_xlsx(df: pd.DataFrame, hoja: str) -> bytes:
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(_titulo_hoja(hoja))
+    ws.append([str(c) for c in df.columns])
+    for fila in df.astype(object).where(df.notna(), None).itertuples(index=False, name=None):
+        ws.append(fila)
+    buffer = BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+
+def excel_bytes(df: pd.DataFrame, hoja: str = "Datos") -> bytes:
+    """Contenido .xlsx del DataFrame (desde la caché si no cambió)."""
+    columnas = tuple(str(c) for c in df.columns)
+    clave = (hoja, columnas, version_df(df, df.columns))
+    with _LOCK:
+        contenido = _ARCHIVOS.get(clave)
+        if contenido is not None:
+            _ARCHIVOS.move_to_end(clave)
+            _ESTADISTICAS["aciertos"] += 1
+            return contenido
+
+    contenido = _escribir_xlsx(df, hoja)
+    maximo = max(1, int(leer_config_float("EXPORTAR_CACHE_MAX", 8)))
+    with _LOCK:
+        _ARCHIVOS[clave] = contenido
+        _ARCHIVOS.move_to_end(clave)
+        while len(_ARCHIVOS) > maximo:
+            _ARCHIVOS.popitem(last=False)
+        _ESTADISTICAS["generados"] += 1
+    return contenido
+
+
+def estadisticas() -> Dict[str, int]:
+    """Descargas servidas desde la caché vs. archivos generados."""
+    with _LOCK:
+        return {**_ESTADISTICAS, "en_cache": len(_ARCHIVOS)}
+
+
+def boton_descarga_excel(
+    etiqueta: str,
+    cargar: Callable[[], pd.DataFrame],
+    nombre_archivo: str,
+    hoja: str = "Datos",
+    key: str | None = None,
+) -> None:
+    """
+    Botón de descarga que lee los datos (cargar()) y arma el .xlsx solo
+    al pulsarlo. No provoca un rerun de la página.
+    """
+    st.download_button(
+        etiqueta,
+        data=lambda: excel_bytes(cargar(), hoja),
+        file_name=nombre_archivo,
+        mime=MIME_XLSX,
+        key=key,
+        on_click="ignore",
+    )
@@ -0,0 +1,157 @@
+# integraciones/google_cliente.py
+"""
+Cliente de Google (Sheets / Drive) único para todo el proceso.
+
+Comercio y Anuncios usan el mismo cliente gspread:
+
+- Una sola credencial de la cuenta de servicio (st.secrets
+  ["gcp_service_account"]) y una sola sesión HTTP.
+- Pool de conexiones acotado (GOOGLE_POOL_CONEXIONES, por defecto 20):
+  las sesiones de Streamlit que llaman a la vez reutilizan conexiones
+  keep-alive; si todas están ocupadas se espera una en vez de abrir más.
+- Token renovado por adelantado: un hilo lo renueva
+  GOOGLE_TOKEN_MARGEN segundos (por defecto 600) antes de que venza, así
+  ninguna llamada de un usuario paga la renovación.
+- Todas las llamadas pasan por el limitador de cuota del proceso
+  (ver integraciones/limitador.py).
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import json
+import threading
+import time
+from typing import Dict, Optional
+
+import gspread
+import requests
+from google.auth.transport.requests import AuthorizedSession, Request
+from google.oauth2.service_account import Credentials
+from requests.adapters import HTTPAdapter
+
+from integraciones.config import leer_config, leer_config_float
+from integraciones.limitador import HTTPClientLimitado
+
+SCOPES = [
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive",
+]
+
+_LOCK = threading.Lock()
+# Serializa las renovaciones del token (Credentials no es thread-safe)
+_LOCK_TOKEN = threading.Lock()
+_CLIENTE: Optional[gspread.Client] = None
+_CREDENCIALES: Optional[Credentials] = None
+_SESION: Optional[AuthorizedSession] = None
+# Sesión simple (sin bearer) solo para pedir tokens al endpoint de OAuth
+_SESION_TOKEN: Optional[requests.Session] = None
+_RENOVADOR: Optional[threading.Thread] = None
+_ESTADO: Dict[str, object] = {"renovaciones": 0, "errores_renovacion": 0}
+
+
+class _CredencialesSincronizadas(Credentials):
+    """
+    Credenciales cuya renovación pasa siempre por _LOCK_TOKEN, la haga el
+    hilo renovador o la sesión por su cuenta (token vencido / 401). Si al
+    obtener el lock otro hilo ya trajo un token nuevo, no se pide otro.
+    """
+
+    def refresh(self, request) -> None:
+        visto = self.token
+        with _LOCK_TOKEN:
+            if self.token != visto and self.valid:
+                return
+            super().refresh(request)
+            _ESTADO["renovaciones"] = int(_ESTADO["renovaciones"]) + 1
+
+
+def _info_cuenta_servicio() -> dict:
+    """Datos de la cuenta de servicio (dict en secrets o JSON en env)."""
+    info = leer_config("gcp_service_account")
+    if info is None:
+        raise RuntimeError("Falta la configuración 'gcp_service_account'.")
+    if isinstance(info, str):
+        return json.loads(info)
+    return dict(info)
+
+
+def _sesion(creds: Credentials) -> AuthorizedSession:
+    """Sesión autenticada con un pool de conexiones acotado."""
+    tam = max(1, int(leer_config_float("GOOGLE_POOL_CONEXIONES", 20)))
+    sesion = AuthorizedSession(creds, auth_request=Request(_SESION_TOKEN))
+    adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=tam, pool_block=True)
+    sesion.mount("https://", adaptador)
+    return sesion
+
+
+def _renovar() -> None:
+    _CREDENCIALES.refresh(Request(_SESION_TOKEN))
+
+
+def _segundos_para_renovar() -> float:
+    margen = leer_config_float("GOOGLE_TOKEN_MARGEN", 600.0)
+    expira = _CREDENCIALES.expiry
+    if expira is None:
+        return 60.0
+    # google-auth guarda expiry como UTC sin zona horaria
+    ahora = dt.datetime.now(dt.timezone.utc).replace(tzinfo=None)
+    restante = (expira - ahora).total_seconds()
+    return max(0.0, restante - margen)
+
+
+def _bucle_renovador() -> None:
+    espera_error = 5.0
+    while True:
+        time.sleep(_segundos_para_renovar())
+        try:
+            _renovar()
+            espera_error = 5.0
+        except Exception:
+            # Sin red / Google caído: se reintenta; si el token llega a
+            # vencer, google-auth lo renueva en la siguiente llamada
+            _ESTADO["errores_renovacion"] = int(_ESTADO["errores_renovacion"]) + 1
+            time.sleep(espera_error)
+            espera_error = min(espera_error * 2, 300.0)
+
+
+def cliente_gspread() -> gspread.Client:
+    """
+    Cliente gspread del proceso (se crea en el primer uso, con el token
+    ya obtenido y el hilo renovador en marcha).
+    """
+    global _CLIENTE, _CREDENCIALES, _SESION, _SESION_TOKEN, _RENOVADOR
+    with _LOCK:
+        if _CLIENTE is not None:
+            return _CLIENTE
+
+        _SESION_TOKEN = requests.Session()
+        creds = _CredencialesSincronizadas.from_service_account_info(
+            _info_cuenta_servicio(), scopes=SCOPES
+        )
+        sesion = _sesion(creds)
+        _CREDENCIALES, _SESION = creds, sesion
+        _renovar()
+
+        cliente = gspread.Client(creds, session=sesion, http_client=HTTPClientLimitado)
+        # Con sesión propia gspread no guarda la credencial (Client.expiry la usa)
+        cliente.http_client.auth = creds
+
+        _RENOVADOR = threading.Thread(
+            target=_bucle_renovador, name="renovador-token-google", daemon=True
+        )
+        _RENOVADOR.start()
+        _CLIENTE = cliente
+        return cliente
+
+
+def estado() -> Dict[str, object]:
+    """Vencimiento del token, renovaciones hechas y tamaño del pool."""
+    with _LOCK:
+        creado = _CLIENTE is not None
+    return {
+        "creado": creado,
+        "token_expira": _CREDENCIALES.expiry if creado else None,
+        "pool_conexiones": int(leer_config_float("GOOGLE_POOL_CONEXIONES", 20)),
+        **_ESTADO,
+    }
@@ -0,0 +1,740 @@
+# integraciones/gsheets.py
+"""
+Helpers compartidos de Google Sheets (Comercio Ambulatorio y Anuncios).
+
+- Escrituras incrementales: solo se envían las filas nuevas (append),
+  nunca se borra y reescribe la hoja completa.
+- Actualizaciones por clave: se ubica la fila física leyendo solo la
+  columna clave y se envían únicamente las celdas modificadas.
+- Registro de handles por proceso: Spreadsheet y Worksheet se abren una
+  sola vez y el encabezado se valida una sola vez; solo se vuelven a
+  resolver si la hoja fue renombrada o eliminada. Las escrituras ubican
+  las columnas por posición: un encabezado con columnas movidas se
+  rechaza (EncabezadoInvalidoError).
+- Escrituras serializadas por hoja dentro del proceso y reescrituras
+  completas con control de versión (ver integraciones/versiones.py).
+"""
+
+from __future__ import annotations
+
+import contextlib
+import threading
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, TypeVar
+
+import gspread
+import pandas as pd
+from gspread.utils import absolute_range_name, rowcol_to_a1
+
+from integraciones import versiones
+
+T = TypeVar("T")
+
+# Veces que reescribir_versionado() vuelve a leer y fusionar si el libro
+# cambió mientras armaba lo que va a escribir
+REINTENTOS_REESCRITURA = 3
+
+# Asignador de correlativos: recibe cuántas filas se agregan y devuelve el
+# primer número reservado (ver integraciones/secuencias.py).
+Numerador = Callable[[int], int]
+
+# ---------------------------------------------------------------------------
+# REGISTRO DE HANDLES (compartido por todas las sesiones del proceso)
+# ---------------------------------------------------------------------------
+
+_LOCK_REGISTRO = threading.RLock()
+
+# spreadsheet_id -> Spreadsheet
+_LIBROS: Dict[str, gspread.Spreadsheet] = {}
+# (spreadsheet_id, nombre_hoja) -> Worksheet (encabezado ya validado)
+_HOJAS: Dict[Tuple[str, str], gspread.Worksheet] = {}
+# (spreadsheet_id, nombre_hoja) -> id interno de la hoja (sobrevive a renombres)
+_HOJA_IDS: Dict[Tuple[str, str], int] = {}
+# (spreadsheet_id, nombre_hoja) -> encabezado real de la hoja (fila 1)
+_ENCABEZADOS: Dict[Tuple[str, str], List[str]] = {}
+# (spreadsheet_id, nombre_hoja) -> lock de escritura (todas las sesiones)
+_LOCKS_ESCRITURA: Dict[Tuple[str, str], threading.RLock] = {}
+
+
+def obtener_libro(client: gspread.Client, spreadsheet_id: str) -> gspread.Spreadsheet:
+    """Devuelve el Spreadsheet abierto una sola vez por proceso."""
+    with _LOCK_REGISTRO:
+        sh = _LIBROS.get(spreadsheet_id)
+        if sh is None:
+            sh = client.open_by_key(spreadsheet_id)
+            _LIBROS[spreadsheet_id] = sh
+        return sh
+
+
+def _resolver_worksheet(
+    sh: gspread.Spreadsheet,
+    clave: Tuple[str, str],
+    columnas: Sequence[str],
+    crear: bool,
+) -> gspread.Worksheet:
+    """
+    Busca la hoja por nombre; si no está, por su id anterior (fue renombrada);
+    si tampoco, la crea (o usa la primera hoja si crear=False).
+    """
+    sheet_name = clave[1]
+    try:
+        return sh.worksheet(sheet_name)
+    except gspread.exceptions.WorksheetNotFound:
+        pass
+
+    hoja_id = _HOJA_IDS.get(clave)
+    if hoja_id is not None:
+        try:
+            return sh.get_worksheet_by_id(hoja_id)
+        except gspread.exceptions.WorksheetNotFound:
+            pass
+
+    if not crear:
+        return sh.sheet1
+    return sh.add_worksheet(title=sheet_name, rows=1000, cols=len(columnas) + 2)
+
+
+class EncabezadoInvalidoError(ValueError):
+    """La fila 1 de la hoja no tiene las columnas en el orden esperado."""
+
+
+class EscrituraConcurrenteError(RuntimeError):
+    """La hoja siguió cambiando mientras se preparaba una reescritura."""
+
+
+def _validar_encabezado(
+    ws: gspread.Worksheet, sheet_name: str, columnas: Sequence[str]
+) -> List[str]:
+    """
+    Las escrituras (append, celdas por clave, reescrituras) ubican cada
+    columna por su posición en 'columnas', así que la fila 1 debe empezar
+    con esas columnas en ese orden. Si está vacía o le faltan columnas al
+    final (hoja de una versión anterior), se completa; columnas extra al
+    final se toleran. Cualquier otra diferencia (columnas movidas o
+    renombradas) se rechaza: escribir por posición mezclaría los datos.
+    """
+    encabezado = [str(c).strip() for c in ws.row_values(1)]
+    while encabezado and encabezado[-1] == "":
+        encabezado.pop()
+    esperado = list(columnas)
+    comun = min(len(encabezado), len(esperado))
+    for i in range(comun):
+        if encabezado[i] != esperado[i]:
+            raise EncabezadoInvalidoError(
+                f"La hoja '{sheet_name}' tiene en la columna {letra_columna(i + 1)} "
+                f"'{encabezado[i]}' y se esperaba '{esperado[i]}'. Restaure el orden "
+                f"de columnas: {', '.join(esperado)}."
+            )
+    if len(encabezado) < len(esperado):
+        ws.update("A1", [esperado])
+        encabezado = esperado + encabezado[len(esperado):]
+    return encabezado
+
+
+def obtener_worksheet(
+    client: gspread.Client,
+    spreadsheet_id: str,
+    sheet_name: str,
+    columnas: Sequence[str],
+    crear: bool = True,
+) -> gspread.Worksheet:
+    """
+    Devuelve la worksheet desde el registro del proceso.
+
+    La primera vez: la abre (o la crea) y valida el encabezado (ver
+    _validar_encabezado; EncabezadoInvalidoError si las columnas están
+    movidas). Las siguientes veces no hace ninguna llamada a la API.
+    """
+    clave = (spreadsheet_id, sheet_name)
+    with _LOCK_REGISTRO:
+        ws = _HOJAS.get(clave)
+        if ws is not None:
+            return ws
+
+        sh = obtener_libro(client, spreadsheet_id)
+        ws = _resolver_worksheet(sh, clave, columnas, crear)
+
+        # Validación única del encabezado (solo la fila 1, no toda la hoja)
+        encabezado = _validar_encabezado(ws, sheet_name, columnas)
+
+        _HOJAS[clave] = ws
+        _HOJA_IDS[clave] = ws.id
+        _ENCABEZADOS[clave] = encabezado
+        return ws
+
+
+def encabezado_hoja(
+    client: gspread.Client,
+    spreadsheet_id: str,
+    sheet_name: str,
+    columnas: Sequence[str],
+    crear: bool = True,
+) -> List[str]:
+    """Encabezado real de la hoja (leído una sola vez, junto con el handle)."""
+    obtener_worksheet(client, spreadsheet_id, sheet_name, columnas, crear)
+    with _LOCK_REGISTRO:
+        return list(_ENCABEZADOS.get((spreadsheet_id, sheet_name), columnas))
+
+
+def invalidar_worksheet(spreadsheet_id: str, sheet_name: str) -> None:
+    """Olvida el handle para que se vuelva a resolver en el próximo uso."""
+    with _LOCK_REGISTRO:
+        _HOJAS.pop((spreadsheet_id, sheet_name), None)
+        _ENCABEZADOS.pop((spreadsheet_id, sheet_name), None)
+
+
+@contextlib.contextmanager
+def bloqueo_escritura(claves: Iterable[Tuple[str, str]]) -> Iterator[None]:
+    """
+    Serializa las escrituras del proceso sobre esas hojas
+    [(spreadsheet_id, nombre_hoja), ...]: un append de otra sesión no puede
+    caer entre la lectura y la escritura de una reescritura completa.
+    Los locks se toman en orden para no bloquearse entre sí.
+    """
+    with _LOCK_REGISTRO:
+        locks = [
+            _LOCKS_ESCRITURA.setdefault(clave, threading.RLock())
+            for clave in sorted(set(claves))
+        ]
+    with contextlib.ExitStack() as pila:
+        for lock in locks:
+            pila.enter_context(lock)
+        yield
+
+
+def revision_libro(sh: gspread.Spreadsheet) -> Optional[str]:
+    """modifiedTime del archivo en Drive (None si no se pudo consultar)."""
+    try:
+        return sh.get_lastUpdateTime()
+    except Exception:
+        return None
+
+
+def es_error_hoja_inexistente(exc: Exception) -> bool:
+    """
+    True si el error de la API indica que la hoja ya no existe con ese
+    nombre/id (renombrada o eliminada desde la interfaz de Sheets).
+    """
+    if not isinstance(exc, gspread.exceptions.APIError):
+        return False
+    texto = str(exc)
+    return "Unable to parse range" in texto or "No grid with id" in texto
+
+
+def con_worksheet(
+    client: gspread.Client,
+    spreadsheet_id: str,
+    sheet_name: str,
+    columnas: Sequence[str],
+    fn: Callable[[gspread.Worksheet], T],
+    crear: bool = True,
+    escritura: bool = False,
+) -> T:
+    """
+    Ejecuta fn(ws) con el handle cacheado. Si falla porque la hoja fue
+    renombrada o eliminada, vuelve a resolver el handle y reintenta una vez.
+    Con escritura=True, fn corre dentro de bloqueo_escritura() de la hoja.
+    """
+    if escritura:
+        with bloqueo_escritura([(spreadsheet_id, sheet_name)]):
+            return con_worksheet(client, spreadsheet_id, sheet_name, columnas, fn, crear)
+
+    ws = obtener_worksheet(client, spreadsheet_id, sheet_name, columnas, crear)
+    try:
+        return fn(ws)
+    except gspread.exceptions.APIError as e:
+        if not es_error_hoja_inexistente(e):
+            raise
+        invalidar_worksheet(spreadsheet_id, sheet_name)
+        ws = obtener_worksheet(client, spreadsheet_id, sheet_name, columnas, crear)
+        return fn(ws)
+
+
+# ---------------------------------------------------------------------------
+# FILAS
+# ---------------------------------------------------------------------------
+
+
+def fila_a_valores(columnas: Sequence[str], fila: Dict[str, object]) -> List[str]:
+    """
+    Convierte un dict {columna: valor} en la lista de celdas de la hoja,
+    en el orden de 'columnas'. Columnas ausentes o None quedan en "".
+    """
+    valores = []
+    for col in columnas:
+        val = fila.get(col, "")
+        valores.append("" if val is None else str(val))
+    return valores
+
+
+def valores_a_df(values: List[List[str]], columnas: Sequence[str]) -> pd.DataFrame:
+    """
+    Convierte la matriz de la hoja (fila 1 = encabezado) en DataFrame de
+    texto con exactamente 'columnas', en ese orden (las que falten en la
+    hoja quedan en "").
+    """
+    if not values:
+        return pd.DataFrame(columns=list(columnas))
+
+    header = values[0]
+    filas = values[1:]
+
+    df = pd.DataFrame(filas, columns=header)
+
+    # Asegura que existan todas las columnas esperadas
+    for col in columnas:
+        if col not in df.columns:
+            df[col] = ""
+
+    return df[list(columnas)]
+
+
+def letra_columna(idx: int) -> str:
+    """Letra A1 de la columna 'idx' (desde 1): 1 → A, 27 → AA."""
+    return rowcol_to_a1(1, idx).rstrip("1")
+
+
+# ---------------------------------------------------------------------------
+# LECTURA EN LOTE (varias hojas, solo las columnas necesarias)
+# ---------------------------------------------------------------------------
+
+
+def leer_por_columnas(
+    sh: gspread.Spreadsheet, rangos: Sequence[str]
+) -> List[List[List[str]]]:
+    """
+    Lee varios rangos A1 (de una o varias hojas) en UNA llamada
+    values.batchGet, por columnas. Devuelve, por rango, la lista de
+    columnas (cada una sin las celdas vacías del final).
+    """
+    if not rangos:
+        return []
+    resp = sh.values_batch_get(list(rangos), params={"majorDimension": "COLUMNS"})
+    bloques = [list(r.get("values") or []) for r in resp.get("valueRanges", [])]
+    return bloques + [[] for _ in range(len(rangos) - len(bloques))]
+
+
+def columnas_a_filas(columnas_leidas: List[List[str]], ancho: int) -> List[List[str]]:
+    """Traspone columnas (de distinto largo) a filas de 'ancho' celdas."""
+    alto = max((len(c) for c in columnas_leidas), default=0)
+    return [
+        [
+            (columnas_leidas[j][i] if j < len(columnas_leidas) and i < len(columnas_leidas[j]) else "")
+            for j in range(ancho)
+        ]
+        for i in range(alto)
+    ]
+
+
+def leer_columnas(
+    client: gspread.Client,
+    spreadsheet_id: str,
+    pedidos: Dict[str, Tuple[Sequence[str], Sequence[str]]],
+    crear: bool = True,
+) -> Dict[str, pd.DataFrame]:
+    """
+    Lectura proyectada de varias hojas en UNA sola llamada a la API.
+
+    'pedidos' es {nombre_hoja: (columnas_de_la_hoja, columnas_pedidas)}.
+    Solo se descargan las columnas pedidas (desde la fila 2); las que no
+    existan en la hoja quedan en "". Devuelve {nombre_hoja: DataFrame}.
+    """
+
+    def _leer() -> Dict[str, pd.DataFrame]:
+        sh = obtener_libro(client, spreadsheet_id)
+        rangos: List[str] = []
+        plan: List[Tuple[str, List[str], List[int]]] = []
+        for sheet_name, (columnas, pedidas) in pedidos.items():
+            ws = obtener_worksheet(client, spreadsheet_id, sheet_name, columnas, crear)
+            header = encabezado_hoja(client, spreadsheet_id, sheet_name, columnas, crear)
+            posiciones = []
+            for col in pedidas:
+                if col in header:
+                    letra = letra_columna(header.index(col) + 1)
+                    posiciones.append(len(rangos))
+                    rangos.append(absolute_range_name(ws.title, f"{letra}2:{letra}"))
+                else:
+                    posiciones.append(-1)
+            plan.append((sheet_name, list(pedidas), posiciones))
+
+        bloques = leer_por_columnas(sh, rangos)
+        salida: Dict[str, pd.DataFrame] = {}
+        for sheet_name, pedidas, posiciones in plan:
+            cols = [
+                (bloques[i][0] if i >= 0 and bloques[i] else []) for i in posiciones
+            ]
+            salida[sheet_name] = pd.DataFrame(
+                columnas_a_filas(cols, len(pedidas)), columns=pedidas
+            )
+        return salida
+
+    try:
+        return _leer()
+    except gspread.exceptions.APIError as e:
+        if not es_error_hoja_inexistente(e):
+            raise
+        for sheet_name in pedidos:
+            invalidar_worksheet(spreadsheet_id, sheet_name)
+        return _leer()
+
+
+def tramos_contiguos(posiciones: Iterable[int]) -> List[Tuple[int, int]]:
+    """[5, 6, 7, 10, 2] -> [(2, 2), (5, 7), (10, 10)] (inicio y fin incluidos)."""
+    tramos: List[Tuple[int, int]] = []
+    for p in sorted(set(posiciones)):
+        if tramos and p == tramos[-1][1] + 1:
+            tramos[-1] = (tramos[-1][0], p)
+        else:
+            tramos.append((p, p))
+    return tramos
+
+
+def leer_filas(
+    client: gspread.Client,
+    spreadsheet_id: str,
+    sheet_name: str,
+    columnas: Sequence[str],
+    posiciones: Sequence[int],
+    crear: bool = True,
+) -> pd.DataFrame:
+    """
+    Lee solo las filas de datos en 'posiciones' (0 = fila 2 de la hoja),
+    en UNA llamada values.batchGet con un rango por tramo contiguo.
+    Devuelve el DataFrame en el orden de 'posiciones', con ese índice.
+    """
+    if not posiciones:
+        return pd.DataFrame(columns=list(columnas))
+
+    def _leer() -> pd.DataFrame:
+        sh = obtener_libro(client, spreadsheet_id)
+        ws = obtener_worksheet(client, spreadsheet_id, sheet_name, columnas, crear)
+        header = encabezado_hoja(client, spreadsheet_id, sheet_name, columnas, crear)
+        ultima = letra_columna(max(len(header), 1))
+        tramos = tramos_contiguos(posiciones)
+        rangos = [
+            absolute_range_name(ws.title, f"A{ini + 2}:{ultima}{fin + 2}")
+            for ini, fin in tramos
+        ]
+        resp = sh.values_batch_get(rangos)
+        bloques = [list(r.get("values") or []) for r in resp.get("valueRanges", [])]
+
+        por_posicion: Dict[int, List[str]] = {}
+        for (ini, fin), bloque in zip(tramos, bloques + [[]] * len(tramos)):
+            for i in range(fin - ini + 1):
+                por_posicion[ini + i] = bloque[i] if i < len(bloque) else []
+        filas = [por_posicion.get(p, []) for p in posiciones]
+        ancho = len(header)
+        filas = [list(f[:ancho]) + [""] * (ancho - len(f)) for f in filas]
+        df = valores_a_df([header] + filas, columnas)
+        df.index = list(posiciones)
+        return df
+
+    try:
+        return _leer()
+    except gspread.exceptions.APIError as e:
+        if not es_error_hoja_inexistente(e):
+            raise
+        invalidar_worksheet(spreadsheet_id, sheet_name)
+        return _leer()
+
+
+# ---------------------------------------------------------------------------
+# REESCRITURA COMPLETA (con control de versión)
+# ---------------------------------------------------------------------------
+
+
+def reescribir_versionado(
+    ws: gspread.Worksheet,
+    columnas: Sequence[str],
+    base: pd.DataFrame,
+    df: pd.DataFrame,
+    col_clave: str | None = None,
+) -> Tuple[pd.DataFrame, dict]:
+    """
+    Reescribe la hoja con 'df', que se armó a partir de 'base' (lo leído).
+
+    Se vuelve a leer la hoja: si cambió desde 'base' se fusiona en vez de
+    pisar (versiones.resolver_escritura, con conflictos resueltos por
+    'col_clave'). Si la revisión del libro cambia mientras tanto (escritura
+    de otra réplica o desde la interfaz de Sheets), se vuelve a leer y
+    fusionar; si sigue cambiando tras REINTENTOS_REESCRITURA intentos, no se
+    escribe nada y se lanza EscrituraConcurrenteError.
+    Se escribe encima (sin clear previo) y solo se limpian las filas que
+    sobran al final, así la hoja nunca queda vacía a mitad de camino.
+
+    Usar dentro de bloqueo_escritura(). Devuelve (lo escrito, resumen).
+    """
+    sh = ws.spreadsheet
+    for _ in range(REINTENTOS_REESCRITURA):
+        revision = revision_libro(sh)
+        actual = valores_a_df(ws.get_all_values(), columnas)
+        final, resumen = versiones.resolver_escritura(base, df, actual, columnas, col_clave)
+        if revision is None or revision_libro(sh) == revision:
+            break
+    else:
+        raise EscrituraConcurrenteError(
+            f"La hoja '{ws.title}' cambió {REINTENTOS_REESCRITURA} veces mientras "
+            "se guardaba; no se escribió nada. Vuelva a intentarlo."
+        )
+
+    values = [list(columnas)] + final.values.tolist()
+    ws.update("A1", values)
+
+    filas_antes = len(actual) + 1
+    if filas_antes > len(values):
+        ws.batch_clear([f"{len(values) + 1}:{filas_antes}"])
+    return final, resumen
+
+
+# ---------------------------------------------------------------------------
+# APPEND
+# ---------------------------------------------------------------------------
+
+
+def append_filas(
+    ws: gspread.Worksheet,
+    columnas: Sequence[str],
+    filas: Sequence[Dict[str, object]],
+    auto_numero_col: str | None = None,
+    numerador: Numerador | None = None,
+) -> List[List[str]]:
+    """
+    Agrega 'filas' al final de la hoja en UNA sola llamada (values.append).
+
+    - No lee la hoja completa ni la reescribe.
+    - Si auto_numero_col no es None, se rellena con el correlativo
+      (1, 2, 3, ...): lo asigna 'numerador' si se indica; si no, se lee
+      solo esa columna para saber cuántas filas hay.
+
+    Devuelve las filas tal como se escribieron (listas de strings).
+    """
+    if not filas:
+        return []
+
+    valores = [fila_a_valores(columnas, fila) for fila in filas]
+
+    if auto_numero_col and auto_numero_col in columnas:
+        idx = list(columnas).index(auto_numero_col)
+        if numerador is not None:
+            siguiente = numerador(len(valores))
+        else:
+            # col_values incluye el encabezado → len(...) = filas de datos + 1
+            siguiente = max(len(ws.col_values(idx + 1)), 1)
+        for i, fila_valores in enumerate(valores):
+            fila_valores[idx] = str(siguiente + i)
+
+    ws.append_rows(valores, value_input_option="RAW", table_range="A1")
+    return valores
+
+
+# ---------------------------------------------------------------------------
+# BORRADO DE FILAS
+# ---------------------------------------------------------------------------
+
+
+def borrar_filas(
+    sh: gspread.Spreadsheet, ws: gspread.Worksheet, filas: Iterable[int]
+) -> int:
+    """
+    Borra las filas físicas indicadas (1 = encabezado) en UNA sola llamada
+    (spreadsheets.batchUpdate con un deleteDimension por tramo contiguo).
+    Los tramos van de abajo hacia arriba para que no se corran los índices.
+    Devuelve cuántas filas se borraron.
+    """
+    tramos = tramos_contiguos(filas)
+    if not tramos:
+        return 0
+    sh.batch_update({"requests": pedidos_borrar_filas(ws, filas)})
+    return sum(fin - ini + 1 for ini, fin in tramos)
+
+
+def pedidos_borrar_filas(ws: gspread.Worksheet, filas: Iterable[int]) -> List[Dict[str, object]]:
+    """Pedidos deleteDimension de borrar_filas(), para sumarlos a otro batchUpdate."""
+    return [
+        {
+            "deleteDimension": {
+                "range": {
+                    "sheetId": ws.id,
+                    "dimension": "ROWS",
+                    "startIndex": ini - 1,
+                    "endIndex": fin,
+                }
+            }
+        }
+        for ini, fin in reversed(tramos_contiguos(filas))
+    ]
+
+
+# ---------------------------------------------------------------------------
+# LOCALIZADOR DE FILAS + PARCHE DE CELDAS
+# ---------------------------------------------------------------------------
+
+
+def normalizar_clave(valor: object) -> str:
+    """Clave de negocio comparable: texto sin espacios a los extremos."""
+    return "" if valor is None else str(valor).strip()
+
+
+def localizar_filas(
+    ws: gspread.Worksheet,
+    columnas: Sequence[str],
+    col_clave: str,
+    claves: Iterable[object],
+) -> Dict[str, List[int]]:
+    """
+    Mapea cada clave de negocio (N° DE EVALUACIÓN, N° DE DOCUMENTO SIMPLE, ...)
+    a las filas físicas de la hoja donde aparece (1 = encabezado).
+
+    Solo descarga la columna clave, no la hoja completa.
+    Las claves que no se encuentran no aparecen en el resultado.
+    """
+    buscadas = {normalizar_clave(c) for c in claves}
+    buscadas.discard("")
+    if not buscadas:
+        return {}
+
+    idx = list(columnas).index(col_clave)
+    valores_col = ws.col_values(idx + 1)
+
+    encontrados: Dict[str, List[int]] = {}
+    for num_fila, valor in enumerate(valores_col[1:], start=2):
+        clave = normalizar_clave(valor)
+        if clave in buscadas:
+            encontrados.setdefault(clave, []).append(num_fila)
+    return encontrados
+
+
+def bloques_contiguos(
+    columnas: Sequence[str], valores: Dict[str, object]
+) -> List[Tuple[int, int, List[str]]]:
+    """
+    Agrupa las celdas cambiadas de una fila en bloques de columnas
+    contiguas: [(idx_inicio, idx_fin, [valores...]), ...] (índices desde 0).
+    Así se envía la menor cantidad de rangos posible.
+    """
+    celdas = sorted(
+        (list(columnas).index(col), "" if val is None else str(val))
+        for col, val in valores.items()
+        if col in columnas
+    )
+
+    bloques: List[Tuple[int, int, List[str]]] = []
+    for idx, val in celdas:
+        if bloques and idx == bloques[-1][1] + 1:
+            inicio, _, vals = bloques[-1]
+            bloques[-1] = (inicio, idx, vals + [val])
+        else:
+            bloques.append((idx, idx, [val]))
+    return bloques
+
+
+def _rangos_de_fila(
+    columnas: Sequence[str], num_fila: int, valores: Dict[str, object]
+) -> List[Dict[str, object]]:
+    """Bloques contiguos de una fila en notación A1 (ej. L5:O5)."""
+    rangos = []
+    for inicio, fin, vals in bloques_contiguos(columnas, valores):
+        a1 = rowcol_to_a1(num_fila, inicio + 1)
+        if fin > inicio:
+            a1 += ":" + rowcol_to_a1(num_fila, fin + 1)
+        rangos.append({"range": a1, "values": [vals]})
+    return rangos
+
+
+def actualizar_celdas(
+    ws: gspread.Worksheet,
+    columnas: Sequence[str],
+    cambios: Dict[int, Dict[str, object]],
+) -> int:
+    """
+    Escribe solo las celdas indicadas, en UNA sola llamada (values.batchUpdate).
+
+    'cambios' es {num_fila_fisica: {columna: nuevo_valor}}.
+    Devuelve la cantidad de filas tocadas.
+    """
+    data: List[Dict[str, object]] = []
+    for num_fila, valores in cambios.items():
+        data.extend(_rangos_de_fila(columnas, num_fila, valores))
+
+    if not data:
+        return 0
+
+    ws.batch_update(data, value_input_option="RAW")
+    return len(cambios)
+
+
+def _celda(valor: object) -> Dict[str, object]:
+    return {"userEnteredValue": {"stringValue": "" if valor is None else str(valor)}}
+
+
+def pedidos_actualizar_celdas(
+    ws: gspread.Worksheet,
+    columnas: Sequence[str],
+    cambios: Dict[int, Dict[str, object]],
+) -> List[Dict[str, object]]:
+    """
+    Como actualizar_celdas(), pero como pedidos updateCells para un
+    spreadsheets.batchUpdate (junto con borrados o filas nuevas).
+    """
+    pedidos: List[Dict[str, object]] = []
+    for num_fila, valores in cambios.items():
+        for inicio, fin, vals in bloques_contiguos(columnas, valores):
+            pedidos.append(
+                {
+                    "updateCells": {
+                        "range": {
+                            "sheetId": ws.id,
+                            "startRowIndex": num_fila - 1,
+                            "endRowIndex": num_fila,
+                            "startColumnIndex": inicio,
+                            "endColumnIndex": fin + 1,
+                        },
+                        "rows": [{"values": [_celda(v) for v in vals]}],
+                        "fields": "userEnteredValue",
+                    }
+                }
+            )
+    return pedidos
+
+
+def pedido_agregar_filas(
+    ws: gspread.Worksheet, valores: Sequence[Sequence[object]]
+) -> List[Dict[str, object]]:
+    """Pedido appendCells con 'valores' (listas de celdas); [] si no hay filas."""
+    if not valores:
+        return []
+    return [
+        {
+            "appendCells": {
+                "sheetId": ws.id,
+                "rows": [{"values": [_celda(v) for v in fila]} for fila in valores],
+                "fields": "userEnteredValue",
+            }
+        }
+    ]
+
+
+def actualizar_por_clave(
+    ws: gspread.Worksheet,
+    columnas: Sequence[str],
+    col_clave: str,
+    cambios_por_clave: Dict[str, Dict[str, object]],
+) -> int:
+    """
+    Versión por clave de negocio (y en bloque) de actualizar_celdas:
+    'cambios_por_clave' es {clave: {columna: nuevo_valor}}.
+
+    Se hacen 2 llamadas en total, sin importar cuántas claves se actualicen:
+    una para leer la columna clave y otra para escribir las celdas.
+    Devuelve la cantidad de filas actualizadas.
+    """
+    cambios_norm = {
+        normalizar_clave(k): v for k, v in cambios_por_clave.items()
+    }
+    filas = localizar_filas(ws, columnas, col_clave, cambios_norm.keys())
+
+    cambios: Dict[int, Dict[str, object]] = {}
+    for clave, nums in filas.items():
+        for num_fila in nums:
+            cambios[num_fila] = cambios_norm[clave]
+
+    return actualizar_celdas(ws, columnas, cambios)
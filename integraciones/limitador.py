@@ -0,0 +1,237 @@
+# integraciones/limitador.py
+"""
+Limitador de cuota compartido (todo el proceso) para las llamadas a la API
+de Google Sheets / Drive hechas con gspread.
+
+- Token bucket: SHEETS_CUOTA_POR_MINUTO llamadas por minuto (por defecto
+  60, la cuota por usuario de Sheets) con ráfagas de hasta
+  SHEETS_CUOTA_RAFAGA (por defecto 10).
+- Prioridades: cuando hay cola, pasan primero las escrituras, luego las
+  lecturas de la UI y al final las lecturas de fondo (ver prioridad()).
+- Reintentos con backoff exponencial con jitter ante 429 y 5xx
+  (SHEETS_REINTENTOS, por defecto 5). Las llamadas que agregan filas no
+  se reintentan ante 5xx: podrían haberse aplicado y se duplicarían.
+- estadisticas(): llamadas, reintentos y segundos de espera por minuto,
+  para dimensionar cuántos usuarios soporta un despliegue.
+
+Uso: gspread.authorize(creds, http_client=HTTPClientLimitado)
+"""
+
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import heapq
+import itertools
+import random
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional
+
+from gspread.exceptions import APIError
+from gspread.http_client import HTTPClient
+
+from integraciones.config import leer_config_float
+
+PRIORIDAD_ESCRITURA = 0
+PRIORIDAD_LECTURA = 1
+PRIORIDAD_FONDO = 2
+
+NOMBRES_PRIORIDAD = {
+    PRIORIDAD_ESCRITURA: "escritura",
+    PRIORIDAD_LECTURA: "lectura",
+    PRIORIDAD_FONDO: "fondo",
+}
+
+CODIGOS_REINTENTABLES = {429, 500, 502, 503, 504}
+BACKOFF_BASE = 1.0  # segundos
+BACKOFF_MAXIMO = 32.0
+MINUTOS_HISTORIAL = 60
+
+_PRIORIDAD: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar(
+    "prioridad_sheets", default=None
+)
+
+
+@contextlib.contextmanager
+def prioridad(nivel: int) -> Iterator[None]:
+    """
+    Fija la prioridad de las llamadas hechas dentro del bloque, ej.:
+
+        with prioridad(PRIORIDAD_FONDO):
+            refrescar_algo()
+    """
+    token = _PRIORIDAD.set(nivel)
+    try:
+        yield
+    finally:
+        _PRIORIDAD.reset(token)
+
+
+# ---------------------------------------------------------------------------
+# TOKEN BUCKET CON PRIORIDADES
+# ---------------------------------------------------------------------------
+
+
+class LimitadorCuota:
+    """Token bucket con cola por prioridad (menor número = pasa antes)."""
+
+    def __init__(self, por_minuto: float, rafaga: float):
+        self.tasa = max(por_minuto, 1.0) / 60.0
+        self.capacidad = max(rafaga, 1.0)
+        self._tokens = self.capacidad
+        self._ultimo = time.monotonic()
+        self._cond = threading.Condition()
+        self._cola: List[tuple] = []
+        self._secuencia = itertools.count()
+
+    def _recargar(self) -> None:
+        ahora = time.monotonic()
+        self._tokens = min(
+            self.capacidad, self._tokens + (ahora - self._ultimo) * self.tasa
+        )
+        self._ultimo = ahora
+
+    def adquirir(self, prioridad: int = PRIORIDAD_LECTURA) -> float:
+        """Espera un token respetando la prioridad. Devuelve los segundos esperados."""
+        inicio = time.monotonic()
+        turno = (prioridad, next(self._secuencia))
+        with self._cond:
+            heapq.heappush(self._cola, turno)
+            try:
+                while True:
+                    self._recargar()
+                    if self._cola[0] == turno and self._tokens >= 1:
+                        heapq.heappop(self._cola)
+                        self._tokens -= 1
+                        break
+                    if self._cola[0] == turno:
+                        espera = (1 - self._tokens) / self.tasa
+                    else:
+                        espera = None  # hasta que el de adelante pase
+                    self._cond.wait(timeout=espera)
+            except BaseException:
+                if turno in self._cola:
+                    self._cola.remove(turno)
+                    heapq.heapify(self._cola)
+                raise
+            finally:
+                self._cond.notify_all()
+        return time.monotonic() - inicio
+
+
+# ---------------------------------------------------------------------------
+# MÉTRICAS POR MINUTO
+# ---------------------------------------------------------------------------
+
+_LOCK_METRICAS = threading.Lock()
+_METRICAS: "OrderedDict[int, Dict[str, float]]" = OrderedDict()
+
+
+def _registrar(prioridad: int, espera: float, reintento: bool = False, codigo: int = 0) -> None:
+    minuto = int(time.time() // 60)
+    with _LOCK_METRICAS:
+        m = _METRICAS.get(minuto)
+        if m is None:
+            m = _METRICAS[minuto] = {
+                "llamadas": 0,
+                "reintentos": 0,
+                "errores_429": 0,
+                "espera_s": 0.0,
+                "escritura": 0,
+                "lectura": 0,
+                "fondo": 0,
+            }
+            while len(_METRICAS) > MINUTOS_HISTORIAL:
+                _METRICAS.popitem(last=False)
+        m["espera_s"] += espera
+        if reintento:
+            m["reintentos"] += 1
+            if codigo == 429:
+                m["errores_429"] += 1
+        else:
+            m["llamadas"] += 1
+            m[NOMBRES_PRIORIDAD.get(prioridad, "lectura")] += 1
+
+
+def estadisticas() -> List[Dict[str, object]]:
+    """
+    Uso por minuto (últimos MINUTOS_HISTORIAL): llamadas (por prioridad),
+    reintentos, errores 429 y segundos esperando cuota o backoff.
+    """
+    with _LOCK_METRICAS:
+        return [
+            {"minuto": time.strftime("%Y-%m-%d %H:%M", time.localtime(k * 60)), **v}
+            for k, v in _METRICAS.items()
+        ]
+
+
+# ---------------------------------------------------------------------------
+# LIMITADOR DEL PROCESO + CLIENTE HTTP
+# ---------------------------------------------------------------------------
+
+_LOCK = threading.Lock()
+_LIMITADOR: Optional[LimitadorCuota] = None
+_MAX_REINTENTOS: Optional[int] = None
+
+
+def limitador() -> LimitadorCuota:
+    """Limitador único del proceso (se configura en el primer uso)."""
+    global _LIMITADOR
+    with _LOCK:
+        if _LIMITADOR is None:
+            _LIMITADOR = LimitadorCuota(
+                leer_config_float("SHEETS_CUOTA_POR_MINUTO", 60),
+                leer_config_float("SHEETS_CUOTA_RAFAGA", 10),
+            )
+        return _LIMITADOR
+
+
+def max_reintentos() -> int:
+    """SHEETS_REINTENTOS (por defecto 5), leído una sola vez por proceso."""
+    global _MAX_REINTENTOS
+    if _MAX_REINTENTOS is None:
+        _MAX_REINTENTOS = int(leer_config_float("SHEETS_REINTENTOS", 5))
+    return _MAX_REINTENTOS
+
+
+def _backoff(intento: int) -> float:
+    """Exponencial con jitter completo: U(0, min(máx, base·2^intento))."""
+    return random.uniform(0, min(BACKOFF_MAXIMO, BACKOFF_BASE * (2 ** intento)))
+
+
+def _agrega_filas(method: str, endpoint: str) -> bool:
+    """True si la llamada no es idempotente (append / appendCells)."""
+    if method.upper() != "POST":
+        return False
+    return endpoint.endswith(":append") or (
+        endpoint.endswith(":batchUpdate") and "/values:batchUpdate" not in endpoint
+    )
+
+
+class HTTPClientLimitado(HTTPClient):
+    """HTTPClient de gspread que pasa cada llamada por el limitador."""
+
+    def request(self, method, endpoint, *args, **kwargs):
+        nivel = _PRIORIDAD.get()
+        if nivel is None:
+            nivel = PRIORIDAD_LECTURA if method.upper() == "GET" else PRIORIDAD_ESCRITURA
+        reintentos = max_reintentos()
+
+        intento = 0
+        while True:
+            _registrar(nivel, limitador().adquirir(nivel))
+            try:
+                return super().request(method, endpoint, *args, **kwargs)
+            except APIError as e:
+                codigo = e.response.status_code
+                reintentable = codigo == 429 or (
+                    codigo in CODIGOS_REINTENTABLES and not _agrega_filas(method, endpoint)
+                )
+                if not reintentable or intento >= reintentos:
+                    raise
+            espera = _backoff(intento)
+            intento += 1
+            _registrar(nivel, espera, reintento=True, codigo=codigo)
+            time.sleep(espera)
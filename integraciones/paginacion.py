@@ -0,0 +1,433 @@
+# integraciones/paginacion.py
+"""
+Lectura paginada y edición por ventana de una hoja de registros.
+
+Las vistas (últimos D.S., evaluaciones, autorizaciones, BD de anuncios)
+muestran una página a la vez; en vez de traer la hoja completa:
+
+- Sin filtros ni orden: se lee solo la columna sonda (para saber cuántas
+  filas hay) y luego solo las filas de la página.
+- Con filtros / orden: se leen solo las columnas filtradas / ordenadas,
+  se calculan las posiciones y se traen solo las filas de la página.
+- Si la hoja está vigente en la caché compartida, todo sale de memoria.
+- En modo sqlite: SELECT ... ORDER BY ... LIMIT / OFFSET.
+
+guardar_ventana() aplica solo la diferencia con la página leída (celdas
+editadas, filas agregadas y quitadas) en un solo spreadsheets.batchUpdate,
+y solo sobre filas que siguen como se leyeron. Cada fila se ubica por su
+clave de negocio (col_clave), no por la posición leída: si otra sesión
+insertó o borró filas entretanto, se sigue tocando la fila correcta; si
+la cambió, se reporta como conflicto y no se pisa.
+"""
+
+from __future__ import annotations
+
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import gspread
+import pandas as pd
+
+from integraciones import sheets_cache, sheets_sync, sqlite_store
+from integraciones.gsheets import (
+    con_worksheet,
+    fila_a_valores,
+    leer_columnas,
+    leer_filas,
+    localizar_filas,
+    normalizar_clave,
+    obtener_libro,
+    pedido_agregar_filas,
+    pedidos_actualizar_celdas,
+    pedidos_borrar_filas,
+)
+from integraciones.tipado import FORMATO_FECHA, Esquema
+
+
+class FuenteHoja:
+    """De dónde sale una vista paginada: una hoja y cómo llegar a ella."""
+
+    __slots__ = (
+        "spreadsheet_id",
+        "sheet_name",
+        "columnas",
+        "cliente",
+        "col_sonda",
+        "col_clave",
+        "esquema",
+        "tabla_sqlite",
+        "crear",
+    )
+
+    def __init__(
+        self,
+        spreadsheet_id: str,
+        sheet_name: str,
+        columnas: Sequence[str],
+        cliente: Callable[[], gspread.Client],
+        col_sonda: Optional[str] = None,
+        col_clave: Optional[str] = None,
+        esquema: Optional[Esquema] = None,
+        tabla_sqlite: Optional[Callable[[], str]] = None,
+        crear: bool = True,
+    ):
+        self.spreadsheet_id = spreadsheet_id
+        self.sheet_name = sheet_name
+        self.columnas: List[str] = list(columnas)
+        self.cliente = cliente
+        # Columna que siempre tiene valor: su largo es el total de filas
+        self.col_sonda = col_sonda or self.columnas[0]
+        # Clave de negocio con la que guardar_ventana() ubica cada fila
+        # (sin ella, o si está vacía, se usa la posición leída)
+        self.col_clave = col_clave
+        self.esquema = esquema
+        self.tabla_sqlite = tabla_sqlite
+        self.crear = crear
+
+    @property
+    def clave_cache(self) -> Tuple[str, str]:
+        return (self.spreadsheet_id, self.sheet_name)
+
+    def es_fecha(self, col: Optional[str]) -> bool:
+        return bool(col) and self.esquema is not None and col in self.esquema.fechas
+
+
+class Pagina(NamedTuple):
+    # Filas de la página; el índice identifica la fila para guardar_ventana()
+    df: pd.DataFrame
+    total: int
+    numero: int
+    tam: int
+
+    @property
+    def paginas(self) -> int:
+        return max(1, -(-self.total // self.tam))
+
+    @property
+    def desde(self) -> int:
+        """Número (desde 1) de la primera fila mostrada."""
+        return (self.numero - 1) * self.tam + 1 if self.total else 0
+
+
+def _limpiar_filtros(fuente: FuenteHoja, filtros: Optional[Dict[str, str]]) -> Dict[str, str]:
+    return {
+        col: str(texto).strip().upper()
+        for col, texto in (filtros or {}).items()
+        if col in fuente.columnas and str(texto or "").strip()
+    }
+
+
+def _posiciones(
+    fuente: FuenteHoja,
+    proy: pd.DataFrame,
+    filtros: Dict[str, str],
+    orden: Optional[str],
+    descendente: bool,
+) -> List[int]:
+    """Posiciones (0 = fila 2) que pasan los filtros, en el orden pedido."""
+    mascara = pd.Series(True, index=proy.index)
+    for col, texto in filtros.items():
+        mascara &= proy[col].astype(str).str.upper().str.contains(texto, regex=False)
+    sub = proy[mascara]
+
+    if not orden:
+        posiciones = sub.index.tolist()
+        return posiciones[::-1] if descendente else posiciones
+
+    valores = sub[orden].astype(str).str.strip()
+    if fuente.es_fecha(orden):
+        llave = pd.to_datetime(valores, format=FORMATO_FECHA, errors="coerce")
+    else:
+        llave = valores.str.upper()
+    return llave.sort_values(
+        ascending=not descendente, kind="stable", na_position="last"
+    ).index.tolist()
+
+
+def leer_pagina(
+    fuente: FuenteHoja,
+    numero: int = 1,
+    tam: int = 50,
+    orden: Optional[str] = None,
+    descendente: bool = False,
+    filtros: Optional[Dict[str, str]] = None,
+) -> Pagina:
+    """
+    Página 'numero' (desde 1) de 'tam' filas. 'filtros' es {columna: texto}
+    (contiene, sin distinguir mayúsculas); sin 'orden' se usa el orden de
+    la hoja (descendente=True: los últimos registros primero).
+    """
+    tam = max(1, int(tam))
+    filtros = _limpiar_filtros(fuente, filtros)
+    if orden not in fuente.columnas:
+        orden = None
+
+    if sqlite_store.modo_sqlite() and fuente.tabla_sqlite is not None:
+        tabla = fuente.tabla_sqlite()
+        numero = max(1, int(numero))
+        while True:
+            df, total = sqlite_store.pagina(
+                tabla,
+                fuente.columnas,
+                (numero - 1) * tam,
+                tam,
+                filtros,
+                orden,
+                descendente,
+                fuente.es_fecha(orden),
+            )
+            ultima = max(1, -(-total // tam))
+            if numero <= ultima:
+                return Pagina(df, total, numero, tam)
+            # Página fuera de rango (la tabla se achicó): la última
+            numero = ultima
+
+    necesarias = list(dict.fromkeys([fuente.col_sonda, *filtros, *([orden] if orden else [])]))
+    proy = sheets_cache.proyectar_vigente(fuente.clave_cache, necesarias)
+    desde_cache = proy is not None
+    if proy is None:
+        proy = leer_columnas(
+            fuente.cliente(),
+            fuente.spreadsheet_id,
+            {fuente.sheet_name: (fuente.columnas, necesarias)},
+            crear=fuente.crear,
+        )[fuente.sheet_name]
+
+    posiciones = _posiciones(fuente, proy, filtros, orden, descendente)
+    total = len(posiciones)
+    numero = min(max(1, int(numero)), max(1, -(-total // tam)))
+    ventana = posiciones[(numero - 1) * tam : numero * tam]
+
+    df = sheets_cache.filas_vigentes(fuente.clave_cache, ventana) if desde_cache else None
+    if df is None or len(df) != len(ventana):
+        df = leer_filas(
+            fuente.cliente(),
+            fuente.spreadsheet_id,
+            fuente.sheet_name,
+            fuente.columnas,
+            ventana,
+            crear=fuente.crear,
+        )
+    return Pagina(df, total, numero, tam)
+
+
+# ---------------------------------------------------------------------------
+# EDICIÓN POR VENTANA
+# ---------------------------------------------------------------------------
+
+
+class DiffVentana(NamedTuple):
+    # {índice de fila: {columna: nuevo valor}} de las celdas editadas
+    cambios: Dict[object, Dict[str, str]]
+    # Índices de las filas quitadas en el editor
+    borradas: List[object]
+    # Filas agregadas en el editor ({columna: valor})
+    nuevas: List[Dict[str, str]]
+
+    def vacio(self) -> bool:
+        return not (self.cambios or self.borradas or self.nuevas)
+
+
+def _identidad(etiqueta: object) -> object:
+    """Índice comparable: 4, 4.0 y "4" son la misma fila; NaN es ninguna."""
+    if etiqueta is None or (isinstance(etiqueta, float) and pd.isna(etiqueta)):
+        return None
+    try:
+        numero = float(etiqueta)
+    except (TypeError, ValueError):
+        return etiqueta
+    return int(numero) if numero.is_integer() else numero
+
+
+def diff_ventana(
+    columnas: Sequence[str], original: pd.DataFrame, editado: pd.DataFrame
+) -> DiffVentana:
+    """
+    Diferencia estructural entre la página leída y lo que devolvió el
+    editor. La identidad de cada fila es su índice (posición en la hoja o
+    _fila en sqlite): el editor lo conserva en las filas existentes y las
+    agregadas traen un índice nuevo (o vacío).
+    """
+    editado = editado.astype(object).where(editado.notna(), "")
+    comunes = [c for c in columnas if c in original.columns and c in editado.columns]
+    # Al agregar filas el editor puede volver el índice float (4 -> 4.0)
+    en_original = {_identidad(fila): fila for fila in original.index}
+
+    cambios: Dict[object, Dict[str, str]] = {}
+    nuevas: List[Dict[str, str]] = []
+    vistos = set()
+    for etiqueta, valores in zip(editado.index, editado[comunes].itertuples(index=False)):
+        despues = dict(zip(comunes, (normalizar_clave(v) for v in valores)))
+        fila = en_original.get(_identidad(etiqueta))
+        if fila is not None and fila not in vistos:
+            vistos.add(fila)
+            antes = original.loc[fila, comunes]
+            celdas = {
+                col: val
+                for col, val in despues.items()
+                if val != normalizar_clave(antes[col])
+            }
+            if celdas:
+                cambios[fila] = celdas
+        elif any(despues.values()):
+            # Las filas agregadas y dejadas en blanco no se guardan
+            nuevas.append(despues)
+
+    borradas = [fila for fila in original.index if fila not in vistos]
+    return DiffVentana(cambios, borradas, nuevas)
+
+
+def _ubicar(
+    fuente: FuenteHoja, ws: gspread.Worksheet, esperados: Dict[object, List[str]]
+) -> Dict[object, Optional[int]]:
+    """
+    Posición actual (0 = fila 2) de cada fila leída {pos: contenido}: la
+    más cercana a 'pos' que tenga su clave y siga con el mismo contenido.
+    None si ya no está así (otra sesión la cambió o la borró).
+    """
+    idx = fuente.columnas.index(fuente.col_clave) if fuente.col_clave else None
+    claves = {
+        pos: normalizar_clave(fila[idx]) if idx is not None else ""
+        for pos, fila in esperados.items()
+    }
+    por_clave = (
+        localizar_filas(ws, fuente.columnas, fuente.col_clave, claves.values())
+        if any(claves.values())
+        else {}
+    )
+    candidatas = {
+        pos: sorted(
+            (f - 2 for f in por_clave.get(k, [])) if k else [int(pos)],
+            key=lambda p, pos=pos: abs(p - int(pos)),
+        )
+        for pos, k in claves.items()
+    }
+    actuales = leer_filas(
+        fuente.cliente(),
+        fuente.spreadsheet_id,
+        fuente.sheet_name,
+        fuente.columnas,
+        sorted({p for ps in candidatas.values() for p in ps}),
+        crear=fuente.crear,
+    )
+
+    usadas = set()
+    salida: Dict[object, Optional[int]] = {}
+    for pos, ps in candidatas.items():
+        salida[pos] = None
+        antes = [normalizar_clave(v) for v in esperados[pos]]
+        for p in ps:
+            if p in usadas or p not in actuales.index:
+                continue
+            if [normalizar_clave(v) for v in actuales.loc[p].tolist()] == antes:
+                usadas.add(p)
+                salida[pos] = p
+                break
+    return salida
+
+
+def guardar_ventana(
+    fuente: FuenteHoja, original: pd.DataFrame, editado: pd.DataFrame
+) -> Dict[str, int]:
+    """
+    Aplica solo lo que cambió en la página ('original' es la página tal
+    como se leyó con leer_pagina, 'editado' lo que devolvió el editor):
+    celdas editadas, filas agregadas y filas quitadas, en un solo
+    spreadsheets.batchUpdate. Las filas se ubican por fuente.col_clave; las
+    editadas o quitadas que otra sesión cambió desde que se leyeron no se
+    tocan y se cuentan como conflicto. Devuelve {"actualizadas", "insertadas", "borradas",
+    "conflictos"}.
+    """
+    diff = diff_ventana(fuente.columnas, original, editado)
+    resumen = {"actualizadas": 0, "insertadas": 0, "borradas": 0, "conflictos": 0}
+    if diff.vacio():
+        return resumen
+    esperados = {
+        fila: original.loc[fila].reindex(fuente.columnas, fill_value="").tolist()
+        for fila in [*diff.cambios, *diff.borradas]
+    }
+
+    if sqlite_store.modo_sqlite() and fuente.tabla_sqlite is not None:
+        tabla = fuente.tabla_sqlite()
+        with sqlite_store.transaccion():
+            actualizadas, conflictos_a = sqlite_store.actualizar_filas(
+                fuente.spreadsheet_id,
+                fuente.sheet_name,
+                fuente.columnas,
+                tabla,
+                diff.cambios,
+                esperados,
+            )
+            borradas, conflictos_b = sqlite_store.borrar_filas(
+                fuente.spreadsheet_id,
+                fuente.sheet_name,
+                fuente.columnas,
+                tabla,
+                diff.borradas,
+                esperados,
+            )
+            escritas = sqlite_store.append_filas(
+                fuente.spreadsheet_id,
+                fuente.sheet_name,
+                fuente.columnas,
+                tabla,
+                diff.nuevas,
+            )
+        sqlite_store.despertar_replicador()
+        resumen.update(
+            actualizadas=actualizadas,
+            borradas=borradas,
+            insertadas=len(escritas),
+            conflictos=len(conflictos_a) + len(conflictos_b),
+        )
+        return resumen
+
+    def _escribir(ws: gspread.Worksheet):
+        # Dentro del bloqueo de escritura: se ubican las filas por clave
+        # (solo la columna clave) y se releen solo las candidatas
+        ubicacion = _ubicar(fuente, ws, esperados)
+        fisica = {pos: p for pos, p in ubicacion.items() if p is not None}
+        cambios = {fisica[pos]: v for pos, v in diff.cambios.items() if pos in fisica}
+        borradas = [fisica[pos] for pos in diff.borradas if pos in fisica]
+        escritas = [fila_a_valores(fuente.columnas, f) for f in diff.nuevas]
+        # Un solo batchUpdate: primero las celdas (posiciones actuales),
+        # luego los borrados (de abajo hacia arriba) y al final las nuevas
+        pedidos = (
+            pedidos_actualizar_celdas(
+                ws, fuente.columnas, {p + 2: v for p, v in cambios.items()}
+            )
+            + pedidos_borrar_filas(ws, [p + 2 for p in borradas])
+            + pedido_agregar_filas(ws, escritas)
+        )
+        if pedidos:
+            obtener_libro(fuente.cliente(), fuente.spreadsheet_id).batch_update(
+                {"requests": pedidos}
+            )
+        movidas = any(p != pos for pos, p in fisica.items())
+        return cambios, borradas, escritas, movidas
+
+    cambios, borradas, escritas, movidas = con_worksheet(
+        fuente.cliente(),
+        fuente.spreadsheet_id,
+        fuente.sheet_name,
+        fuente.columnas,
+        _escribir,
+        crear=fuente.crear,
+        escritura=True,
+    )
+    conflictos = len(diff.cambios) + len(diff.borradas) - len(cambios) - len(borradas)
+    clave = fuente.clave_cache
+    sheets_cache.actualizar_posiciones(clave, cambios)
+    sheets_cache.quitar_posiciones(clave, borradas)
+    sheets_cache.agregar_filas(clave, fuente.columnas, escritas)
+    # La copia de sheets_sync no tiene lo escrito: se descarta
+    sheets_sync.olvidar(clave)
+    if conflictos or movidas:
+        # Otra sesión cambió o movió filas: la próxima lectura trae lo actual
+        sheets_cache.invalidar(clave)
+    resumen.update(
+        actualizadas=len(cambios),
+        borradas=len(borradas),
+        insertadas=len(escritas),
+        conflictos=conflictos,
+    )
+    return resumen
@@ -0,0 +1,232 @@
+# integraciones/secuencias.py
+"""
+Asignador de secuencias por registro y año.
+
+- Correlativos "N°" de cada hoja (registro sin año: anio = 0).
+- Códigos de evaluación / resolución / certificado (uno por año).
+
+La fuente de verdad son los datos compartidos (las hojas y sus archivos
+anuales; en modo sqlite, la base de registros). Lo que se guarda aquí, en
+SQLite (la misma base que sqlite_store: SQLITE_REGISTROS_PATH), es un
+índice local de esos datos más lo que este nodo ya asignó:
+
+- _secuencias: último número asignado por (registro, anio).
+- _codigos: códigos ya usados con PRIMARY KEY (registro, anio, codigo).
+  Saber si un código está repetido es una búsqueda por clave.
+
+Ese archivo no se comparte entre réplicas y se pierde en un redeploy, así
+que se siembra desde los datos compartidos (semilla()) la primera vez que
+el proceso usa un registro, y de nuevo solo cuando cambia la 'version' que
+indica quien llama (la revisión de la copia de la hoja que ya tiene la
+caché: lo escrito por otra réplica llega con la siguiente sincronización).
+Entre siembras, asignar un número o rechazar un código repetido no recorre
+los datos: es una búsqueda por clave.
+
+Cada operación es una transacción BEGIN IMMEDIATE: es segura entre
+sesiones (hilos) y procesos del mismo nodo. Entre réplicas, Sheets no
+ofrece un incremento atómico: lo que otra réplica escriba antes de que la
+caché se sincronice no se ve al asignar.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+import threading
+from typing import Callable, Dict, Hashable, Iterable, List, Sequence, Tuple
+
+from integraciones import sqlite_store
+from integraciones.gsheets import normalizar_clave
+
+
+class CodigoDuplicadoError(ValueError):
+    """Uno o más códigos ya están registrados para ese año."""
+
+    def __init__(self, duplicados: Sequence[Tuple[str, int, str]]):
+        self.duplicados = list(duplicados)
+        detalle = ", ".join(f"{r} {c} ({a})" for r, a, c in self.duplicados)
+        super().__init__(f"Código ya registrado: {detalle}")
+
+
+_LOCK = threading.Lock()
+# (registro, anio | None) -> 'version' de los datos con que se sembró
+_SEMBRADOS: Dict[Tuple[str, object], Hashable] = {}
+
+
+def _sembrado(clave: Tuple[str, object], version: Hashable) -> bool:
+    with _LOCK:
+        return clave in _SEMBRADOS and _SEMBRADOS[clave] == version
+
+
+def _asegurar_tablas(con: sqlite3.Connection) -> None:
+    con.execute(
+        "CREATE TABLE IF NOT EXISTS _secuencias ("
+        " registro TEXT NOT NULL, anio INTEGER NOT NULL,"
+        " ultimo INTEGER NOT NULL, PRIMARY KEY (registro, anio))"
+    )
+    con.execute(
+        "CREATE TABLE IF NOT EXISTS _codigos ("
+        " registro TEXT NOT NULL, anio INTEGER NOT NULL, codigo TEXT NOT NULL,"
+        " PRIMARY KEY (registro, anio, codigo))"
+    )
+
+
+def normalizar_codigo(codigo: object) -> str:
+    return normalizar_clave(codigo).upper()
+
+
+def _subir_ultimo(con: sqlite3.Connection, registro: str, anio: int, numero: int) -> None:
+    con.execute(
+        "INSERT INTO _secuencias (registro, anio, ultimo) VALUES (?, ?, ?) "
+        "ON CONFLICT (registro, anio) DO UPDATE SET "
+        "ultimo = MAX(ultimo, excluded.ultimo)",
+        (registro, anio, numero),
+    )
+
+
+def _ultimo(con: sqlite3.Connection, registro: str, anio: int) -> int:
+    fila = con.execute(
+        "SELECT ultimo FROM _secuencias WHERE registro = ? AND anio = ?",
+        (registro, anio),
+    ).fetchone()
+    return fila[0] if fila else 0
+
+
+# ---------------------------------------------------------------------------
+# CORRELATIVOS (N°)
+# ---------------------------------------------------------------------------
+
+
+def asignar_correlativo(
+    registro: str,
+    cantidad: int,
+    semilla: Callable[[], int],
+    version: Hashable = None,
+) -> int:
+    """
+    Reserva 'cantidad' números consecutivos del registro y devuelve el
+    primero. 'semilla()' devuelve el mayor N° ya existente; se consulta
+    la primera vez y cuando cambia 'version'.
+    """
+    clave = (registro, 0)
+    minimo = None if _sembrado(clave, version) else int(semilla() or 0)
+
+    with sqlite_store.transaccion() as con:
+        _asegurar_tablas(con)
+        if minimo is not None:
+            _subir_ultimo(con, registro, 0, minimo)
+        inicio = _ultimo(con, registro, 0) + 1
+        _subir_ultimo(con, registro, 0, inicio + cantidad - 1)
+
+    if minimo is not None:
+        with _LOCK:
+            _SEMBRADOS[clave] = version
+    return inicio
+
+
+# ---------------------------------------------------------------------------
+# CÓDIGOS POR AÑO
+# ---------------------------------------------------------------------------
+
+
+def sembrar_codigos(
+    registro: str,
+    semilla: Callable[[], Iterable[Tuple[int, str]]],
+    version: Hashable = None,
+) -> None:
+    """
+    Registra los códigos que ya existen en los datos: 'semilla()' devuelve
+    pares (anio, codigo). Se hace la primera vez y cuando cambia 'version'.
+    """
+    clave = (registro, None)
+    if _sembrado(clave, version):
+        return
+
+    pares = [
+        (int(anio), normalizar_codigo(codigo))
+        for anio, codigo in semilla()
+        if normalizar_codigo(codigo)
+    ]
+    with sqlite_store.transaccion() as con:
+        _asegurar_tablas(con)
+        con.executemany(
+            "INSERT OR IGNORE INTO _codigos (registro, anio, codigo) VALUES (?, ?, ?)",
+            [(registro, anio, codigo) for anio, codigo in pares],
+        )
+        for anio, codigo in pares:
+            if codigo.isdigit():
+                _subir_ultimo(con, registro, anio, int(codigo))
+
+    with _LOCK:
+        _SEMBRADOS[clave] = version
+
+
+def en_uso(registro: str, anio: int, codigo: object) -> bool:
+    """True si el código ya está registrado para ese año."""
+    with sqlite_store.transaccion() as con:
+        _asegurar_tablas(con)
+        fila = con.execute(
+            "SELECT 1 FROM _codigos WHERE registro = ? AND anio = ? AND codigo = ?",
+            (registro, int(anio), normalizar_codigo(codigo)),
+        ).fetchone()
+    return fila is not None
+
+
+def proponer(registro: str, anio: int) -> str:
+    """Siguiente código libre del año (no lo reserva)."""
+    with sqlite_store.transaccion() as con:
+        _asegurar_tablas(con)
+        numero = _ultimo(con, registro, int(anio)) + 1
+        while con.execute(
+            "SELECT 1 FROM _codigos WHERE registro = ? AND anio = ? AND codigo = ?",
+            (registro, int(anio), str(numero)),
+        ).fetchone():
+            numero += 1
+    return str(numero)
+
+
+def reservar(codigos: Sequence[Tuple[str, int, object]]) -> None:
+    """
+    Reserva varios códigos [(registro, anio, codigo), ...] de forma atómica.
+    Si alguno ya estaba usado no se reserva ninguno y se lanza
+    CodigoDuplicadoError.
+    """
+    pedidos = [
+        (registro, int(anio), normalizar_codigo(codigo))
+        for registro, anio, codigo in codigos
+        if normalizar_codigo(codigo)
+    ]
+    duplicados: List[Tuple[str, int, str]] = []
+    with sqlite_store.transaccion() as con:
+        _asegurar_tablas(con)
+        # Punto de guardado: se puede deshacer aunque haya una transacción
+        # externa abierta (modo sqlite dentro de unidad_de_trabajo()).
+        con.execute("SAVEPOINT reservar_codigos")
+        for registro, anio, codigo in pedidos:
+            cur = con.execute(
+                "INSERT OR IGNORE INTO _codigos (registro, anio, codigo) "
+                "VALUES (?, ?, ?)",
+                (registro, anio, codigo),
+            )
+            if cur.rowcount == 0:
+                duplicados.append((registro, anio, codigo))
+            elif codigo.isdigit():
+                _subir_ultimo(con, registro, anio, int(codigo))
+        if duplicados:
+            con.execute("ROLLBACK TO reservar_codigos")
+        con.execute("RELEASE reservar_codigos")
+
+    if duplicados:
+        raise CodigoDuplicadoError(duplicados)
+
+
+def liberar(codigos: Sequence[Tuple[str, int, object]]) -> None:
+    """Devuelve códigos reservados (ej. si el guardado falló después)."""
+    with sqlite_store.transaccion() as con:
+        _asegurar_tablas(con)
+        con.executemany(
+            "DELETE FROM _codigos WHERE registro = ? AND anio = ? AND codigo = ?",
+            [
+                (registro, int(anio), normalizar_codigo(codigo))
+                for registro, anio, codigo in codigos
+            ],
+        )
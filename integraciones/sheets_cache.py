@@ -0,0 +1,413 @@
+# integraciones/sheets_cache.py
+"""
+Caché de lectura compartida (todas las sesiones del proceso) para los
+DataFrames de Google Sheets.
+
+- Cada DataFrame se guarda por hoja: (spreadsheet_id, nombre_hoja).
+- Se sirve desde memoria durante SHEETS_CACHE_TTL segundos (secrets/env).
+- Las escrituras hechas por este proceso parchan la copia en memoria
+  (append / actualización por clave) en vez de forzar una relectura.
+- refrescar() / invalidar() permiten forzar la relectura desde la UI.
+- Índices hash por columna (DNI, N° DE EVALUACIÓN, ...): se construyen
+  una sola vez por copia cargada, la primera vez que se consultan, y se
+  mantienen al día con los appends y actualizaciones (ver buscar()).
+- Versión tipada (categorías, fechas; ver integraciones.tipado): se
+  calcula una vez por copia cargada (ver leer_tipado()).
+"""
+
+from __future__ import annotations
+
+import contextlib
+import threading
+import time
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Sequence
+
+import pandas as pd
+
+from integraciones.config import leer_config_float
+from integraciones.gsheets import normalizar_clave
+
+TTL_POR_DEFECTO = 300.0  # 5 minutos
+
+
+class _Entrada:
+    __slots__ = ("df", "cargado_en", "indices", "tipados", "version")
+
+    def __init__(self, df: pd.DataFrame, cargado_en: float):
+        self.df = df
+        self.cargado_en = cargado_en
+        # Sube con cada parche de la copia (append, actualización, borrado)
+        self.version = 0
+        # columna -> {clave normalizada: [posiciones en df]}
+        self.indices: Dict[str, Dict[str, List[int]]] = {}
+        # nombre de esquema -> DataFrame tipado (ver leer_tipado)
+        self.tipados: Dict[str, pd.DataFrame] = {}
+
+    def parchada(self) -> None:
+        """Marca la copia como cambiada: descarta las versiones tipadas."""
+        self.version += 1
+        self.tipados.clear()
+
+    def indice(self, col: str) -> Dict[str, List[int]]:
+        """Índice de 'col' (se construye la primera vez que se pide)."""
+        idx = self.indices.get(col)
+        if idx is None:
+            idx = {}
+            if col in self.df.columns:
+                for pos, valor in enumerate(self.df[col].tolist()):
+                    idx.setdefault(normalizar_clave(valor), []).append(pos)
+            self.indices[col] = idx
+        return idx
+
+    def indexar_filas(self, desde: int) -> None:
+        """Agrega a los índices ya construidos las filas desde 'desde'."""
+        for col, idx in self.indices.items():
+            valores = self.df[col].tolist()[desde:]
+            for pos, valor in enumerate(valores, start=desde):
+                idx.setdefault(normalizar_clave(valor), []).append(pos)
+
+    def reindexar_celda(self, col: str, pos: int, anterior: object, nuevo: object) -> None:
+        idx = self.indices.get(col)
+        if idx is None:
+            return
+        viejo = normalizar_clave(anterior)
+        posiciones = idx.get(viejo, [])
+        if pos in posiciones:
+            posiciones.remove(pos)
+            if not posiciones:
+                idx.pop(viejo, None)
+        idx.setdefault(normalizar_clave(nuevo), []).append(pos)
+
+
+_LOCK = threading.Lock()
+_ENTRADAS: Dict[Hashable, _Entrada] = {}
+# Un lock por hoja para que varias sesiones no descarguen lo mismo a la vez
+_LOCKS_CARGA: Dict[Hashable, threading.Lock] = {}
+# Se incrementa en cada escritura/invalidación: una carga que empezó antes
+# de una escritura no debe quedar como vigente.
+_GENERACION: Dict[Hashable, int] = {}
+
+
+# SHEETS_CACHE_TTL se lee en el primer uso (se consulta en cada lectura)
+_TTL: Optional[float] = None
+
+
+def ttl_segundos() -> float:
+    global _TTL
+    if _TTL is None:
+        _TTL = leer_config_float("SHEETS_CACHE_TTL", TTL_POR_DEFECTO)
+    return _TTL
+
+
+def _lock_carga(clave: Hashable) -> threading.Lock:
+    with _LOCK:
+        return _LOCKS_CARGA.setdefault(clave, threading.Lock())
+
+
+def _vigente(entrada: Optional[_Entrada]) -> bool:
+    return entrada is not None and (
+        time.monotonic() - entrada.cargado_en < ttl_segundos()
+    )
+
+
+def _entrada_vigente(
+    clave: Hashable, cargador: Callable[[], pd.DataFrame]
+) -> _Entrada:
+    """
+    Devuelve la entrada vigente de la hoja, cargándola con 'cargador()'
+    si hace falta (una sola carga a la vez por hoja).
+    """
+    with _LOCK:
+        entrada = _ENTRADAS.get(clave)
+        if _vigente(entrada):
+            return entrada
+
+    with _lock_carga(clave):
+        # Otra sesión pudo haberlo cargado mientras esperábamos
+        with _LOCK:
+            entrada = _ENTRADAS.get(clave)
+            if _vigente(entrada):
+                return entrada
+            generacion = _GENERACION.get(clave, 0)
+
+        nueva = _Entrada(cargador(), time.monotonic())
+
+        with _LOCK:
+            if _GENERACION.get(clave, 0) == generacion:
+                _ENTRADAS[clave] = nueva
+        return nueva
+
+
+def leer_cacheado(
+    clave: Hashable, cargador: Callable[[], pd.DataFrame]
+) -> pd.DataFrame:
+    """
+    Read-through: devuelve una COPIA del DataFrame en memoria si sigue
+    vigente; si no, lo carga con 'cargador()' y lo guarda.
+    """
+    entrada = _entrada_vigente(clave, cargador)
+    with _LOCK:
+        return entrada.df.copy()
+
+
+def asegurar_vigente(clave: Hashable, cargador: Callable[[], pd.DataFrame]) -> None:
+    """Carga la hoja con 'cargador()' si la copia venció (sin copiar el DataFrame)."""
+    _entrada_vigente(clave, cargador)
+
+
+def leer_varios_cacheado(
+    claves: Sequence[Hashable],
+    cargador: Callable[[List[Hashable]], Dict[Hashable, pd.DataFrame]],
+) -> Dict[Hashable, pd.DataFrame]:
+    """
+    Read-through de varias hojas: las vigentes salen de memoria y las
+    demás se cargan JUNTAS con 'cargador(claves_faltantes)' (ej. una sola
+    llamada batchGet). Devuelve {clave: copia del DataFrame}.
+    """
+    salida: Dict[Hashable, pd.DataFrame] = {}
+    with _LOCK:
+        for clave in claves:
+            entrada = _ENTRADAS.get(clave)
+            if _vigente(entrada):
+                salida[clave] = entrada.df.copy()
+    faltantes = sorted((c for c in claves if c not in salida), key=repr)
+    if not faltantes:
+        return salida
+
+    with contextlib.ExitStack() as pila:
+        # Orden fijo al tomar los locks: sin bloqueos cruzados entre sesiones
+        for clave in faltantes:
+            pila.enter_context(_lock_carga(clave))
+
+        generaciones = {}
+        with _LOCK:
+            for clave in list(faltantes):
+                entrada = _ENTRADAS.get(clave)
+                if _vigente(entrada):
+                    salida[clave] = entrada.df.copy()
+                    faltantes.remove(clave)
+                else:
+                    generaciones[clave] = _GENERACION.get(clave, 0)
+        if not faltantes:
+            return salida
+
+        cargados = cargador(list(faltantes))
+        ahora = time.monotonic()
+        with _LOCK:
+            for clave in faltantes:
+                nueva = _Entrada(cargados[clave], ahora)
+                if _GENERACION.get(clave, 0) == generaciones[clave]:
+                    _ENTRADAS[clave] = nueva
+                salida[clave] = nueva.df.copy()
+    return salida
+
+
+def leer_tipado(
+    clave: Hashable,
+    cargador: Callable[[], pd.DataFrame],
+    esquema: str,
+    tipar: Callable[[pd.DataFrame], pd.DataFrame],
+) -> pd.DataFrame:
+    """
+    Versión tipada (categorías, fechas) de la hoja: 'tipar(df)' se aplica
+    una sola vez por copia cargada y se descarta cuando la copia cambia
+    (append, actualización por clave o relectura). Devuelve una copia.
+    """
+    entrada = _entrada_vigente(clave, cargador)
+    with _LOCK:
+        tipado = entrada.tipados.get(esquema)
+        if tipado is None:
+            # Se tipa una foto de la copia: los parches la modifican en sitio
+            df = entrada.df.copy()
+            version = entrada.version
+    if tipado is None:
+        tipado = tipar(df)
+        with _LOCK:
+            # Solo se guarda si nadie parchó la copia mientras se tipaba
+            if entrada.version == version:
+                entrada.tipados[esquema] = tipado
+    return tipado.copy()
+
+
+def proyectar_vigente(
+    clave: Hashable, columnas: Sequence[str]
+) -> Optional[pd.DataFrame]:
+    """
+    Copia de solo 'columnas' si la hoja está vigente en memoria; None si
+    no lo está (no dispara ninguna carga).
+    """
+    with _LOCK:
+        entrada = _ENTRADAS.get(clave)
+        if not _vigente(entrada):
+            return None
+        return entrada.df.reindex(columns=list(columnas), fill_value="").copy()
+
+
+def filas_vigentes(
+    clave: Hashable, posiciones: Sequence[int]
+) -> Optional[pd.DataFrame]:
+    """
+    Copia de las filas en 'posiciones' (en ese orden) si la hoja está
+    vigente en memoria; None si no lo está (no dispara ninguna carga).
+    """
+    with _LOCK:
+        entrada = _ENTRADAS.get(clave)
+        if not _vigente(entrada):
+            return None
+        validas = [p for p in posiciones if 0 <= p < len(entrada.df)]
+        return entrada.df.iloc[validas].copy()
+
+
+def buscar(
+    clave: Hashable,
+    cargador: Callable[[], pd.DataFrame],
+    col: str,
+    valores: Iterable[object],
+) -> pd.DataFrame:
+    """
+    Filas cuya columna 'col' coincide (sin espacios a los extremos) con
+    alguno de 'valores', usando el índice hash de la columna: O(1) por
+    valor en vez de recorrer y convertir la columna completa.
+    Devuelve una copia, en el orden de la hoja.
+    """
+    entrada = _entrada_vigente(clave, cargador)
+    with _LOCK:
+        idx = entrada.indice(col)
+        posiciones = set()
+        for valor in valores:
+            k = normalizar_clave(valor)
+            if k:
+                posiciones.update(idx.get(k, ()))
+        return entrada.df.iloc[sorted(posiciones)].copy()
+
+
+def existe(
+    clave: Hashable,
+    cargador: Callable[[], pd.DataFrame],
+    col: str,
+    valor: object,
+) -> bool:
+    """True si algún registro tiene 'valor' en 'col' (consulta al índice)."""
+    k = normalizar_clave(valor)
+    if not k:
+        return False
+    entrada = _entrada_vigente(clave, cargador)
+    with _LOCK:
+        return k in entrada.indice(col)
+
+
+def agregar_filas(
+    clave: Hashable, columnas: Sequence[str], filas: List[List[str]]
+) -> None:
+    """
+    Write-through de un append: agrega las filas (ya escritas en la hoja)
+    a la copia en memoria.
+    """
+    if not filas:
+        return
+    with _LOCK:
+        _GENERACION[clave] = _GENERACION.get(clave, 0) + 1
+        entrada = _ENTRADAS.get(clave)
+        if entrada is None:
+            return
+        desde = len(entrada.df)
+        nuevas = pd.DataFrame(filas, columns=list(columnas))
+        entrada.df = pd.concat([entrada.df, nuevas], ignore_index=True)
+        entrada.indexar_filas(desde)
+        entrada.parchada()
+
+
+def actualizar_filas(
+    clave: Hashable,
+    col_clave: str,
+    cambios_por_clave: Dict[str, Dict[str, object]],
+) -> None:
+    """
+    Write-through de una actualización por clave de negocio:
+    {clave: {columna: nuevo_valor}}.
+    """
+    with _LOCK:
+        _GENERACION[clave] = _GENERACION.get(clave, 0) + 1
+        entrada = _ENTRADAS.get(clave)
+        if entrada is None or entrada.df.empty:
+            return
+
+        df = entrada.df
+        entrada.parchada()
+        # Las filas se ubican con el índice de la columna clave (sin máscaras)
+        idx_clave = entrada.indice(col_clave)
+        for k, valores in cambios_por_clave.items():
+            posiciones = list(idx_clave.get(normalizar_clave(k), ()))
+            if not posiciones:
+                continue
+            for col, val in valores.items():
+                if col not in df.columns:
+                    continue
+                nuevo = "" if val is None else str(val)
+                j = df.columns.get_loc(col)
+                for pos in posiciones:
+                    entrada.reindexar_celda(col, pos, df.iat[pos, j], nuevo)
+                    df.iat[pos, j] = nuevo
+
+
+def actualizar_posiciones(
+    clave: Hashable, cambios: Dict[int, Dict[str, object]]
+) -> None:
+    """
+    Write-through de una actualización por posición de fila:
+    {posición en df: {columna: nuevo_valor}} (fila física = posición + 2).
+    """
+    with _LOCK:
+        _GENERACION[clave] = _GENERACION.get(clave, 0) + 1
+        entrada = _ENTRADAS.get(clave)
+        if entrada is None or entrada.df.empty:
+            return
+
+        df = entrada.df
+        entrada.parchada()
+        for pos, valores in cambios.items():
+            if not 0 <= pos < len(df):
+                continue
+            for col, val in valores.items():
+                if col not in df.columns:
+                    continue
+                nuevo = "" if val is None else str(val)
+                j = df.columns.get_loc(col)
+                entrada.reindexar_celda(col, pos, df.iat[pos, j], nuevo)
+                df.iat[pos, j] = nuevo
+
+
+def quitar_posiciones(clave: Hashable, posiciones: Iterable[int]) -> None:
+    """
+    Write-through de un borrado de filas: quita esas posiciones de la
+    copia en memoria (las de abajo suben, igual que en la hoja).
+    """
+    with _LOCK:
+        _GENERACION[clave] = _GENERACION.get(clave, 0) + 1
+        entrada = _ENTRADAS.get(clave)
+        if entrada is None or entrada.df.empty:
+            return
+        quitar = {p for p in posiciones if 0 <= p < len(entrada.df)}
+        if not quitar:
+            return
+        quedan = [p for p in range(len(entrada.df)) if p not in quitar]
+        entrada.df = entrada.df.iloc[quedan].reset_index(drop=True)
+        # Las posiciones cambiaron: los índices se reconstruyen al consultarlos
+        entrada.indices.clear()
+        entrada.parchada()
+
+
+def reemplazar(clave: Hashable, df: pd.DataFrame) -> None:
+    """Write-through de una reescritura completa de la hoja."""
+    with _LOCK:
+        _GENERACION[clave] = _GENERACION.get(clave, 0) + 1
+        _ENTRADAS[clave] = _Entrada(df.copy(), time.monotonic())
+
+
+def invalidar(clave: Optional[Hashable] = None) -> None:
+    """Descarta una hoja (o todas si clave es None) para forzar relectura."""
+    with _LOCK:
+        claves = list(_ENTRADAS) if clave is None else [clave]
+        for k in claves:
+            _ENTRADAS.pop(k, None)
+            _GENERACION[k] = _GENERACION.get(k, 0) + 1
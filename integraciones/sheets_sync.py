@@ -0,0 +1,228 @@
+# integraciones/sheets_sync.py
+"""
+Sincronización por revisión de hojas de Google Sheets.
+
+En vez de bajar la hoja completa (get_all_values) cada vez que vence la
+caché, se guarda por hoja la última copia conocida y la revisión del libro
+con que se leyó:
+
+1. Sonda de revisión: modifiedTime del archivo en Drive (una llamada sin
+   datos de la grilla). Si no cambió → 0 filas transferidas.
+2. Si cambió (o no se pudo leer), la hoja se baja completa. Con
+   sincronizar_varias() todas las hojas pedidas van en UNA llamada
+   values.batchGet.
+
+No hay delta por filas: la API de Sheets no ofrece una huella por fila
+ni un registro de cambios, y una edición a mano puede tocar cualquier
+celda; lo único que se puede saber sin bajar la grilla es si el libro
+cambió. estadisticas() expone cuántas filas y celdas se transfirieron en
+cada sincronización.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import threading
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+import gspread
+import pandas as pd
+from gspread.utils import absolute_range_name
+
+from integraciones.gsheets import (
+    columnas_a_filas,
+    es_error_hoja_inexistente,
+    invalidar_worksheet,
+    leer_por_columnas,
+    obtener_libro,
+    obtener_worksheet,
+    revision_libro,
+    valores_a_df,
+)
+
+class _EstadoHoja:
+    __slots__ = ("revision", "valores")
+
+    def __init__(self, revision, valores):
+        self.revision: Optional[str] = revision
+        # Matriz de la hoja (fila 0 = encabezado)
+        self.valores: List[List[str]] = valores
+
+
+_LOCK = threading.Lock()
+_ESTADOS: Dict[Hashable, _EstadoHoja] = {}
+_LOCKS_HOJA: Dict[Hashable, threading.Lock] = {}
+_ESTADISTICAS: Dict[Hashable, Dict[str, object]] = {}
+
+# (nombre_hoja, columnas)
+PedidoSync = Tuple[str, Sequence[str]]
+
+
+def _lock_hoja(clave: Hashable) -> threading.Lock:
+    with _LOCK:
+        return _LOCKS_HOJA.setdefault(clave, threading.Lock())
+
+
+# ---------------------------------------------------------------------------
+# ESTADÍSTICAS
+# ---------------------------------------------------------------------------
+
+
+def _registrar(clave: Hashable, tipo: str, filas: int, celdas: int, **extra) -> None:
+    with _LOCK:
+        est = _ESTADISTICAS.setdefault(
+            clave,
+            {
+                "syncs": 0,
+                "sin_cambios": 0,
+                "completas": 0,
+                "filas_transferidas": 0,
+                "celdas_transferidas": 0,
+                "ultima": {},
+            },
+        )
+        est["syncs"] += 1
+        est[tipo] += 1
+        est["filas_transferidas"] += filas
+        est["celdas_transferidas"] += celdas
+        est["ultima"] = {
+            "tipo": tipo,
+            "filas_transferidas": filas,
+            "celdas_transferidas": celdas,
+            **extra,
+        }
+
+
+def estadisticas(clave: Optional[Hashable] = None) -> Dict:
+    """
+    Contadores acumulados por hoja (syncs, sin_cambios, completas,
+    filas/celdas transferidas) y el detalle de la última sincronización.
+    """
+    with _LOCK:
+        if clave is not None:
+            est = _ESTADISTICAS.get(clave, {})
+            return {**est, "ultima": dict(est.get("ultima", {}))} if est else {}
+        return {
+            k: {**v, "ultima": dict(v["ultima"])} for k, v in _ESTADISTICAS.items()
+        }
+
+
+def revision_conocida(clave: Hashable) -> Optional[str]:
+    """Revisión del libro con que se leyó la copia local (None si no hay)."""
+    with _LOCK:
+        estado = _ESTADOS.get(clave)
+    return estado.revision if estado is not None else None
+
+
+def olvidar(clave: Optional[Hashable] = None) -> None:
+    """
+    Descarta la copia local (una hoja o todas): la próxima sincronización
+    será completa. Se usa tras reescribir la hoja entera desde la app.
+    """
+    with _LOCK:
+        if clave is None:
+            _ESTADOS.clear()
+        else:
+            _ESTADOS.pop(clave, None)
+
+
+# ---------------------------------------------------------------------------
+# SINCRONIZACIÓN
+# ---------------------------------------------------------------------------
+
+
+def _sincronizar_lote(
+    client: gspread.Client,
+    spreadsheet_id: str,
+    sh: gspread.Spreadsheet,
+    hojas: Sequence[PedidoSync],
+    revision: Optional[str],
+    crear: bool,
+) -> Dict[str, _EstadoHoja]:
+    """
+    Reutiliza la copia de las hojas si la revisión no cambió; las demás se
+    bajan completas con UNA llamada values.batchGet.
+    """
+    resultado: Dict[str, _EstadoHoja] = {}
+    completas: List[Tuple[str, gspread.Worksheet]] = []
+
+    for nombre, columnas in hojas:
+        clave = (spreadsheet_id, nombre)
+        ws = obtener_worksheet(client, spreadsheet_id, nombre, columnas, crear)
+        with _LOCK:
+            estado = _ESTADOS.get(clave)
+        if estado is not None and revision is not None and revision == estado.revision:
+            _registrar(clave, "sin_cambios", 0, 0)
+            resultado[nombre] = estado
+        else:
+            completas.append((nombre, ws))
+
+    bloques = leer_por_columnas(sh, [absolute_range_name(ws.title) for _, ws in completas])
+    for (nombre, _), columnas_leidas in zip(completas, bloques):
+        valores = columnas_a_filas(columnas_leidas, len(columnas_leidas))
+        _registrar(
+            (spreadsheet_id, nombre),
+            "completas",
+            max(len(valores) - 1, 0),
+            sum(len(f) for f in valores),
+        )
+        resultado[nombre] = _EstadoHoja(revision, valores)
+    return resultado
+
+
+def sincronizar_varias(
+    client: gspread.Client,
+    spreadsheet_id: str,
+    hojas: Sequence[PedidoSync],
+    crear: bool = True,
+) -> Dict[str, pd.DataFrame]:
+    """
+    Sincroniza varias hojas del mismo libro a la vez: una sola sonda de
+    revisión (el modifiedTime es del archivo) y, si cambió, una sola
+    llamada values.batchGet para todas. Devuelve {nombre_hoja: DataFrame}.
+
+    hojas: [(nombre_hoja, columnas), ...]
+    """
+    sh = obtener_libro(client, spreadsheet_id)
+    claves = sorted({(spreadsheet_id, h[0]) for h in hojas})
+
+    with contextlib.ExitStack() as pila:
+        # Orden fijo al tomar los locks: sin bloqueos cruzados entre sesiones
+        for clave in claves:
+            pila.enter_context(_lock_hoja(clave))
+
+        # La revisión se lee ANTES de los datos: un cambio concurrente
+        # se detecta en la próxima sincronización.
+        revision = revision_libro(sh)
+        try:
+            estados = _sincronizar_lote(client, spreadsheet_id, sh, hojas, revision, crear)
+        except gspread.exceptions.APIError as e:
+            # Alguna hoja fue renombrada o eliminada: se resuelven de nuevo
+            if not es_error_hoja_inexistente(e):
+                raise
+            for nombre, _ in hojas:
+                invalidar_worksheet(spreadsheet_id, nombre)
+            estados = _sincronizar_lote(client, spreadsheet_id, sh, hojas, revision, crear)
+
+        with _LOCK:
+            for nombre, estado in estados.items():
+                _ESTADOS[(spreadsheet_id, nombre)] = estado
+        return {
+            nombre: valores_a_df(estados[nombre].valores, columnas)
+            for nombre, columnas in hojas
+        }
+
+
+def sincronizar(
+    client: gspread.Client,
+    spreadsheet_id: str,
+    sheet_name: str,
+    columnas: Sequence[str],
+    crear: bool = True,
+) -> pd.DataFrame:
+    """
+    Devuelve la hoja como DataFrame de texto (igual que una descarga
+    completa); si la revisión del libro no cambió desde la última vez, sin
+    llamar a la API de valores.
+    """
+    return sincronizar_varias(client, spreadsheet_id, [(sheet_name, columnas)], crear)[sheet_name]
@@ -0,0 +1,851 @@
+# integraciones/sqlite_store.py
+"""
+Modo de almacenamiento local (opcional): SQLite como sistema de registro
+y Google Sheets como vista replicada.
+
+Se activa con ALMACENAMIENTO_REGISTROS = "sqlite" (st.secrets o env).
+Ruta de la base: SQLITE_REGISTROS_PATH (por defecto data/registros.db).
+
+- Cada hoja (spreadsheet_id, nombre_hoja) es una tabla con las mismas
+  columnas que la hoja (todas TEXT) + _fila (orden de inserción).
+- Cada escritura se guarda en la tabla y, en la MISMA transacción, en la
+  cola _replicacion.
+- Un hilo replicador (uno por proceso) vacía la cola hacia Google Sheets,
+  agrupando las operaciones en unidades de trabajo.
+- Los appends se marcan como "enviados" antes de confirmarlos: si el
+  proceso muere antes de sacarlos de la cola, al reintentar se omiten las
+  filas que ya están en la hoja (no se duplican).
+- Una operación que falla por algo que no es transitorio (cuota, 5xx, red)
+  se reintenta sola hasta REPLICACION_MAX_INTENTOS veces y luego se aparta
+  en _replicacion_fallidas, para no bloquear el resto de la cola
+  (ver reencolar_fallidas()).
+- La primera vez que se usa una hoja se importa su contenido actual
+  desde Google Sheets (bootstrap).
+"""
+
+from __future__ import annotations
+
+import contextlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import gspread
+import pandas as pd
+import requests
+from gspread.utils import absolute_range_name
+
+from integraciones.config import leer_config, leer_config_float
+from integraciones.gsheets import (
+    Numerador,
+    con_worksheet,
+    fila_a_valores,
+    letra_columna,
+    normalizar_clave,
+)
+from integraciones.limitador import PRIORIDAD_FONDO, prioridad
+
+RUTA_POR_DEFECTO = os.path.join("data", "registros.db")
+
+_LOCAL = threading.local()
+_LOCK_TABLAS = threading.Lock()
+_TABLAS_LISTAS: set = set()
+_INDICES_LISTOS: set = set()
+
+
+def modo_sqlite() -> bool:
+    """True si los registros deben leerse/escribirse en SQLite."""
+    return str(leer_config("ALMACENAMIENTO_REGISTROS", "sheets")).lower() == "sqlite"
+
+
+def ruta_db() -> str:
+    return str(leer_config("SQLITE_REGISTROS_PATH", RUTA_POR_DEFECTO))
+
+
+# ---------------------------------------------------------------------------
+# CONEXIÓN
+# ---------------------------------------------------------------------------
+
+
+def _conexion() -> sqlite3.Connection:
+    """Una conexión por hilo (las sesiones de Streamlit corren en hilos)."""
+    con = getattr(_LOCAL, "con", None)
+    if con is None:
+        ruta = ruta_db()
+        carpeta = os.path.dirname(ruta)
+        if carpeta:
+            os.makedirs(carpeta, exist_ok=True)
+        con = sqlite3.connect(ruta, timeout=30, isolation_level=None)
+        con.execute("PRAGMA journal_mode=WAL")
+        con.execute("PRAGMA synchronous=NORMAL")
+        con.execute(
+            "CREATE TABLE IF NOT EXISTS _replicacion ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " libro TEXT NOT NULL, hoja TEXT NOT NULL,"
+            " tipo TEXT NOT NULL, payload TEXT NOT NULL,"
+            " creado REAL NOT NULL)"
+        )
+        for columna in ("intentos INTEGER NOT NULL DEFAULT 0", "enviado INTEGER NOT NULL DEFAULT 0", "error TEXT"):
+            try:
+                # Colas creadas antes del control de reintentos
+                con.execute(f"ALTER TABLE _replicacion ADD COLUMN {columna}")
+            except sqlite3.OperationalError:
+                pass
+        con.execute(
+            "CREATE TABLE IF NOT EXISTS _replicacion_fallidas ("
+            " id INTEGER PRIMARY KEY, libro TEXT NOT NULL, hoja TEXT NOT NULL,"
+            " tipo TEXT NOT NULL, payload TEXT NOT NULL, creado REAL NOT NULL,"
+            " intentos INTEGER NOT NULL, error TEXT, apartado REAL NOT NULL)"
+        )
+        con.execute(
+            "CREATE TABLE IF NOT EXISTS _hojas ("
+            " libro TEXT NOT NULL, hoja TEXT NOT NULL, tabla TEXT NOT NULL,"
+            " importado REAL, PRIMARY KEY (libro, hoja))"
+        )
+        _LOCAL.con = con
+        _LOCAL.en_transaccion = False
+    return con
+
+
+@contextlib.contextmanager
+def transaccion() -> Iterator[sqlite3.Connection]:
+    """
+    Transacción de escritura (BEGIN IMMEDIATE). Si ya hay una abierta en
+    este hilo, se reutiliza: así unidad_de_trabajo() agrupa varias escrituras.
+    """
+    con = _conexion()
+    if _LOCAL.en_transaccion:
+        yield con
+        return
+
+    con.execute("BEGIN IMMEDIATE")
+    _LOCAL.en_transaccion = True
+    try:
+        yield con
+    except BaseException:
+        con.execute("ROLLBACK")
+        raise
+    else:
+        con.execute("COMMIT")
+    finally:
+        _LOCAL.en_transaccion = False
+
+
+def _q(nombre: str) -> str:
+    """Identificador SQL entre comillas (las columnas tienen espacios y °)."""
+    return '"' + nombre.replace('"', '""') + '"'
+
+
+def _nombre_tabla(libro: str, hoja: str) -> str:
+    return f"{libro[:8]}__{hoja}"
+
+
+# ---------------------------------------------------------------------------
+# TABLAS + BOOTSTRAP
+# ---------------------------------------------------------------------------
+
+
+def asegurar_tabla(
+    libro: str,
+    hoja: str,
+    columnas: Sequence[str],
+    descargar: Callable[[], pd.DataFrame],
+) -> str:
+    """
+    Crea la tabla de la hoja si no existe e importa (una sola vez) lo que
+    hoy tiene Google Sheets usando 'descargar()'. Devuelve el nombre de tabla.
+    """
+    clave = (libro, hoja)
+    tabla = _nombre_tabla(libro, hoja)
+    if clave in _TABLAS_LISTAS:
+        return tabla
+
+    with _LOCK_TABLAS:
+        if clave in _TABLAS_LISTAS:
+            return tabla
+
+        con = _conexion()
+        cols_sql = ", ".join(f"{_q(c)} TEXT NOT NULL DEFAULT ''" for c in columnas)
+        con.execute(
+            f"CREATE TABLE IF NOT EXISTS {_q(tabla)} ("
+            f" _fila INTEGER PRIMARY KEY AUTOINCREMENT, {cols_sql})"
+        )
+        fila = con.execute(
+            "SELECT importado FROM _hojas WHERE libro = ? AND hoja = ?", clave
+        ).fetchone()
+        if fila is None or fila[0] is None:
+            importar_desde_sheets(libro, hoja, columnas, descargar)
+
+        _TABLAS_LISTAS.add(clave)
+        return tabla
+
+
+def importar_desde_sheets(
+    libro: str,
+    hoja: str,
+    columnas: Sequence[str],
+    descargar: Callable[[], pd.DataFrame],
+) -> int:
+    """
+    Bootstrap: reemplaza el contenido local de la hoja por lo que hoy tiene
+    Google Sheets. Se niega si hay cambios locales pendientes de replicar.
+    Devuelve la cantidad de filas importadas.
+    """
+    if pendientes_replicacion(libro, hoja):
+        raise RuntimeError(
+            f"{hoja}: hay cambios locales sin replicar; no se puede reimportar."
+        )
+
+    df = descargar()
+    tabla = _nombre_tabla(libro, hoja)
+    with transaccion() as con:
+        con.execute(f"DELETE FROM {_q(tabla)}")
+        _insertar(con, tabla, columnas, df[list(columnas)].astype(str).values.tolist())
+        con.execute(
+            "INSERT OR REPLACE INTO _hojas (libro, hoja, tabla, importado)"
+            " VALUES (?, ?, ?, ?)",
+            (libro, hoja, tabla, time.time()),
+        )
+    return len(df)
+
+
+def _insertar(
+    con: sqlite3.Connection,
+    tabla: str,
+    columnas: Sequence[str],
+    filas: List[List[str]],
+) -> None:
+    if not filas:
+        return
+    cols = ", ".join(_q(c) for c in columnas)
+    marcas = ", ".join("?" for _ in columnas)
+    con.executemany(f"INSERT INTO {_q(tabla)} ({cols}) VALUES ({marcas})", filas)
+
+
+def _encolar(
+    con: sqlite3.Connection, libro: str, hoja: str, tipo: str, payload: dict
+) -> None:
+    con.execute(
+        "INSERT INTO _replicacion (libro, hoja, tipo, payload, creado)"
+        " VALUES (?, ?, ?, ?, ?)",
+        (libro, hoja, tipo, json.dumps(payload, ensure_ascii=False), time.time()),
+    )
+
+
+# ---------------------------------------------------------------------------
+# OPERACIONES (misma semántica que las de Google Sheets)
+# ---------------------------------------------------------------------------
+
+
+def leer_df(tabla: str, columnas: Sequence[str]) -> pd.DataFrame:
+    cols = ", ".join(_q(c) for c in columnas)
+    filas = _conexion().execute(
+        f"SELECT {cols} FROM {_q(tabla)} ORDER BY _fila"
+    ).fetchall()
+    return pd.DataFrame([list(f) for f in filas], columns=list(columnas))
+
+
+def _asegurar_indice(tabla: str, col: str) -> None:
+    """Índice sobre TRIM(col) (así la búsqueda por clave no recorre la tabla)."""
+    if (tabla, col) in _INDICES_LISTOS:
+        return
+    with _LOCK_TABLAS:
+        _conexion().execute(
+            f"CREATE INDEX IF NOT EXISTS {_q(f'ix_{tabla}__{col}')} "
+            f"ON {_q(tabla)} (TRIM({_q(col)}))"
+        )
+        _INDICES_LISTOS.add((tabla, col))
+
+
+def buscar(
+    tabla: str, columnas: Sequence[str], col: str, valores: Sequence[object]
+) -> pd.DataFrame:
+    """
+    Filas cuya 'col' (sin espacios a los extremos) está en 'valores'.
+    El índice del resultado identifica la fila (_fila - 1).
+    """
+    claves = sorted({normalizar_clave(v) for v in valores} - {""})
+    if not claves:
+        return pd.DataFrame(columns=list(columnas))
+    _asegurar_indice(tabla, col)
+    cols = ", ".join(_q(c) for c in columnas)
+    marcas = ", ".join("?" for _ in claves)
+    filas = _conexion().execute(
+        f"SELECT _fila, {cols} FROM {_q(tabla)} "
+        f"WHERE TRIM({_q(col)}) IN ({marcas}) ORDER BY _fila",
+        claves,
+    ).fetchall()
+    # El índice del DataFrame identifica la fila (igual que en la caché)
+    return pd.DataFrame(
+        [list(f[1:]) for f in filas],
+        columns=list(columnas),
+        index=[f[0] - 1 for f in filas],
+    )
+
+
+def append_filas(
+    libro: str,
+    hoja: str,
+    columnas: Sequence[str],
+    tabla: str,
+    filas: Sequence[Dict[str, object]],
+    auto_numero_col: str | None = None,
+    numerador: Numerador | None = None,
+) -> List[List[str]]:
+    """
+    Inserta filas (y las encola para Sheets). Devuelve lo escrito.
+    El correlativo lo asigna 'numerador' si se indica (si no, COUNT + 1).
+    """
+    if not filas:
+        return []
+
+    valores = [fila_a_valores(columnas, f) for f in filas]
+    with transaccion() as con:
+        if auto_numero_col and auto_numero_col in columnas:
+            idx = list(columnas).index(auto_numero_col)
+            if numerador is not None:
+                siguiente = numerador(len(valores))
+            else:
+                total = con.execute(f"SELECT COUNT(*) FROM {_q(tabla)}").fetchone()[0]
+                siguiente = total + 1
+            for i, fila_valores in enumerate(valores):
+                fila_valores[idx] = str(siguiente + i)
+        _insertar(con, tabla, columnas, valores)
+        _encolar(con, libro, hoja, "append", {"columnas": list(columnas), "filas": valores})
+    return valores
+
+
+def actualizar_por_clave(
+    libro: str,
+    hoja: str,
+    columnas: Sequence[str],
+    tabla: str,
+    col_clave: str,
+    cambios_por_clave: Dict[str, Dict[str, object]],
+) -> int:
+    """UPDATE por clave de negocio (y encola el mismo cambio para Sheets)."""
+    total = 0
+    with transaccion() as con:
+        for clave, valores in cambios_por_clave.items():
+            valores = {c: v for c, v in valores.items() if c in columnas}
+            if not valores:
+                continue
+            sets = ", ".join(f"{_q(c)} = ?" for c in valores)
+            params = ["" if v is None else str(v) for v in valores.values()]
+            cur = con.execute(
+                f"UPDATE {_q(tabla)} SET {sets} WHERE TRIM({_q(col_clave)}) = ?",
+                params + [normalizar_clave(clave)],
+            )
+            total += cur.rowcount
+        _encolar(
+            con,
+            libro,
+            hoja,
+            "actualizar",
+            {
+                "columnas": list(columnas),
+                "col_clave": col_clave,
+                "cambios": {
+                    str(k): {c: ("" if v is None else str(v)) for c, v in val.items()}
+                    for k, val in cambios_por_clave.items()
+                },
+            },
+        )
+    return total
+
+
+def reescribir(
+    libro: str,
+    hoja: str,
+    columnas: Sequence[str],
+    tabla: str,
+    df: pd.DataFrame,
+) -> None:
+    """Reemplaza toda la tabla (equivalente a clear + update en Sheets)."""
+    filas = df[list(columnas)].astype(str).values.tolist()
+    with transaccion() as con:
+        con.execute(f"DELETE FROM {_q(tabla)}")
+        _insertar(con, tabla, columnas, filas)
+        # Una reescritura deja obsoletas las operaciones anteriores en cola
+        con.execute(
+            "DELETE FROM _replicacion WHERE libro = ? AND hoja = ?", (libro, hoja)
+        )
+        _encolar(con, libro, hoja, "reescribir", {"columnas": list(columnas), "filas": filas})
+
+
+def _expr_orden(col: str, es_fecha: bool) -> str:
+    """Expresión de orden: las fechas dd/mm/aaaa se ordenan como aaaammdd."""
+    c = f"TRIM({_q(col)})"
+    if es_fecha:
+        return f"substr({c}, 7, 4) || substr({c}, 4, 2) || substr({c}, 1, 2)"
+    return f"UPPER({c})"
+
+
+def pagina(
+    tabla: str,
+    columnas: Sequence[str],
+    offset: int,
+    limite: int,
+    filtros: Dict[str, str] | None = None,
+    orden: str | None = None,
+    descendente: bool = False,
+    es_fecha: bool = False,
+) -> Tuple[pd.DataFrame, int]:
+    """
+    Una ventana de filas (LIMIT / OFFSET) y el total de filas que pasan
+    los filtros {columna: texto contenido, sin distinguir mayúsculas}.
+    Sin 'orden' se usa el orden de registro (_fila). El índice del
+    resultado es _fila (identifica la fila para actualizar_filas()).
+    """
+    condiciones, params = [], []
+    for col, texto in (filtros or {}).items():
+        condiciones.append(f"instr(UPPER({_q(col)}), ?) > 0")
+        params.append(texto.upper())
+    where = f" WHERE {' AND '.join(condiciones)}" if condiciones else ""
+    sentido = "DESC" if descendente else "ASC"
+    orden_sql = f"_fila {sentido}"
+    if orden:
+        orden_sql = f"{_expr_orden(orden, es_fecha)} {sentido}, {orden_sql}"
+
+    con = _conexion()
+    total = con.execute(f"SELECT COUNT(*) FROM {_q(tabla)}{where}", params).fetchone()[0]
+    cols = ", ".join(_q(c) for c in columnas)
+    filas = con.execute(
+        f"SELECT _fila, {cols} FROM {_q(tabla)}{where}"
+        f" ORDER BY {orden_sql} LIMIT ? OFFSET ?",
+        params + [int(limite), int(offset)],
+    ).fetchall()
+    df = pd.DataFrame(
+        [list(f[1:]) for f in filas],
+        columns=list(columnas),
+        index=[f[0] for f in filas],
+    )
+    return df, total
+
+
+def _fila_fisica(con: sqlite3.Connection, tabla: str, fila: int) -> int:
+    """Fila de la hoja que hoy corresponde a _fila (solo una pista al replicar)."""
+    posicion = con.execute(
+        f"SELECT COUNT(*) FROM {_q(tabla)} WHERE _fila <= ?", (fila,)
+    ).fetchone()[0]
+    return posicion + 1
+
+
+def actualizar_filas(
+    libro: str,
+    hoja: str,
+    columnas: Sequence[str],
+    tabla: str,
+    cambios: Dict[int, Dict[str, object]],
+    esperados: Dict[int, Sequence[str]],
+) -> Tuple[int, List[int]]:
+    """
+    UPDATE por _fila, solo de las filas que siguen como 'esperados' (los
+    valores leídos antes de editar, en el orden de 'columnas'). Las demás
+    las cambió otra sesión y se devuelven como conflictos.
+    Encola para Sheets la escritura de esas celdas junto con el contenido
+    previo de la fila (con él se ubica la fila en la hoja al replicar).
+    Devuelve (filas actualizadas, _filas en conflicto).
+    """
+    cols = ", ".join(_q(c) for c in columnas)
+    conflictos: List[int] = []
+    pendientes: List[Dict[str, object]] = []
+    with transaccion() as con:
+        for fila, valores in cambios.items():
+            actual = con.execute(
+                f"SELECT {cols} FROM {_q(tabla)} WHERE _fila = ?", (fila,)
+            ).fetchone()
+            esperado = [normalizar_clave(v) for v in esperados.get(fila, ())]
+            if actual is None or [normalizar_clave(v) for v in actual] != esperado:
+                conflictos.append(fila)
+                continue
+            valores = {
+                c: ("" if v is None else str(v)) for c, v in valores.items() if c in columnas
+            }
+            if not valores:
+                continue
+            sets = ", ".join(f"{_q(c)} = ?" for c in valores)
+            con.execute(
+                f"UPDATE {_q(tabla)} SET {sets} WHERE _fila = ?",
+                list(valores.values()) + [fila],
+            )
+            pendientes.append(
+                {
+                    "fila": _fila_fisica(con, tabla, fila),
+                    "antes": ["" if v is None else str(v) for v in actual],
+                    "valores": valores,
+                }
+            )
+        if pendientes:
+            _encolar(
+                con,
+                libro,
+                hoja,
+                "celdas",
+                {"columnas": list(columnas), "filas": pendientes},
+            )
+    return len(pendientes), conflictos
+
+
+def borrar_filas(
+    libro: str,
+    hoja: str,
+    columnas: Sequence[str],
+    tabla: str,
+    filas: Sequence[int],
+    esperados: Dict[int, Sequence[str]],
+) -> Tuple[int, List[int]]:
+    """
+    DELETE por _fila, solo de las filas que siguen como 'esperados' (igual
+    que actualizar_filas). Encola para Sheets el borrado de esas filas con
+    su contenido (para ubicarlas al replicar).
+    Devuelve (filas borradas, _filas en conflicto).
+    """
+    cols = ", ".join(_q(c) for c in columnas)
+    conflictos: List[int] = []
+    pendientes: List[Dict[str, object]] = []
+    with transaccion() as con:
+        borrar = []
+        for fila in filas:
+            actual = con.execute(
+                f"SELECT {cols} FROM {_q(tabla)} WHERE _fila = ?", (fila,)
+            ).fetchone()
+            esperado = [normalizar_clave(v) for v in esperados.get(fila, ())]
+            if actual is None or [normalizar_clave(v) for v in actual] != esperado:
+                conflictos.append(fila)
+                continue
+            borrar.append(fila)
+            pendientes.append(
+                {
+                    "fila": _fila_fisica(con, tabla, fila),
+                    "antes": ["" if v is None else str(v) for v in actual],
+                }
+            )
+        con.executemany(
+            f"DELETE FROM {_q(tabla)} WHERE _fila = ?", [(f,) for f in borrar]
+        )
+        if pendientes:
+            _encolar(con, libro, hoja, "borrar", {"columnas": list(columnas), "filas": pendientes})
+    return len(pendientes), conflictos
+
+
+def pendientes_replicacion(libro: str | None = None, hoja: str | None = None) -> int:
+    """Cantidad de operaciones locales que aún no llegan a Google Sheets."""
+    sql = "SELECT COUNT(*) FROM _replicacion"
+    params: Tuple = ()
+    if libro is not None and hoja is not None:
+        sql += " WHERE libro = ? AND hoja = ?"
+        params = (libro, hoja)
+    return _conexion().execute(sql, params).fetchone()[0]
+
+
+# ---------------------------------------------------------------------------
+# REPLICADOR → GOOGLE SHEETS
+# ---------------------------------------------------------------------------
+
+# spreadsheet_id -> función que devuelve el gspread.Client a usar
+_CLIENTES: Dict[str, Callable[[], gspread.Client]] = {}
+_LOCK_REPLICADOR = threading.Lock()
+_REPLICADOR: Optional[threading.Thread] = None
+_DESPERTAR = threading.Event()
+
+LOTE_REPLICACION = 200
+
+
+def registrar_libro(libro: str, cliente: Callable[[], gspread.Client]) -> None:
+    """Indica con qué cliente replicar un Spreadsheet y arranca el replicador."""
+    _CLIENTES[libro] = cliente
+    _iniciar_replicador()
+
+
+def _iniciar_replicador() -> None:
+    global _REPLICADOR
+    with _LOCK_REPLICADOR:
+        if _REPLICADOR is not None and _REPLICADOR.is_alive():
+            return
+        _REPLICADOR = threading.Thread(
+            target=_bucle_replicador, name="replicador-sheets", daemon=True
+        )
+        _REPLICADOR.start()
+
+
+def despertar_replicador() -> None:
+    """Pide al replicador que procese la cola ya (sin esperar el intervalo)."""
+    _DESPERTAR.set()
+
+
+def _bucle_replicador() -> None:
+    espera_error = 5.0
+    while True:
+        intervalo = leer_config_float("REPLICACION_INTERVALO", 10.0)
+        _DESPERTAR.wait(timeout=intervalo)
+        _DESPERTAR.clear()
+        try:
+            # Tráfico de fondo: cede la cuota a las llamadas de la UI
+            with prioridad(PRIORIDAD_FONDO):
+                while replicar_pendientes():
+                    pass
+            espera_error = 5.0
+        except Exception:
+            # Sheets caído o sin cuota: la cola queda intacta y se reintenta
+            time.sleep(espera_error)
+            espera_error = min(espera_error * 2, 300.0)
+
+
+def ubicar_filas(
+    valores: List[List[str]],
+    columnas: Sequence[str],
+    pedidos: Sequence[Tuple[int, Sequence[str]]],
+) -> List[Optional[int]]:
+    """
+    Fila física actual de cada pedido (fila_pista, contenido_previo),
+    buscando en 'valores' (get_all_values, con encabezado) la fila con
+    ese mismo contenido; si hay varias iguales, la más cercana a la pista.
+    None si la fila ya no está (alguien la cambió o borró en la hoja):
+    así nunca se pisa o borra una fila equivocada.
+    """
+    n = len(columnas)
+    por_contenido: Dict[Tuple[str, ...], List[int]] = {}
+    for i, fila in enumerate(valores[1:], start=2):
+        celdas = (list(fila) + [""] * n)[:n]
+        por_contenido.setdefault(tuple(normalizar_clave(v) for v in celdas), []).append(i)
+
+    salida: List[Optional[int]] = []
+    for pista, antes in pedidos:
+        candidatas = por_contenido.get(tuple(normalizar_clave(v) for v in antes), [])
+        if not candidatas:
+            salida.append(None)
+            continue
+        elegida = min(candidatas, key=lambda f: abs(f - pista))
+        candidatas.remove(elegida)
+        salida.append(elegida)
+    return salida
+
+
+def _es_transitorio(exc: BaseException) -> bool:
+    """Cuota, error del servidor o de red: no cuenta como intento fallido."""
+    if isinstance(exc, gspread.exceptions.APIError):
+        codigo = exc.response.status_code
+        return codigo == 429 or codigo >= 500
+    return isinstance(exc, (requests.exceptions.RequestException, OSError))
+
+
+def _registrar_fallo(con: sqlite3.Connection, ids: Sequence[int], exc: BaseException) -> int:
+    """
+    Suma un intento a las operaciones 'ids' y aparta las que llegaron a
+    REPLICACION_MAX_INTENTOS. Devuelve cuántas se apartaron.
+    """
+    maximo = int(leer_config_float("REPLICACION_MAX_INTENTOS", 5))
+    error = f"{type(exc).__name__}: {exc}"[:1000]
+    marcas = ",".join("?" * len(ids))
+    with transaccion():
+        con.execute(
+            f"UPDATE _replicacion SET intentos = intentos + 1, error = ? WHERE id IN ({marcas})",
+            (error, *ids),
+        )
+        con.execute(
+            "INSERT INTO _replicacion_fallidas"
+            " (id, libro, hoja, tipo, payload, creado, intentos, error, apartado)"
+            " SELECT id, libro, hoja, tipo, payload, creado, intentos, error, ?"
+            f" FROM _replicacion WHERE id IN ({marcas}) AND intentos >= ?",
+            (time.time(), *ids, maximo),
+        )
+        return con.execute(
+            f"DELETE FROM _replicacion WHERE id IN ({marcas}) AND intentos >= ?",
+            (*ids, maximo),
+        ).rowcount
+
+
+def _filas_ya_enviadas(
+    cliente: gspread.Client, libro: str, hoja: str, columnas: Sequence[str], filas: List[List[str]]
+) -> List[List[str]]:
+    """
+    Filas de un append "enviado" cuyo resultado no se llegó a registrar:
+    devuelve solo las que aún no están en la hoja (mismo contenido).
+    """
+    n = len(columnas)
+    en_hoja = Counter(
+        tuple(normalizar_clave(v) for v in (list(f) + [""] * n)[:n])
+        for f in con_worksheet(cliente, libro, hoja, columnas, lambda ws: ws.get_all_values())[1:]
+    )
+    faltan = []
+    for fila in filas:
+        clave = tuple(normalizar_clave(v) for v in fila)
+        if en_hoja[clave]:
+            en_hoja[clave] -= 1
+        else:
+            faltan.append(fila)
+    return faltan
+
+
+def _ubicar_con_pista(
+    sh: gspread.Spreadsheet,
+    ws: gspread.Worksheet,
+    columnas: Sequence[str],
+    pedidos: Sequence[Tuple[int, Sequence[str]]],
+) -> List[Optional[int]]:
+    """
+    Como ubicar_filas(), pero primero lee solo las filas de las pistas (un
+    values.batchGet); la hoja completa se lee solo si alguna ya no coincide.
+    """
+    n = len(columnas)
+    ultima = letra_columna(n)
+    rangos = [absolute_range_name(ws.title, f"A{p}:{ultima}{p}") for p, _ in pedidos]
+    resp = sh.values_batch_get(rangos) if rangos else {}
+    bloques = [list(r.get("values") or []) for r in resp.get("valueRanges", [])]
+    bloques += [[] for _ in range(len(pedidos) - len(bloques))]
+
+    salida: List[Optional[int]] = []
+    for (pista, antes), bloque in zip(pedidos, bloques):
+        actual = (list(bloque[0]) if bloque else []) + [""] * n
+        coincide = pista > 1 and [normalizar_clave(v) for v in actual[:n]] == [
+            normalizar_clave(v) for v in antes
+        ]
+        salida.append(pista if coincide else None)
+
+    if None in salida:
+        salida = ubicar_filas(ws.get_all_values(), columnas, pedidos)
+    return salida
+
+
+def replicar_pendientes() -> int:
+    """
+    Envía a Google Sheets un lote de operaciones pendientes (en orden).
+    Devuelve cuántas salieron de la cola (replicadas o apartadas; 0 si no
+    hay nada que replicar para los libros registrados).
+    """
+    # Import local: unidad_trabajo depende de la caché y de gsheets
+    from integraciones.gsheets import actualizar_celdas, borrar_filas, obtener_libro
+    from integraciones.unidad_trabajo import UnidadDeTrabajo
+
+    con = _conexion()
+    libros = list(_CLIENTES)
+    if not libros:
+        return 0
+    # Las operaciones de libros sin cliente registrado (otra página aún no
+    # abierta en este proceso) esperan sin frenar a las demás.
+    ops = con.execute(
+        "SELECT id, libro, hoja, tipo, payload, intentos, enviado FROM _replicacion"
+        f" WHERE libro IN ({','.join('?' * len(libros))})"
+        " ORDER BY id LIMIT ?",
+        (*libros, LOTE_REPLICACION),
+    ).fetchall()
+    if not ops:
+        return 0
+
+    libro = ops[0][1]
+    cliente = _CLIENTES[libro]
+    ids: List[int] = []
+    try:
+        if ops[0][3] == "reescribir":
+            op_id, _, hoja, _, payload, _, _ = ops[0]
+            ids.append(op_id)
+            datos = json.loads(payload)
+            valores = [datos["columnas"]] + datos["filas"]
+
+            def _reescribir(ws: gspread.Worksheet) -> None:
+                # Se escribe encima y luego se limpia lo que sobra al final (igual
+                # que gsheets.reescribir_versionado): la hoja nunca queda vacía
+                filas_antes = len(ws.get_all_values())
+                ws.update("A1", valores)
+                if filas_antes > len(valores):
+                    ws.batch_clear([f"{len(valores) + 1}:{filas_antes}"])
+
+            con_worksheet(cliente(), libro, hoja, datos["columnas"], _reescribir, escritura=True)
+            con.execute("DELETE FROM _replicacion WHERE id = ?", (op_id,))
+            return 1
+
+        if ops[0][3] in ("borrar", "celdas"):
+            op_id, _, hoja, tipo, payload, _, _ = ops[0]
+            ids.append(op_id)
+            datos = json.loads(payload)
+            columnas = datos["columnas"]
+
+            def _aplicar(ws: gspread.Worksheet) -> None:
+                # Repetirla es inocuo: las filas ya cambiadas o borradas no
+                # coinciden con 'antes' y se omiten
+                sh = obtener_libro(cliente(), libro)
+                pedidos = [(p["fila"], p["antes"]) for p in datos["filas"]]
+                fisicas = _ubicar_con_pista(sh, ws, columnas, pedidos)
+                if tipo == "borrar":
+                    borrar_filas(sh, ws, [f for f in fisicas if f is not None])
+                else:
+                    cambios = {
+                        f: p["valores"] for f, p in zip(fisicas, datos["filas"]) if f is not None
+                    }
+                    actualizar_celdas(ws, columnas, cambios)
+
+            con_worksheet(cliente(), libro, hoja, columnas, _aplicar, escritura=True)
+            con.execute("DELETE FROM _replicacion WHERE id = ?", (op_id,))
+            return 1
+
+        # Se toma el prefijo de operaciones de un mismo libro que se pueden
+        # agrupar en una unidad de trabajo (append / actualizar). Una
+        # operación que ya falló se envía sola, para aislar a la culpable.
+        uow = UnidadDeTrabajo(cliente(), libro)
+        hubo_actualizacion = False
+        for op_id, op_libro, hoja, tipo, payload, intentos, enviado in ops:
+            if op_libro != libro or tipo in ("reescribir", "celdas", "borrar"):
+                break
+            if ids and (intentos or ops[0][5]):
+                break
+            # La unidad aplica sus actualizaciones también a las filas nuevas;
+            # un append posterior a una actualización va en el siguiente lote.
+            if tipo == "append" and hubo_actualizacion:
+                break
+            datos = json.loads(payload)
+            columnas = datos["columnas"]
+            if tipo == "append":
+                filas = datos["filas"]
+                if enviado:
+                    filas = _filas_ya_enviadas(cliente(), libro, hoja, columnas, filas)
+                uow.append(hoja, columnas, [dict(zip(columnas, f)) for f in filas])
+            else:
+                uow.actualizar_por_clave(hoja, columnas, datos["col_clave"], datos["cambios"])
+                hubo_actualizacion = True
+            ids.append(op_id)
+
+        marcas = [(i,) for i in ids]
+        con.executemany("UPDATE _replicacion SET enviado = 1 WHERE id = ?", marcas)
+        uow.confirmar()
+        con.executemany("DELETE FROM _replicacion WHERE id = ?", marcas)
+        return len(ids)
+    except Exception as exc:
+        if not ids or _es_transitorio(exc):
+            raise
+        # Las operaciones apartadas salen de la cola y la siguiente sigue
+        if _registrar_fallo(con, ids, exc):
+            return len(ids)
+        raise
+
+
+def fallidas_replicacion(libro: str | None = None) -> int:
+    """Cantidad de operaciones apartadas por fallar REPLICACION_MAX_INTENTOS veces."""
+    sql = "SELECT COUNT(*) FROM _replicacion_fallidas"
+    params: Tuple = ()
+    if libro is not None:
+        sql += " WHERE libro = ?"
+        params = (libro,)
+    return _conexion().execute(sql, params).fetchone()[0]
+
+
+def reencolar_fallidas(libro: str | None = None) -> int:
+    """
+    Devuelve a la cola (al final, con los intentos en cero) las operaciones
+    apartadas, una vez corregida la causa (p. ej. el encabezado de la hoja).
+    """
+    filtro, params = ("", ()) if libro is None else (" WHERE libro = ?", (libro,))
+    with transaccion() as con:
+        con.execute(
+            "INSERT INTO _replicacion (libro, hoja, tipo, payload, creado)"
+            " SELECT libro, hoja, tipo, payload, creado FROM _replicacion_fallidas"
+            + filtro + " ORDER BY id",
+            params,
+        )
+        total = con.execute("DELETE FROM _replicacion_fallidas" + filtro, params).rowcount
+    despertar_replicador()
+    return total
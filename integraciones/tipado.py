@@ -0,0 +1,170 @@
+# integraciones/tipado.py
+"""
+Esquemas tipados de los registros (Documentos, Evaluaciones,
+Autorizaciones, BD de anuncios).
+
+Las hojas se leen como texto (así se escriben de vuelta sin cambios). Para
+filtrar y ordenar se usa una versión tipada, normalizada UNA vez por copia
+cargada (ver sheets_cache.leer_tipado):
+
+- Columnas categóricas (ESTADO, ASUNTO, GENERO, GIRO, ...): sin espacios
+  a los extremos y en mayúsculas, como 'category'. La normalización se
+  hace solo sobre los valores distintos, no fila por fila.
+- Columnas de fecha dd/mm/aaaa: datetime64 (NaT si no es una fecha).
+- Resto: texto sin espacios a los extremos.
+
+Para operaciones sobre una sola fila, cada esquema tiene una clase de
+registro con __slots__ (esquema.registro): sin el costo de una Series.
+"""
+
+from __future__ import annotations
+
+import re
+import unicodedata
+from typing import Dict, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+import pandas as pd
+
+FORMATO_FECHA = "%d/%m/%Y"
+
+
+# ---------------------------------------------------------------------------
+# REGISTROS (una fila)
+# ---------------------------------------------------------------------------
+
+
+def nombre_atributo(columna: str) -> str:
+    """'N° DE EVALUACIÓN' -> 'n_de_evaluacion' (identificador válido)."""
+    sin_tildes = unicodedata.normalize("NFKD", columna)
+    sin_tildes = "".join(c for c in sin_tildes if not unicodedata.combining(c))
+    nombre = re.sub(r"[^0-9a-zA-Z]+", "_", sin_tildes).strip("_").lower()
+    return nombre if nombre and not nombre[0].isdigit() else f"c_{nombre}"
+
+
+class Registro:
+    """Base de los registros: una fila con un atributo por columna."""
+
+    __slots__ = ()
+    COLUMNAS: Tuple[str, ...] = ()
+    ATRIBUTOS: Dict[str, str] = {}
+
+    def __init__(self, *valores: object):
+        for attr, valor in zip(self.__slots__, valores):
+            setattr(self, attr, valor)
+        for attr in self.__slots__[len(valores):]:
+            setattr(self, attr, "")
+
+    @classmethod
+    def desde_fila(cls, fila: Mapping[str, object]) -> "Registro":
+        """Crea el registro desde un dict / Series {columna: valor}."""
+        return cls(*(fila.get(col, "") for col in cls.COLUMNAS))
+
+    def get(self, columna: str, default: object = "") -> object:
+        """Igual que Series.get: valor por nombre de columna."""
+        attr = self.ATRIBUTOS.get(columna)
+        return getattr(self, attr) if attr is not None else default
+
+    def __getitem__(self, columna: str) -> object:
+        return getattr(self, self.ATRIBUTOS[columna])
+
+    def a_dict(self) -> Dict[str, object]:
+        return {col: getattr(self, attr) for col, attr in self.ATRIBUTOS.items()}
+
+    def __eq__(self, otro: object) -> bool:
+        return type(otro) is type(self) and all(
+            getattr(self, a) == getattr(otro, a) for a in self.__slots__
+        )
+
+    def __repr__(self) -> str:
+        campos = ", ".join(f"{a}={getattr(self, a)!r}" for a in self.__slots__)
+        return f"{type(self).__name__}({campos})"
+
+
+def clase_registro(nombre: str, columnas: Sequence[str]) -> type:
+    """Crea una subclase de Registro con un slot por columna."""
+    atributos: Dict[str, str] = {}
+    for col in columnas:
+        attr = base = nombre_atributo(col)
+        i = 2
+        while attr in atributos.values():
+            attr, i = f"{base}_{i}", i + 1
+        atributos[col] = attr
+    return type(
+        nombre,
+        (Registro,),
+        {
+            "__slots__": tuple(atributos.values()),
+            "COLUMNAS": tuple(columnas),
+            "ATRIBUTOS": atributos,
+        },
+    )
+
+
+# ---------------------------------------------------------------------------
+# ESQUEMAS
+# ---------------------------------------------------------------------------
+
+
+class Esquema:
+    """Columnas de un registro y cómo se tipa cada una."""
+
+    __slots__ = ("nombre", "columnas", "categoricas", "fechas", "registro")
+
+    def __init__(
+        self,
+        nombre: str,
+        columnas: Sequence[str],
+        categoricas: Sequence[str] = (),
+        fechas: Sequence[str] = (),
+    ):
+        self.nombre = nombre
+        self.columnas: List[str] = list(columnas)
+        self.categoricas = frozenset(categoricas)
+        self.fechas = frozenset(fechas)
+        self.registro = clase_registro(f"Registro{nombre}", self.columnas)
+
+
+def _categoria(serie: pd.Series) -> pd.Series:
+    """Mayúsculas y sin espacios, normalizando solo los valores distintos."""
+    distintos = pd.unique(serie)
+    mapa = {v: str(v).strip().upper() for v in distintos}
+    return serie.map(mapa).astype("category")
+
+
+def tipar(df: pd.DataFrame, esquema: Esquema) -> pd.DataFrame:
+    """
+    Versión tipada de un DataFrame de texto (ver docstring del módulo).
+    Solo toca las columnas presentes; no modifica 'df'.
+    """
+    tipado = {}
+    for col in df.columns:
+        serie = df[col].fillna("").astype(str)
+        if col in esquema.categoricas:
+            tipado[col] = _categoria(serie)
+        elif col in esquema.fechas:
+            tipado[col] = pd.to_datetime(
+                serie.str.strip(), format=FORMATO_FECHA, errors="coerce"
+            )
+        else:
+            tipado[col] = serie.str.strip()
+    return pd.DataFrame(tipado, index=df.index, columns=df.columns)
+
+
+def registros(df: pd.DataFrame, esquema: Esquema) -> Iterator[Registro]:
+    """Recorre el DataFrame como registros con __slots__ (sin Series)."""
+    cls = esquema.registro
+    datos = df.reindex(columns=esquema.columnas, fill_value="")
+    for valores in datos.itertuples(index=False, name=None):
+        yield cls(*valores)
+
+
+def registro_en(df: pd.DataFrame, pos: int, esquema: Esquema) -> Optional[Registro]:
+    """Registro de la fila en la posición 'pos' (None si no existe)."""
+    if pos < 0 or pos >= len(df):
+        return None
+    return esquema.registro(
+        *(
+            df.iat[pos, df.columns.get_loc(col)] if col in df.columns else ""
+            for col in esquema.columnas
+        )
+    )
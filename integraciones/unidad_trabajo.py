@@ -0,0 +1,340 @@
+# integraciones/unidad_trabajo.py
+"""
+Unidad de trabajo para Google Sheets.
+
+Junta todas las escrituras de un "guardado" (appends y actualizaciones por
+clave, en una o varias hojas del mismo Spreadsheet) y las confirma con:
+
+    1 llamada values.batchGet   → solo las columnas clave / correlativo
+    1 llamada spreadsheets.batchUpdate → todas las filas nuevas y celdas
+
+El costo es el mismo sin importar el tamaño de las hojas.
+
+Uso:
+
+    with unidad_de_trabajo(client, SPREADSHEET_ID):
+        append_evaluacion(...)
+        append_autorizacion(...)
+        actualizar_estado_documento(...)
+
+Dentro del bloque, los helpers de escritura registran la operación en la
+unidad activa (ver unidad_activa()) en vez de llamar a la API. Si el bloque
+termina con una excepción, no se escribe nada.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import contextvars
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import gspread
+from gspread.utils import absolute_range_name
+
+from integraciones import sheets_cache
+from integraciones.gsheets import (
+    Numerador,
+    bloqueo_escritura,
+    es_error_hoja_inexistente,
+    fila_a_valores,
+    invalidar_worksheet,
+    letra_columna,
+    normalizar_clave,
+    obtener_libro,
+    obtener_worksheet,
+    pedido_agregar_filas,
+    pedidos_actualizar_celdas,
+)
+
+_UNIDAD_ACTIVA: contextvars.ContextVar[Optional["UnidadDeTrabajo"]] = (
+    contextvars.ContextVar("unidad_trabajo_sheets", default=None)
+)
+
+
+def unidad_activa(spreadsheet_id: str) -> Optional["UnidadDeTrabajo"]:
+    """Devuelve la unidad de trabajo abierta para ese Spreadsheet (o None)."""
+    uow = _UNIDAD_ACTIVA.get()
+    if uow is not None and uow.spreadsheet_id == spreadsheet_id:
+        return uow
+    return None
+
+
+class _Append:
+    __slots__ = ("sheet_name", "columnas", "filas", "auto_numero_col", "numerador", "inicio")
+
+    def __init__(self, sheet_name, columnas, filas, auto_numero_col, numerador):
+        self.sheet_name = sheet_name
+        self.columnas = list(columnas)
+        self.filas = [dict(f) for f in filas]
+        self.auto_numero_col = auto_numero_col
+        self.numerador = numerador
+        # Primer correlativo reservado con 'numerador' (una sola vez, antes
+        # de enviar: un reintento no vuelve a consumir números)
+        self.inicio: Optional[int] = None
+
+
+class _Actualizacion:
+    __slots__ = ("sheet_name", "columnas", "col_clave", "cambios_por_clave", "filas")
+
+    def __init__(self, sheet_name, columnas, col_clave, cambios_por_clave):
+        self.sheet_name = sheet_name
+        self.columnas = list(columnas)
+        self.col_clave = col_clave
+        self.cambios_por_clave = {
+            normalizar_clave(k): dict(v) for k, v in cambios_por_clave.items()
+        }
+        # Filas que coincidieron en la hoja (se sabe al confirmar)
+        self.filas: Optional[int] = None
+
+
+class UnidadDeTrabajo:
+    """
+    Acumula mutaciones sobre las hojas de un Spreadsheet y las confirma
+    en un solo batchUpdate (ver docstring del módulo).
+    """
+
+    def __init__(self, client: gspread.Client, spreadsheet_id: str):
+        self.client = client
+        self.spreadsheet_id = spreadsheet_id
+        self._appends: List[_Append] = []
+        self._actualizaciones: List[_Actualizacion] = []
+
+    # ------------------------------------------------------------------
+    # Registro de operaciones
+    # ------------------------------------------------------------------
+
+    def append(
+        self,
+        sheet_name: str,
+        columnas: Sequence[str],
+        filas: Sequence[Dict[str, object]],
+        auto_numero_col: str | None = None,
+        numerador: Numerador | None = None,
+    ) -> None:
+        if filas:
+            self._appends.append(
+                _Append(sheet_name, columnas, filas, auto_numero_col, numerador)
+            )
+
+    def actualizar_por_clave(
+        self,
+        sheet_name: str,
+        columnas: Sequence[str],
+        col_clave: str,
+        cambios_por_clave: Dict[str, Dict[str, object]],
+    ) -> Optional[_Actualizacion]:
+        """
+        Registra la actualización. La operación devuelta tiene en 'filas'
+        cuántas filas de la hoja coincidieron, una vez confirmada.
+        """
+        if not cambios_por_clave:
+            return None
+        act = _Actualizacion(sheet_name, columnas, col_clave, cambios_por_clave)
+        self._actualizaciones.append(act)
+        return act
+
+    def filas_pendientes(self, sheet_name: str, col_clave: str, claves) -> int:
+        """Filas por agregar en esta unidad cuya 'col_clave' está en 'claves'."""
+        buscadas = {normalizar_clave(c) for c in claves}
+        return sum(
+            normalizar_clave(fila.get(col_clave)) in buscadas
+            for app in self._appends
+            if app.sheet_name == sheet_name
+            for fila in app.filas
+        )
+
+    @property
+    def vacia(self) -> bool:
+        return not self._appends and not self._actualizaciones
+
+    # ------------------------------------------------------------------
+    # Confirmación
+    # ------------------------------------------------------------------
+
+    def _hojas(self) -> Dict[str, Sequence[str]]:
+        hojas: Dict[str, Sequence[str]] = {}
+        for op in [*self._appends, *self._actualizaciones]:
+            hojas.setdefault(op.sheet_name, op.columnas)
+        return hojas
+
+    def _aplicar_actualizaciones_a_pendientes(self) -> None:
+        """
+        Si se actualiza una clave que se está agregando en esta misma
+        unidad, el cambio se aplica directo a la fila pendiente.
+        """
+        for act in self._actualizaciones:
+            for app in self._appends:
+                if app.sheet_name != act.sheet_name:
+                    continue
+                for fila in app.filas:
+                    clave = normalizar_clave(fila.get(act.col_clave))
+                    if clave in act.cambios_por_clave:
+                        fila.update(act.cambios_por_clave[clave])
+
+    def _leer_columnas(
+        self,
+        sh: gspread.Spreadsheet,
+        worksheets: Dict[str, gspread.Worksheet],
+        columnas_por_hoja: Dict[str, Sequence[str]],
+        pedidas: List[Tuple[str, str]],
+    ) -> Dict[Tuple[str, str], List[str]]:
+        """Lee en una sola llamada todas las columnas (hoja, columna) pedidas."""
+        if not pedidas:
+            return {}
+
+        rangos = []
+        for sheet_name, col in pedidas:
+            idx = list(columnas_por_hoja[sheet_name]).index(col) + 1
+            letra = letra_columna(idx)
+            rangos.append(
+                absolute_range_name(worksheets[sheet_name].title, f"{letra}:{letra}")
+            )
+
+        resp = sh.values_batch_get(rangos, params={"majorDimension": "COLUMNS"})
+        salida: Dict[Tuple[str, str], List[str]] = {}
+        for pedida, rango in zip(pedidas, resp.get("valueRanges", [])):
+            valores = rango.get("values") or [[]]
+            salida[pedida] = list(valores[0])
+        return salida
+
+    def _confirmar_una_vez(self) -> List[Tuple[str, object]]:
+        sh = obtener_libro(self.client, self.spreadsheet_id)
+        columnas_por_hoja = self._hojas()
+        worksheets = {
+            nombre: obtener_worksheet(self.client, self.spreadsheet_id, nombre, cols)
+            for nombre, cols in columnas_por_hoja.items()
+        }
+
+        pedidas: List[Tuple[str, str]] = []
+        for act in self._actualizaciones:
+            pedidas.append((act.sheet_name, act.col_clave))
+        for app in self._appends:
+            if (
+                app.auto_numero_col
+                and app.auto_numero_col in app.columnas
+                and app.numerador is None
+            ):
+                pedidas.append((app.sheet_name, app.auto_numero_col))
+        pedidas = list(dict.fromkeys(pedidas))
+        columnas_leidas = self._leer_columnas(
+            sh, worksheets, columnas_por_hoja, pedidas
+        )
+
+        requests: List[Dict[str, object]] = []
+        parches: List[Tuple[str, object]] = []
+
+        # --- Actualizaciones por clave (updateCells) ---
+        for act in self._actualizaciones:
+            ws = worksheets[act.sheet_name]
+            valores_col = columnas_leidas.get((act.sheet_name, act.col_clave), [])
+            act.filas = 0
+            for num_fila, valor in enumerate(valores_col[1:], start=2):
+                cambios = act.cambios_por_clave.get(normalizar_clave(valor))
+                if not cambios:
+                    continue
+                act.filas += 1
+                requests.extend(pedidos_actualizar_celdas(ws, act.columnas, {num_fila: cambios}))
+            parches.append(("actualizar", act))
+
+        # --- Filas nuevas (appendCells) ---
+        siguiente_numero: Dict[str, int] = {}
+        for app in self._appends:
+            ws = worksheets[app.sheet_name]
+            valores = [fila_a_valores(app.columnas, f) for f in app.filas]
+
+            if app.auto_numero_col and app.auto_numero_col in app.columnas:
+                idx = app.columnas.index(app.auto_numero_col)
+                if app.inicio is not None:
+                    siguiente = app.inicio
+                else:
+                    col = columnas_leidas.get(
+                        (app.sheet_name, app.auto_numero_col), []
+                    )
+                    siguiente = siguiente_numero.get(app.sheet_name, max(len(col), 1))
+                for i, fila_valores in enumerate(valores):
+                    fila_valores[idx] = str(siguiente + i)
+                siguiente_numero[app.sheet_name] = siguiente + len(valores)
+
+            requests.extend(pedido_agregar_filas(ws, valores))
+            parches.append(("append", (app, valores)))
+
+        if requests:
+            sh.batch_update({"requests": requests})
+        return parches
+
+    def _parchar_cache(self, parches: List[Tuple[str, object]]) -> None:
+        for tipo, dato in parches:
+            if tipo == "actualizar":
+                act = dato
+                sheets_cache.actualizar_filas(
+                    (self.spreadsheet_id, act.sheet_name),
+                    act.col_clave,
+                    act.cambios_por_clave,
+                )
+            else:
+                app, valores = dato
+                sheets_cache.agregar_filas(
+                    (self.spreadsheet_id, app.sheet_name), app.columnas, valores
+                )
+
+    def _numerar(self) -> None:
+        """Reserva los correlativos de los appends con 'numerador' (una vez)."""
+        for app in self._appends:
+            if (
+                app.numerador is not None
+                and app.inicio is None
+                and app.auto_numero_col in app.columnas
+            ):
+                app.inicio = app.numerador(len(app.filas))
+
+    def confirmar(self) -> int:
+        """
+        Envía todas las mutaciones acumuladas. Si alguna hoja fue renombrada
+        o eliminada, se re-resuelven los handles y se reintenta una vez (con
+        los mismos correlativos). Devuelve cuántas filas existentes
+        coincidieron con las actualizaciones por clave.
+        """
+        if self.vacia:
+            return 0
+
+        self._aplicar_actualizaciones_a_pendientes()
+        hojas = [(self.spreadsheet_id, nombre) for nombre in self._hojas()]
+        with bloqueo_escritura(hojas):
+            self._numerar()
+            try:
+                parches = self._confirmar_una_vez()
+            except gspread.exceptions.APIError as e:
+                if not es_error_hoja_inexistente(e):
+                    raise
+                for nombre in self._hojas():
+                    invalidar_worksheet(self.spreadsheet_id, nombre)
+                parches = self._confirmar_una_vez()
+
+        self._parchar_cache(parches)
+        actualizadas = sum(act.filas or 0 for act in self._actualizaciones)
+        self._appends.clear()
+        self._actualizaciones.clear()
+        return actualizadas
+
+
+@contextlib.contextmanager
+def unidad_de_trabajo(
+    client: gspread.Client, spreadsheet_id: str
+) -> Iterator[UnidadDeTrabajo]:
+    """
+    Abre una unidad de trabajo para el Spreadsheet indicado.
+    Al salir sin errores se confirma; si hubo excepción, se descarta.
+    Si ya hay una unidad activa para el mismo Spreadsheet, se reutiliza.
+    """
+    existente = unidad_activa(spreadsheet_id)
+    if existente is not None:
+        yield existente
+        return
+
+    uow = UnidadDeTrabajo(client, spreadsheet_id)
+    token = _UNIDAD_ACTIVA.set(uow)
+    try:
+        yield uow
+    finally:
+        _UNIDAD_ACTIVA.reset(token)
+    uow.confirmar()
@@ -0,0 +1,164 @@
+# integraciones/versiones.py
+"""
+Control de concurrencia optimista para las reescrituras completas de hoja
+(escribir_* / escribir_bd_certificados).
+
+- Versión de una hoja: "<filas>:<hash del contenido>" (ver version_df).
+- Quien reescribe indica la BASE sobre la que trabajó (lo que leyó). Antes
+  de escribir se vuelve a leer la hoja: si su versión ya no es la de la
+  base, alguien más escribió entretanto y se hace una fusión a tres vías
+  (base / mío / actual) en vez de pisar sus filas.
+
+La fusión trabaja con filas completas (multiconjuntos de tuplas):
+  • filas que otros agregaron o editaron → se conservan;
+  • filas que otros borraron y yo no toqué → se borran;
+  • mis altas, ediciones y bajas → se aplican.
+Si ambos lados cambiaron (editaron, borraron o agregaron) filas con la
+misma clave (col_clave) de forma distinta, es un conflicto: queda solo la
+versión del lado que gana ("mio" por defecto, u "otros"), nunca las dos,
+así la clave no se duplica. Sin col_clave (o con clave vacía) no se puede
+saber qué filas son "la misma" y se conservan ambas versiones.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from collections import Counter
+from typing import Dict, List, Sequence, Set, Tuple
+
+import pandas as pd
+
+
+def _normalizar(df: pd.DataFrame, columnas: Sequence[str]) -> pd.DataFrame:
+    return df.reindex(columns=list(columnas)).fillna("").astype(str)
+
+
+def version_df(df: pd.DataFrame, columnas: Sequence[str]) -> str:
+    """Versión de un contenido de hoja: cantidad de filas + hash (sha1)."""
+    df = _normalizar(df, columnas)
+    h = hashlib.sha1()
+    h.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return f"{len(df)}:{h.hexdigest()[:16]}"
+
+
+def _tuplas(df: pd.DataFrame, columnas: Sequence[str]) -> List[Tuple[str, ...]]:
+    return list(_normalizar(df, columnas).itertuples(index=False, name=None))
+
+
+def _por_clave(filas: List[Tuple[str, ...]], idx: int) -> Dict[str, Counter]:
+    """Filas agrupadas por clave normalizada (se omiten las de clave vacía)."""
+    salida: Dict[str, Counter] = {}
+    for fila in filas:
+        clave = fila[idx].strip()
+        if clave:
+            salida.setdefault(clave, Counter())[fila] += 1
+    return salida
+
+
+def fusionar(
+    base: pd.DataFrame,
+    mio: pd.DataFrame,
+    actual: pd.DataFrame,
+    columnas: Sequence[str],
+    col_clave: str | None = None,
+    gana: str = "mio",
+) -> Tuple[pd.DataFrame, int]:
+    """
+    Fusión a tres vías (ver docstring del módulo).
+    Devuelve (DataFrame fusionado, cantidad de conflictos).
+
+    El orden es el de 'mio'; las filas nuevas de otros van al final, en el
+    orden en que están en la hoja. En un conflicto por clave, 'gana' decide
+    qué versión queda: "mio" u "otros".
+    """
+    if gana not in ("mio", "otros"):
+        raise ValueError(f"gana debe ser 'mio' u 'otros', no {gana!r}")
+    b, m, a = _tuplas(base, columnas), _tuplas(mio, columnas), _tuplas(actual, columnas)
+    cb, cm, ca = Counter(b), Counter(m), Counter(a)
+
+    # Claves que ambos lados cambiaron, cada uno a su manera
+    en_conflicto: Set[str] = set()
+    if col_clave is not None:
+        idx = list(columnas).index(col_clave)
+        pb, pm, pa = _por_clave(b, idx), _por_clave(m, idx), _por_clave(a, idx)
+        vacio: Counter = Counter()
+        for k in pm.keys() | pa.keys() | pb.keys():
+            antes, mias, suyas = pb.get(k, vacio), pm.get(k, vacio), pa.get(k, vacio)
+            if mias != antes and suyas != antes and mias != suyas:
+                en_conflicto.add(k)
+
+    def _clave(fila: Tuple[str, ...]) -> str:
+        return fila[idx].strip() if col_clave is not None else ""
+
+    quitadas_por_otros = cb - ca
+    quitadas_por_mi = cb - cm
+    # Sin clave no se sabe qué es "la misma fila": si ambos quitaron la misma
+    # fila base, se conservan las dos versiones y se cuenta como conflicto
+    conflictos = len(en_conflicto) + sum(
+        n for fila, n in (quitadas_por_otros & quitadas_por_mi).items() if not _clave(fila)
+    )
+
+    suyas_en_conflicto = [fila for fila in a if _clave(fila) in en_conflicto]
+    resueltas: Set[str] = set()
+
+    def _versiones_de_otros(k: str) -> List[Tuple[str, ...]]:
+        if k in resueltas:
+            return []
+        resueltas.add(k)
+        return [fila for fila in suyas_en_conflicto if _clave(fila) == k]
+
+    # Filas base que otros quitaron y yo mantuve igual → también se quitan
+    por_quitar = quitadas_por_otros - quitadas_por_mi
+    resultado = []
+    for fila in m:
+        k = _clave(fila)
+        if k in en_conflicto:
+            resultado.extend([fila] if gana == "mio" else _versiones_de_otros(k))
+            continue
+        if por_quitar[fila] > 0:
+            por_quitar[fila] -= 1
+            continue
+        resultado.append(fila)
+
+    # Altas/ediciones de otros (si yo agregué la misma fila, no se duplica)
+    por_agregar = (ca - cb) - (cm - cb)
+    for fila in a:
+        k = _clave(fila)
+        if k in en_conflicto:
+            if gana == "otros":
+                resultado.extend(_versiones_de_otros(k))
+            continue
+        if por_agregar[fila] > 0:
+            por_agregar[fila] -= 1
+            resultado.append(fila)
+
+    return pd.DataFrame(resultado, columns=list(columnas)), conflictos
+
+
+def resolver_escritura(
+    base: pd.DataFrame,
+    mio: pd.DataFrame,
+    actual: pd.DataFrame,
+    columnas: Sequence[str],
+    col_clave: str | None = None,
+    gana: str = "mio",
+) -> Tuple[pd.DataFrame, dict]:
+    """
+    Decide qué escribir: 'mio' si la hoja sigue en la versión base; si no,
+    la fusión (ver fusionar() para col_clave / gana). Devuelve (DataFrame a
+    escribir, resumen) con el resumen
+    {"fusionado": bool, "conflictos": int, "version_base", "version_actual"}.
+    """
+    v_base = version_df(base, columnas)
+    v_actual = version_df(actual, columnas)
+    if v_base == v_actual:
+        final, conflictos, fusionado = _normalizar(mio, columnas), 0, False
+    else:
+        final, conflictos = fusionar(base, mio, actual, columnas, col_clave, gana)
+        fusionado = True
+    return final, {
+        "fusionado": fusionado,
+        "conflictos": conflictos,
+        "version_base": v_base,
+        "version_actual": v_actual,
+    }
@@ -0,0 +1,154 @@
+# integraciones/vista_paginada.py
+"""
+Componente Streamlit de tabla paginada (ver integraciones/paginacion.py).
+
+Tamaño de página, orden por columna y filtros "contiene"; solo se traen
+del almacenamiento las filas de la página que se muestra. Con
+editable=True la página se muestra en un data_editor y al guardar se
+aplica solo lo que cambió (celdas, filas agregadas / quitadas).
+"""
+
+from __future__ import annotations
+
+from typing import Dict, Optional, Sequence
+
+import streamlit as st
+
+from integraciones.paginacion import FuenteHoja, guardar_ventana, leer_pagina
+
+SIN_ORDEN = "(orden de registro)"
+
+
+def _volver_a_primera(clave: str) -> None:
+    st.session_state[f"{clave}_pagina"] = 1
+
+
+def vista_paginada(
+    fuente: FuenteHoja,
+    clave: str,
+    columnas_filtro: Sequence[str] = (),
+    editable: bool = False,
+    filas_dinamicas: bool = False,
+    columnas_bloqueadas: Sequence[str] = (),
+    descendente: bool = True,
+    tamanos: Sequence[int] = (25, 50, 100),
+) -> Optional[Dict[str, int]]:
+    """
+    Muestra la hoja de 'fuente' página por página. 'clave' distingue los
+    widgets de cada vista. Por defecto, los últimos registros primero.
+    Con filas_dinamicas=True (y editable) también se pueden agregar y
+    quitar filas. Si se guardó, devuelve el resumen de guardar_ventana().
+    """
+    c1, c2, c3 = st.columns([1, 2, 1])
+    tam = c1.selectbox(
+        "Filas por página",
+        list(tamanos),
+        key=f"{clave}_tam",
+        on_change=_volver_a_primera,
+        args=(clave,),
+    )
+    orden = c2.selectbox(
+        "Ordenar por",
+        [SIN_ORDEN] + fuente.columnas,
+        key=f"{clave}_orden",
+        on_change=_volver_a_primera,
+        args=(clave,),
+    )
+    desc = c3.checkbox(
+        "Descendente",
+        value=descendente,
+        key=f"{clave}_desc",
+        on_change=_volver_a_primera,
+        args=(clave,),
+    )
+
+    filtros: Dict[str, str] = {}
+    if columnas_filtro:
+        for col, celda in zip(columnas_filtro, st.columns(len(columnas_filtro))):
+            filtros[col] = celda.text_input(
+                col,
+                key=f"{clave}_filtro_{col}",
+                placeholder="contiene…",
+                on_change=_volver_a_primera,
+                args=(clave,),
+            )
+
+    clave_pagina = f"{clave}_pagina"
+    try:
+        pagina = leer_pagina(
+            fuente,
+            numero=st.session_state.get(clave_pagina, 1),
+            tam=tam,
+            orden=None if orden == SIN_ORDEN else orden,
+            descendente=desc,
+            filtros=filtros,
+        )
+    except Exception as e:
+        st.error(f"No se pudo leer la base de datos: {e}")
+        return None
+
+    if pagina.total == 0:
+        st.info("No hay registros que mostrar.")
+        return None
+
+    resumen = None
+    if editable:
+        # La clave del editor cambia con la ventana y con cada guardado: las
+        # ediciones de una página no se aplican sobre otra ni dos veces
+        clave_version = f"{clave}_version"
+        version = st.session_state.get(clave_version, 0)
+        firma = hash(
+            (pagina.numero, tam, orden, desc, tuple(sorted(filtros.items())), version)
+        )
+        editado = st.data_editor(
+            pagina.df,
+            num_rows="dynamic" if filas_dinamicas else "fixed",
+            disabled=list(columnas_bloqueadas),
+            hide_index=True,
+            use_container_width=True,
+            key=f"{clave}_editor_{firma}",
+        )
+        if st.button("💾 Guardar cambios de esta página", key=f"{clave}_guardar"):
+            try:
+                resumen = guardar_ventana(fuente, pagina.df, editado)
+                st.session_state[clave_version] = version + 1
+                hechos = {
+                    "actualizadas": resumen["actualizadas"],
+                    "agregadas": resumen["insertadas"],
+                    "quitadas": resumen["borradas"],
+                }
+                if any(hechos.values()):
+                    st.success(
+                        "Cambios guardados: "
+                        + ", ".join(f"{n} {k}" for k, n in hechos.items() if n)
+                    )
+                elif not resumen["conflictos"]:
+                    st.info("No hay cambios que guardar en esta página.")
+                if resumen["conflictos"]:
+                    st.warning(
+                        f"{resumen['conflictos']} fila(s) fueron cambiadas por otra "
+                        "sesión mientras editabas; no se sobrescribieron. "
+                        "Revisa la página actualizada y vuelve a editarlas."
+                    )
+            except Exception as e:
+                st.error(f"No se pudieron guardar los cambios: {e}")
+    else:
+        st.dataframe(pagina.df, hide_index=True, use_container_width=True)
+
+    # El número de página se fija antes de crear el widget (puede haberse
+    # ajustado si hay menos páginas que antes)
+    st.session_state[clave_pagina] = pagina.numero
+    p1, p2 = st.columns([1, 3])
+    p1.number_input(
+        "Página",
+        min_value=1,
+        max_value=pagina.paginas,
+        step=1,
+        key=clave_pagina,
+    )
+    hasta = pagina.desde + len(pagina.df) - 1
+    p2.caption(
+        f"Filas {pagina.desde}–{hasta} de {pagina.total} · "
+        f"página {pagina.numero} de {pagina.paginas}"
+    )
+    return resumen
@@ -0,0 +1,59 @@
+# tests/conftest.py
+"""
+Fixtures compartidos. Las pruebas no usan credenciales ni red: las hojas
+van en el backend "memoria" (integraciones/almacen.py) y las bases SQLite
+en el directorio temporal de cada prueba.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import uuid
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
+
+os.environ["ALMACENAMIENTO_SHEETS"] = "memoria"
+
+from integraciones import almacen, cache_consultas, secuencias, sqlite_store  # noqa: E402
+
+
+def _cerrar(local) -> None:
+    con = getattr(local, "con", None)
+    if con is not None:
+        con.close()
+        del local.con
+
+
+@pytest.fixture
+def libro():
+    """
+    (cliente en memoria, spreadsheet_id). El id es nuevo en cada prueba:
+    los handles y la caché de hojas (por id) no pasan de una a otra.
+    """
+    return almacen.AlmacenMemoria(), f"libro-{uuid.uuid4().hex[:8]}"
+
+
+@pytest.fixture
+def base_sqlite(tmp_path, monkeypatch):
+    """Base de registros (sqlite_store / secuencias) nueva y vacía."""
+    monkeypatch.setenv("SQLITE_REGISTROS_PATH", str(tmp_path / "registros.db"))
+    _cerrar(sqlite_store._LOCAL)
+    secuencias._SEMBRADOS.clear()
+    yield tmp_path / "registros.db"
+    _cerrar(sqlite_store._LOCAL)
+    secuencias._SEMBRADOS.clear()
+
+
+@pytest.fixture
+def cache_codart(tmp_path, monkeypatch):
+    """Caché de consultas CODART nueva, en un archivo temporal."""
+    monkeypatch.setenv("CODART_CACHE_PATH", str(tmp_path / "consultas.db"))
+    _cerrar(cache_consultas._LOCAL)
+    cache_consultas._LOCAL.desactivada = False
+    yield cache_consultas
+    _cerrar(cache_consultas._LOCAL)
@@ -0,0 +1,73 @@
+# tests/test_cache_consultas.py
+import time
+
+
+class _Reloj:
+    def __init__(self):
+        self.ahora = time.time()
+
+    def __call__(self):
+        return self.ahora
+
+
+def _con_reloj(cache, monkeypatch):
+    reloj = _Reloj()
+    monkeypatch.setattr(cache.time, "time", reloj)
+    return reloj
+
+
+def test_guardar_y_leer(cache_codart):
+    cache_codart.guardar("dni", "12345678", {"nombres": "ANA"})
+
+    entrada = cache_codart.leer("dni", "12345678")
+
+    assert entrada == cache_codart.Entrada({"nombres": "ANA"}, None, True)
+    assert cache_codart.leer("dni", "87654321") is None
+
+
+def test_vencida_se_sirve_como_no_vigente_hasta_el_maximo(cache_codart, monkeypatch):
+    monkeypatch.setenv("CODART_CACHE_TTL_RUC", "100")
+    monkeypatch.setenv("CODART_CACHE_VENCIDO_MAX", "1000")
+    reloj = _con_reloj(cache_codart, monkeypatch)
+    cache_codart.guardar("ruc", "20100000001", {"estado": "ACTIVO"})
+
+    reloj.ahora += 500
+    entrada = cache_codart.leer("ruc", "20100000001")
+    assert entrada.valor == {"estado": "ACTIVO"} and not entrada.vigente
+
+    reloj.ahora += 1000
+    assert cache_codart.leer("ruc", "20100000001") is None
+
+
+def test_respuesta_negativa_dura_poco(cache_codart, monkeypatch):
+    monkeypatch.setenv("CODART_CACHE_TTL_NEGATIVO", "60")
+    reloj = _con_reloj(cache_codart, monkeypatch)
+    cache_codart.guardar_error("dni", "00000000", "DNI no encontrado")
+
+    assert cache_codart.leer("dni", "00000000").error == "DNI no encontrado"
+    reloj.ahora += 61
+    assert cache_codart.leer("dni", "00000000") is None
+
+
+def test_desaloja_las_menos_usadas(cache_codart, monkeypatch):
+    # ~1 KB por entrada y un máximo de 3,5 KB: la cuarta obliga a desalojar
+    monkeypatch.setenv("CODART_CACHE_MAX_MB", str(3.5 / 1024))
+    reloj = _con_reloj(cache_codart, monkeypatch)
+    for i in range(3):
+        cache_codart.guardar("dni", f"1000000{i}", {"relleno": "x" * 1000})
+        reloj.ahora += 120
+    cache_codart.leer("dni", "10000000")  # la primera se vuelve a usar
+    reloj.ahora += 120
+
+    cache_codart.guardar("dni", "10000003", {"relleno": "x" * 1000})
+
+    assert cache_codart.leer("dni", "10000000") is not None
+    assert cache_codart.leer("dni", "10000001") is None
+    assert cache_codart.leer("dni", "10000003") is not None
+
+
+def test_olvidar(cache_codart):
+    cache_codart.guardar("dni", "12345678", {"nombres": "ANA"})
+    cache_codart.olvidar("dni", "12345678")
+
+    assert cache_codart.leer("dni", "12345678") is None
@@ -0,0 +1,98 @@
+# tests/test_importar_documentos.py
+import io
+
+import pandas as pd
+
+from comercio.importar_documentos import COL_DS, COLUMNAS_DOCUMENTOS, leer_bloques, validar_bloque
+
+
+def _bloque(*filas):
+    df = pd.DataFrame(
+        [{col: fila.get(col, "") for col in COLUMNAS_DOCUMENTOS} for fila in filas]
+    )
+    df.insert(0, "FILA", range(2, len(filas) + 2))
+    return df
+
+
+def _valida(**cambios):
+    fila = {
+        "FECHA DE INGRESO": "2024-03-05",
+        COL_DS: "DS-1",
+        "ASUNTO": "renovación",
+        "NOMBRE Y APELLIDO": "ana perez",
+        "DNI": "12345678",
+        "DOMICILIO FISCAL": "av. lima 123",
+        "GIRO O MOTIVO DE LA SOLICITUD": "golosinas",
+        "UBICACIÓN A SOLICITAR": "parque",
+        "PROCEDENTE / IMPROCEDENTE": "procedente",
+    }
+    fila.update(cambios)
+    return fila
+
+
+def test_fila_valida_se_normaliza():
+    validas, rechazadas = validar_bloque(_bloque(_valida()), set(), set())
+
+    assert rechazadas.empty
+    fila = validas.iloc[0]
+    assert fila["FECHA DE INGRESO"] == "05/03/2024"
+    assert fila["ASUNTO"] == "RENOVACION"
+    assert fila["NOMBRE Y APELLIDO"] == "ANA PEREZ"
+    assert fila["ESTADO"] == "PENDIENTE"
+
+
+def test_motivos_de_rechazo():
+    bloque = _bloque(
+        _valida(**{COL_DS: "DS-1", "DNI": "1234"}),
+        _valida(**{COL_DS: "DS-2", "FECHA DE INGRESO": "31/02/2024"}),
+        _valida(**{COL_DS: "DS-3", "PROCEDENTE / IMPROCEDENTE": "TALVEZ"}),
+        _valida(**{COL_DS: "DS-4", "DOMICILIO FISCAL": ""}),
+    )
+
+    validas, rechazadas = validar_bloque(bloque, set(), set())
+
+    assert validas.empty
+    assert rechazadas["MOTIVO"].tolist() == [
+        "DNI debe tener 8 dígitos",
+        "FECHA DE INGRESO no es una fecha dd/mm/aaaa",
+        "PROCEDENTE / IMPROCEDENTE debe ser PROCEDENTE o IMPROCEDENTE",
+        "falta DOMICILIO FISCAL",
+    ]
+
+
+def test_ds_repetido_o_ya_registrado():
+    vistos = {"DS-9"}
+    bloque = _bloque(
+        _valida(**{COL_DS: "DS-1"}),
+        _valida(**{COL_DS: "DS-1"}),
+        _valida(**{COL_DS: "DS-2"}),
+        _valida(**{COL_DS: "DS-9"}),
+    )
+
+    validas, rechazadas = validar_bloque(bloque, {"DS-2"}, vistos)
+
+    assert validas[COL_DS].tolist() == ["DS-1"]
+    assert rechazadas["MOTIVO"].tolist() == [
+        "D.S. repetido en el archivo",
+        "D.S. ya registrado",
+        "D.S. repetido en el archivo",
+    ]
+    assert "DS-1" in vistos
+
+
+def test_csv_omite_filas_vacias_y_numera_como_el_archivo():
+    contenido = (
+        "N° de Documento Simple;Asunto;Domicilio\n"
+        ";;\n"
+        "\n"
+        'DS-1;OTROS;"calle 1\nsegundo piso"\n'
+        ";;;;\n"
+        "DS-2;OTROS;calle 2\n"
+    )
+
+    bloques = list(leer_bloques(io.BytesIO(contenido.encode("utf-8")), "ds.csv"))
+
+    df = pd.concat(bloques)
+    assert df["FILA"].tolist() == [4, 7]
+    assert df[COL_DS].tolist() == ["DS-1", "DS-2"]
+    assert df["DOMICILIO FISCAL"].tolist() == ["calle 1\nsegundo piso", "calle 2"]
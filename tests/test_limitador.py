@@ -0,0 +1,93 @@
+# tests/test_limitador.py
+import threading
+import time
+
+import pytest
+import requests
+from gspread.exceptions import APIError
+from gspread.http_client import HTTPClient
+
+from integraciones import almacen, limitador
+from integraciones.limitador import (
+    PRIORIDAD_ESCRITURA,
+    PRIORIDAD_FONDO,
+    HTTPClientLimitado,
+    LimitadorCuota,
+)
+
+
+def test_rafaga_sin_espera_y_luego_a_la_tasa():
+    cuota = LimitadorCuota(por_minuto=600, rafaga=3)  # 10 por segundo
+
+    esperas = [cuota.adquirir() for _ in range(3)]
+    assert max(esperas) < 0.05
+
+    assert 0.05 < cuota.adquirir() < 0.5
+
+
+def test_las_escrituras_pasan_antes_que_el_fondo():
+    cuota = LimitadorCuota(por_minuto=300, rafaga=1)  # un token cada 0,2 s
+    cuota.adquirir()
+    orden = []
+
+    def pedir(nombre, nivel):
+        cuota.adquirir(nivel)
+        orden.append(nombre)
+
+    fondo = threading.Thread(target=pedir, args=("fondo", PRIORIDAD_FONDO))
+    escritura = threading.Thread(target=pedir, args=("escritura", PRIORIDAD_ESCRITURA))
+    fondo.start()
+    time.sleep(0.05)
+    escritura.start()
+    fondo.join(2)
+    escritura.join(2)
+
+    assert orden == ["escritura", "fondo"]
+
+
+def test_agrega_filas():
+    assert limitador._agrega_filas("POST", "https://x/values/Hoja!A1:append")
+    assert limitador._agrega_filas("POST", "https://x/spreadsheets/ID:batchUpdate")
+    assert not limitador._agrega_filas("POST", "https://x/spreadsheets/ID/values:batchUpdate")
+    assert not limitador._agrega_filas("GET", "https://x/values/Hoja!A1")
+
+
+@pytest.fixture
+def cliente_http(monkeypatch):
+    monkeypatch.setattr(limitador, "_LIMITADOR", LimitadorCuota(60000, 100))
+    monkeypatch.setattr(limitador, "_MAX_REINTENTOS", 2)
+    monkeypatch.setattr(limitador, "_backoff", lambda intento: 0.0)
+    return HTTPClientLimitado(None, session=requests.Session())
+
+
+def _respuestas(monkeypatch, *codigos):
+    llamadas = []
+
+    def request(self, method, endpoint, *args, **kwargs):
+        codigo = codigos[len(llamadas)]
+        llamadas.append(endpoint)
+        if codigo != 200:
+            raise almacen._error_api(codigo, "falla")
+        return "ok"
+
+    monkeypatch.setattr(HTTPClient, "request", request)
+    return llamadas
+
+
+def test_reintenta_429_hasta_el_limite(cliente_http, monkeypatch):
+    llamadas = _respuestas(monkeypatch, 429, 503, 200)
+    assert cliente_http.request("get", "https://x/values/Hoja!A1") == "ok"
+    assert len(llamadas) == 3
+
+    llamadas = _respuestas(monkeypatch, 429, 429, 429, 200)
+    with pytest.raises(APIError):
+        cliente_http.request("get", "https://x/values/Hoja!A1")
+    assert len(llamadas) == 3
+
+
+def test_no_reintenta_un_append_ante_5xx(cliente_http, monkeypatch):
+    llamadas = _respuestas(monkeypatch, 503, 200)
+
+    with pytest.raises(APIError):
+        cliente_http.request("post", "https://x/values/Hoja!A1:append")
+    assert len(llamadas) == 1
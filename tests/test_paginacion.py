@@ -0,0 +1,91 @@
+# tests/test_paginacion.py
+import pandas as pd
+
+from integraciones import almacen
+from integraciones.paginacion import FuenteHoja, diff_ventana, guardar_ventana, leer_pagina
+
+COLUMNAS = ["N°", "RUC", "ESTADO"]
+
+
+def _original():
+    return pd.DataFrame(
+        [["1", "20100000001", "PENDIENTE"], ["2", "20100000002", "PENDIENTE"]],
+        columns=COLUMNAS,
+        index=[4, 5],
+    )
+
+
+def test_diff_ventana_sin_cambios():
+    original = _original()
+    assert diff_ventana(COLUMNAS, original, original.copy()).vacio()
+
+
+def test_diff_ventana_celdas_borradas_y_nuevas():
+    original = _original()
+    editado = original.copy()
+    editado.loc[4, "ESTADO"] = "AUTORIZADO"
+    editado = editado.drop(index=5)
+    editado.loc[6] = ["3", "20100000003", "PENDIENTE"]
+
+    diff = diff_ventana(COLUMNAS, original, editado)
+
+    assert diff.cambios == {4: {"ESTADO": "AUTORIZADO"}}
+    assert diff.borradas == [5]
+    assert diff.nuevas == [{"N°": "3", "RUC": "20100000003", "ESTADO": "PENDIENTE"}]
+
+
+def test_diff_ventana_indice_float_y_filas_en_blanco():
+    # El editor vuelve el índice float al agregar filas y deja NaN en las
+    # celdas vacías: ni una cosa ni la otra es un cambio
+    original = _original()
+    editado = original.copy()
+    editado.index = [4.0, 5.0]
+    editado.loc[7.0] = [None, None, None]
+
+    diff = diff_ventana(COLUMNAS, original, editado)
+
+    assert diff.vacio()
+
+
+def _fuente(libro, filas):
+    cliente, libro_id = libro
+    almacen.cargar_hoja(cliente, libro_id, "Registro", COLUMNAS, filas)
+    fuente = FuenteHoja(libro_id, "Registro", COLUMNAS, lambda: cliente, col_clave="N°")
+    return fuente, cliente.open_by_key(libro_id).worksheet("Registro")
+
+
+def test_guardar_ventana_ubica_las_filas_por_clave(libro):
+    filas = [[str(i), f"2010000000{i}", "PENDIENTE"] for i in range(1, 6)]
+    fuente, ws = _fuente(libro, filas)
+    pagina = leer_pagina(fuente, 1, 10)
+    editado = pagina.df.copy()
+    editado.loc[2, "ESTADO"] = "AUTORIZADO"  # N° 3
+    editado = editado.drop(index=3)  # N° 4
+
+    # Otra sesión inserta una fila arriba: las posiciones leídas se corren
+    valores = ws.get_all_values()
+    ws.update("A1", [valores[0], ["0", "20100000000", "PENDIENTE"]] + valores[1:])
+    llamadas = []
+    sh = ws.spreadsheet
+    original_batch = sh.batch_update
+    sh.batch_update = lambda body: llamadas.append(body) or original_batch(body)
+
+    resumen = guardar_ventana(fuente, pagina.df, editado)
+
+    assert resumen == {"actualizadas": 1, "insertadas": 0, "borradas": 1, "conflictos": 0}
+    assert len(llamadas) == 1
+    assert [f[0] for f in ws.get_all_values()[1:]] == ["0", "1", "2", "3", "5"]
+    assert ws.get_all_values()[4] == ["3", "20100000003", "AUTORIZADO"]
+
+
+def test_guardar_ventana_no_pisa_filas_cambiadas_por_otros(libro):
+    fuente, ws = _fuente(libro, [["1", "20100000001", "PENDIENTE"]])
+    pagina = leer_pagina(fuente, 1, 10)
+    editado = pagina.df.copy()
+    editado.loc[0, "ESTADO"] = "MIO"
+    ws.update("C2", [["SUYO"]])
+
+    resumen = guardar_ventana(fuente, pagina.df, editado)
+
+    assert resumen["conflictos"] == 1
+    assert ws.get_all_values()[1][2] == "SUYO"
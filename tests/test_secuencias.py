@@ -0,0 +1,54 @@
+# tests/test_secuencias.py
+import pytest
+
+from integraciones import secuencias
+
+
+def _semilla(valor, llamadas):
+    def semilla():
+        llamadas.append(valor)
+        return valor
+
+    return semilla
+
+
+def test_correlativo_parte_de_la_semilla_y_no_repite(base_sqlite):
+    llamadas = []
+
+    assert secuencias.asignar_correlativo("docs", 3, _semilla(10, llamadas), "v1") == 11
+    assert secuencias.asignar_correlativo("docs", 1, _semilla(10, llamadas), "v1") == 14
+    assert llamadas == [10]
+
+
+def test_correlativo_se_resiembra_solo_si_cambia_la_version(base_sqlite):
+    llamadas = []
+    secuencias.asignar_correlativo("docs", 1, _semilla(5, llamadas), "v1")
+
+    # Otra réplica llegó al 50: se ve recién con la nueva versión
+    assert secuencias.asignar_correlativo("docs", 1, _semilla(50, llamadas), "v1") == 7
+    assert secuencias.asignar_correlativo("docs", 1, _semilla(50, llamadas), "v2") == 51
+    assert llamadas == [5, 50]
+
+
+def test_codigos_por_anio(base_sqlite):
+    secuencias.sembrar_codigos("eval", lambda: [(2024, "7"), (2024, " 3 "), (2025, "1")])
+
+    assert secuencias.en_uso("eval", 2024, "3")
+    assert not secuencias.en_uso("eval", 2025, "3")
+    assert secuencias.proponer("eval", 2024) == "8"
+    assert secuencias.proponer("eval", 2026) == "1"
+
+
+def test_reservar_es_atomico(base_sqlite):
+    secuencias.sembrar_codigos("eval", lambda: [(2024, "7")])
+
+    with pytest.raises(secuencias.CodigoDuplicadoError) as error:
+        secuencias.reservar([("eval", 2024, "8"), ("eval", 2024, "7")])
+
+    assert error.value.duplicados == [("eval", 2024, "7")]
+    assert not secuencias.en_uso("eval", 2024, "8")
+
+    secuencias.reservar([("eval", 2024, "8")])
+    assert secuencias.proponer("eval", 2024) == "9"
+    secuencias.liberar([("eval", 2024, "8")])
+    assert not secuencias.en_uso("eval", 2024, "8")
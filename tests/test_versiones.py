@@ -0,0 +1,128 @@
+# tests/test_versiones.py
+import itertools
+
+import pandas as pd
+import pytest
+
+from integraciones import almacen, gsheets
+from integraciones.versiones import fusionar, resolver_escritura, version_df
+
+COLUMNAS = ["N°", "NOMBRE"]
+
+
+def _df(filas):
+    return pd.DataFrame(filas, columns=COLUMNAS)
+
+
+def _filas(df):
+    return df.values.tolist()
+
+
+BASE = _df([["1", "ANA"], ["2", "LUIS"], ["3", "EVA"]])
+
+
+def test_version_df_cambia_con_el_contenido():
+    assert version_df(BASE, COLUMNAS) == version_df(BASE.copy(), COLUMNAS)
+    editado = BASE.copy()
+    editado.loc[1, "NOMBRE"] = "LUISA"
+    assert version_df(editado, COLUMNAS) != version_df(BASE, COLUMNAS)
+
+
+def test_fusion_sin_conflictos_conserva_los_cambios_de_ambos():
+    mio = _df([["1", "ANA MARIA"], ["2", "LUIS"], ["3", "EVA"]])
+    actual = _df([["1", "ANA"], ["3", "EVA"], ["4", "RAUL"]])  # borró 2, agregó 4
+
+    final, conflictos = fusionar(BASE, mio, actual, COLUMNAS, "N°")
+
+    assert conflictos == 0
+    assert _filas(final) == [["1", "ANA MARIA"], ["3", "EVA"], ["4", "RAUL"]]
+
+
+@pytest.mark.parametrize(
+    "gana, esperado",
+    [
+        ("mio", [["1", "ANA"], ["2", "MIO"], ["3", "EVA"]]),
+        ("otros", [["1", "ANA"], ["2", "SUYO"], ["3", "EVA"]]),
+    ],
+)
+def test_misma_clave_editada_por_ambos_queda_una_sola_version(gana, esperado):
+    mio = _df([["1", "ANA"], ["2", "MIO"], ["3", "EVA"]])
+    actual = _df([["1", "ANA"], ["2", "SUYO"], ["3", "EVA"]])
+
+    final, conflictos = fusionar(BASE, mio, actual, COLUMNAS, "N°", gana)
+
+    assert conflictos == 1
+    assert sorted(_filas(final)) == esperado
+    assert final["N°"].is_unique
+
+
+def test_borrado_mio_contra_edicion_de_otros():
+    mio = _df([["1", "ANA"], ["3", "EVA"]])
+    actual = _df([["1", "ANA"], ["2", "SUYO"], ["3", "EVA"]])
+
+    final, conflictos = fusionar(BASE, mio, actual, COLUMNAS, "N°")
+    assert conflictos == 1
+    assert "2" not in final["N°"].tolist()
+
+    final, _ = fusionar(BASE, mio, actual, COLUMNAS, "N°", "otros")
+    assert ["2", "SUYO"] in _filas(final)
+
+
+def test_mismo_cambio_en_ambos_lados_no_es_conflicto():
+    igual = _df([["1", "ANA"], ["2", "X"], ["3", "EVA"]])
+
+    final, conflictos = fusionar(BASE, igual, igual.copy(), COLUMNAS, "N°")
+
+    assert conflictos == 0
+    assert _filas(final) == _filas(igual)
+
+
+def test_sin_clave_se_conservan_ambas_versiones():
+    mio = _df([["1", "ANA"], ["2", "MIO"], ["3", "EVA"]])
+    actual = _df([["1", "ANA"], ["2", "SUYO"], ["3", "EVA"]])
+
+    final, conflictos = fusionar(BASE, mio, actual, COLUMNAS)
+
+    assert conflictos == 1
+    assert ["2", "MIO"] in _filas(final) and ["2", "SUYO"] in _filas(final)
+
+
+def test_gana_invalido():
+    with pytest.raises(ValueError):
+        fusionar(BASE, BASE, BASE, COLUMNAS, "N°", "nadie")
+
+
+def test_resolver_escritura_sin_cambios_de_otros_escribe_lo_mio():
+    mio = _df([["1", "ANA"]])
+
+    final, resumen = resolver_escritura(BASE, mio, BASE.copy(), COLUMNAS, "N°")
+
+    assert not resumen["fusionado"]
+    assert _filas(final) == [["1", "ANA"]]
+
+
+def _hoja(libro, filas):
+    cliente, libro_id = libro
+    almacen.cargar_hoja(cliente, libro_id, "Hoja", COLUMNAS, filas)
+    return cliente.open_by_key(libro_id).worksheet("Hoja")
+
+
+def test_reescribir_versionado_fusiona_lo_que_otros_escribieron(libro):
+    ws = _hoja(libro, _filas(BASE) + [["4", "RAUL"]])
+    mio = _df([["1", "ANA"], ["2", "LUIS"]])  # quité la 3
+
+    final, resumen = gsheets.reescribir_versionado(ws, COLUMNAS, BASE, mio, "N°")
+
+    assert resumen["fusionado"]
+    assert ws.get_all_values() == [COLUMNAS, ["1", "ANA"], ["2", "LUIS"], ["4", "RAUL"]]
+
+
+def test_reescribir_versionado_no_escribe_si_la_hoja_no_deja_de_cambiar(libro, monkeypatch):
+    ws = _hoja(libro, _filas(BASE))
+    revisiones = itertools.count()
+    monkeypatch.setattr(gsheets, "revision_libro", lambda sh: str(next(revisiones)))
+
+    with pytest.raises(gsheets.EscrituraConcurrenteError):
+        gsheets.reescribir_versionado(ws, COLUMNAS, BASE, _df([["9", "X"]]), "N°")
+
+    assert ws.get_all_values() == [COLUMNAS] + _filas(BASE)